@@ -2,3 +2,12 @@ MAX_PAGE_SIZE = 6
 PAGE_QUERY_PARAM = 'page'
 PAGE_SIZE_QUERY_PARAM = 'limit'
 SIZE_OF_PREFIX = 4
+EXPORT_CHUNK_SIZE = 500
+SHOPPING_LIST_DIR = 'shopping_lists'
+CHANGES_LIMIT = 100
+FIELDS_QUERY_PARAM = 'fields'
+OMIT_QUERY_PARAM = 'omit'
+NORMALIZE_QUERY_PARAM = 'normalize'
+MAX_BATCH_SIZE = 100
+THROTTLE_SQLITE_TIMEOUT = 5
+THROTTLE_CLEANUP_INTERVAL = 1000
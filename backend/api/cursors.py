@@ -0,0 +1,41 @@
+'''
+Курсор дельта-синхронизации: момент изменения и id рецепта.
+
+Одной отметки времени недостаточно: сигнал изменения ингредиента или
+тега и массовое удаление проставляют одинаковое время сотням строк.
+Пара (время, id) задаёт строгий порядок, и страница всегда режется
+ровно по CHANGES_LIMIT. Курсор передаётся как «микросекунды-id», без
+символов, требующих экранирования в URL.
+'''
+import re
+from datetime import datetime, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+
+CURSOR_PATTERN = re.compile(r'(\d+)-(\d+)')
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def encode_cursor(moment, pk):
+    return f'{(moment - EPOCH) // MICROSECOND}-{pk}'
+
+
+def decode_cursor(value):
+    '''Пара (момент, id) или None для некорректного курсора.'''
+    match = CURSOR_PATTERN.fullmatch(value)
+    if match is None:
+        return None
+    microseconds, pk = map(int, match.groups())
+    try:
+        return EPOCH + microseconds * MICROSECOND, pk
+    except OverflowError:
+        return None
+
+
+def after_cursor(time_field, pk_field, moment, pk):
+    '''Условие на строки, идущие после курсора в порядке (время, id).'''
+    return (Q(**{f'{time_field}__gt': moment})
+            | Q(**{time_field: moment, f'{pk_field}__gt': pk}))
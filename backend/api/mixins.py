@@ -1,5 +1,8 @@
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 
+from api.constants import FIELDS_QUERY_PARAM, OMIT_QUERY_PARAM
+from foodgram_backend.async_support import async_capable
+
 
 class TagIngredientMixin:
     '''
@@ -9,3 +12,96 @@ class TagIngredientMixin:
 
     permission_classes = (IsAuthenticatedOrReadOnly,)
     pagination_class = None
+
+
+class AsyncActionsMixin:
+    '''
+    Миксин вьюсета, действия которого из async_actions в режиме ASGI
+    выполняются как асинхронные вью.
+    '''
+
+    async_actions = ()
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+        if actions and set(actions.values()) <= set(cls.async_actions):
+            return async_capable(view)
+        return view
+
+
+def parse_fieldset(value):
+    '''
+    Разбор списка полей вида "name,author.username" в дерево
+    {'name': {}, 'author': {'username': {}}}.
+    '''
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for part in filter(None, (part.strip() for part in path.split('.'))):
+            node = node.setdefault(part, {})
+    return tree
+
+
+def is_field_requested(name, fields, omit):
+    '''Попадает ли поле верхнего уровня в ответ при заданных fields/omit.'''
+    if fields and name not in fields:
+        return False
+    return name not in omit or bool(omit[name])
+
+
+class SparseFieldsetSerializerMixin:
+    '''
+    Миксин сериализатора для ограничения набора полей ответа.
+
+    Принимает деревья полей fields (оставить только их) и omit
+    (исключить) и передаёт поддеревья вложенным сериализаторам.
+    '''
+
+    def __init__(self, *args, fields=None, omit=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sparse_fields = fields or None
+        self.sparse_omit = omit or None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        omit = self.sparse_omit or {}
+        fields = {
+            name: field for name, field in fields.items()
+            if is_field_requested(name, self.sparse_fields, omit)
+        }
+        for name, field in fields.items():
+            nested = getattr(field, 'child', field)
+            if isinstance(nested, SparseFieldsetSerializerMixin):
+                nested.sparse_fields = (
+                    (self.sparse_fields or {}).get(name) or None)
+                nested.sparse_omit = omit.get(name) or None
+        return fields
+
+
+class SparseFieldsetViewMixin:
+    '''
+    Миксин вьюсета, передающий параметры ?fields= и ?omit=
+    в сериализаторы ответа для безопасных методов.
+    '''
+
+    def get_sparse_fieldsets(self):
+        if self.request.method not in ('GET', 'HEAD'):
+            return {}, {}
+        return (
+            parse_fieldset(
+                self.request.query_params.get(FIELDS_QUERY_PARAM, '')),
+            parse_fieldset(
+                self.request.query_params.get(OMIT_QUERY_PARAM, '')),
+        )
+
+    def is_field_requested(self, name):
+        return is_field_requested(name, *self.get_sparse_fieldsets())
+
+    def get_serializer(self, *args, **kwargs):
+        serializer_class = self.get_serializer_class()
+        if issubclass(serializer_class, SparseFieldsetSerializerMixin):
+            fields, omit = self.get_sparse_fieldsets()
+            kwargs.setdefault('fields', fields)
+            kwargs.setdefault('omit', omit)
+        return super().get_serializer(*args, **kwargs)
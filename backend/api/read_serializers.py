@@ -0,0 +1,210 @@
+'''
+Сериализаторы горячих эндпоинтов чтения.
+
+Ответ совпадает с RecipeGetSerializer, TagGetSerializer
+и IngredientGetSerializer байт в байт, но строится без экземпляров
+полей DRF: набор полей с учётом ?fields= и ?omit= один раз
+компилируется в список пар (ключ, функция), который применяется
+к каждому объекту. Запись по-прежнему идёт через сериализаторы DRF.
+'''
+from operator import attrgetter
+
+from django.db.models import QuerySet
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+
+from api.mixins import SparseFieldsetSerializerMixin, is_field_requested
+
+
+def image_url(name, request):
+    '''Функция, повторяющая ImageField.to_representation из DRF.'''
+    get_file = attrgetter(name)
+
+    def get(obj):
+        value = get_file(obj)
+        if not value:
+            return None
+        try:
+            url = value.url
+        except AttributeError:
+            return None
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+    return get
+
+
+def represent(plan, obj):
+    return {name: get(obj) for name, get in plan}
+
+
+class ReadSerializer(SparseFieldsetSerializerMixin):
+    '''
+    Базовый сериализатор только для чтения.
+
+    field_names задаёт порядок полей ответа. Поле с методом
+    build_<имя>(fields, omit) получает значение функцией, которую
+    возвращает метод, остальные читаются атрибутом объекта.
+    '''
+
+    field_names = ()
+
+    def __init__(self, instance=None, many=False, context=None,
+                 fields=None, omit=None, **kwargs):
+        super().__init__(fields=fields, omit=omit)
+        self.instance = instance
+        self.many = many
+        self.context = {} if context is None else context
+
+    @property
+    def request(self):
+        return self.context.get('request')
+
+    def compile(self):
+        '''Пары (ключ, функция) для запрошенных полей.'''
+        omit = self.sparse_omit or {}
+        plan = []
+        for name in self.field_names:
+            if not is_field_requested(name, self.sparse_fields, omit):
+                continue
+            build = getattr(self, f'build_{name}', None)
+            if build is None:
+                plan.append((name, attrgetter(name)))
+            else:
+                plan.append((name, build(
+                    (self.sparse_fields or {}).get(name) or None,
+                    omit.get(name) or None)))
+        return plan
+
+    def nested(self, serializer_class, fields, omit):
+        '''План вложенного сериализатора с общим контекстом.'''
+        return serializer_class(
+            context=self.context, fields=fields, omit=omit).compile()
+
+    def represent_queryset(self, queryset, plan):
+        '''
+        Если все поля - атрибуты модели, строки читаются через
+        values_list без создания экземпляров.
+        '''
+        names = [name for name, _ in plan]
+        if any(hasattr(self, f'build_{name}') for name in names):
+            return [represent(plan, obj) for obj in queryset]
+        return [dict(zip(names, row))
+                for row in queryset.values_list(*names)]
+
+    @property
+    def data(self):
+        if not hasattr(self, '_data'):
+            plan = self.compile()
+            if not self.many:
+                self._data = ReturnDict(represent(plan, self.instance),
+                                        serializer=self)
+            elif isinstance(self.instance, QuerySet):
+                self._data = ReturnList(
+                    self.represent_queryset(self.instance, plan),
+                    serializer=self)
+            else:
+                self._data = ReturnList(
+                    [represent(plan, obj) for obj in self.instance],
+                    serializer=self)
+        return self._data
+
+
+class IngredientReadSerializer(ReadSerializer):
+    '''Ингредиенты, как в IngredientGetSerializer.'''
+
+    field_names = ('id', 'name', 'measurement_unit')
+
+
+class TagReadSerializer(ReadSerializer):
+    '''Теги, как в TagGetSerializer.'''
+
+    field_names = ('id', 'name', 'slug')
+
+
+class IngredientRecipeReadSerializer(ReadSerializer):
+    '''Ингредиенты рецепта, как в IngredientRecipeGetSerializer.'''
+
+    field_names = ('id', 'name', 'measurement_unit', 'amount')
+
+    def build_id(self, fields, omit):
+        return attrgetter('ingredient.id')
+
+    def build_name(self, fields, omit):
+        return attrgetter('ingredient.name')
+
+    def build_measurement_unit(self, fields, omit):
+        return attrgetter('ingredient.measurement_unit')
+
+
+class UserReadSerializer(ReadSerializer):
+    '''Автор рецепта, как в FoodgramUserSerializer.'''
+
+    field_names = ('id', 'username', 'email', 'first_name', 'last_name',
+                   'is_subscribed', 'avatar')
+
+    def build_is_subscribed(self, fields, omit):
+        follower = self.request.user
+        if not follower.is_authenticated:
+            return lambda user: False
+        context = self.context
+
+        def get(user):
+            # Тот же ключ контекста, что и у FoodgramUserSerializer.
+            if 'subscribed_ids' not in context:
+                context['subscribed_ids'] = set(
+                    follower.followers.order_by().values_list(
+                        'following_id', flat=True))
+            return user.id in context['subscribed_ids']
+        return get
+
+    def build_avatar(self, fields, omit):
+        return image_url('avatar', self.request)
+
+
+class RecipeReadSerializer(ReadSerializer):
+    '''Рецепты, как в RecipeGetSerializer.'''
+
+    field_names = ('id', 'tags', 'author', 'ingredients', 'is_favorited',
+                   'is_in_shopping_cart', 'name', 'image', 'text',
+                   'cooking_time')
+
+    def build_tags(self, fields, omit):
+        plan = self.nested(TagReadSerializer, fields, omit)
+        return lambda recipe: [represent(plan, tag)
+                               for tag in recipe.tags.all()]
+
+    def build_author(self, fields, omit):
+        if self.context.get('normalize_authors'):
+            return attrgetter('author_id')
+        plan = self.nested(UserReadSerializer, fields, omit)
+        return lambda recipe: represent(plan, recipe.author)
+
+    def build_ingredients(self, fields, omit):
+        plan = self.nested(IngredientRecipeReadSerializer, fields, omit)
+        return lambda recipe: [represent(plan, ingredient)
+                               for ingredient
+                               in recipe.recipe_ingredients.all()]
+
+    def build_is_favorited(self, fields, omit):
+        return self.user_flag('is_favorited', 'favorites')
+
+    def build_is_in_shopping_cart(self, fields, omit):
+        return self.user_flag('is_in_shopping_cart', 'shopping_carts')
+
+    def build_image(self, fields, omit):
+        return image_url('image', self.request)
+
+    def user_flag(self, annotation, related_name):
+        '''
+        Значение аннотации вьюсета, а без неё - запрос по связи,
+        как в методах get_is_* RecipeGetSerializer.
+        '''
+        user = self.request.user
+        if not user.is_authenticated:
+            return lambda recipe: False
+
+        def get(recipe):
+            if hasattr(recipe, annotation):
+                return getattr(recipe, annotation)
+            return getattr(recipe, related_name).filter(user=user).exists()
+        return get
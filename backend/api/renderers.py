@@ -0,0 +1,43 @@
+'''
+JSON-рендерер на orjson.
+
+orjson сериализует ответы в несколько раз быстрее стандартного json.
+Типы, которых orjson не знает (Decimal, ленивые строки переводов,
+datetime в формате DRF), передаются кодировщику DRF. Без пакета orjson,
+при запросе отступов или при настройках UNICODE_JSON/COMPACT_JSON,
+отличных от стандартных, используется обычный JSONRenderer.
+'''
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    OPTIONS = 0
+else:
+    OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+encoder = JSONEncoder()
+
+
+class FastJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type,
+                                   renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        if data is None:
+            return b''
+        try:
+            result = orjson.dumps(data, default=encoder.default,
+                                  option=OPTIONS)
+        except orjson.JSONEncodeError:
+            # Например, целые числа длиннее 64 бит.
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        # Как и JSONRenderer, экранируем U+2028 и U+2029.
+        return result.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+            b'\xe2\x80\xa9', b'\\u2029')
@@ -1,8 +1,12 @@
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 
+from api.mixins import SparseFieldsetSerializerMixin
+
 from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
                             ShoppingCart, ShortenedURL, Subscription, Tag)
 from users.serializers import FoodgramUserSerializer
@@ -19,7 +23,8 @@ class IngredientGetSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class IngredientRecipeGetSerializer(serializers.ModelSerializer):
+class IngredientRecipeGetSerializer(SparseFieldsetSerializerMixin,
+                                    serializers.ModelSerializer):
     """Сериализатор для извлечения ингредиентов при GET-запросах рецептов."""
 
     id = serializers.IntegerField(
@@ -45,14 +50,9 @@ class IngredientRecipePostSerializer(serializers.ModelSerializer):
                   'amount',
                   )
 
-    def validate_id(self, id):
-        if not Ingredient.objects.filter(id=id).exists():
-            raise serializers.ValidationError(
-                f'Ингредиент с id {id} не существует.')
-        return id
-
 
-class TagGetSerializer(serializers.ModelSerializer):
+class TagGetSerializer(SparseFieldsetSerializerMixin,
+                       serializers.ModelSerializer):
     """Сериализатор для GET-запросов тегов."""
 
     class Meta:
@@ -60,7 +60,8 @@ class TagGetSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class RecipeGetSerializer(serializers.ModelSerializer):
+class RecipeGetSerializer(SparseFieldsetSerializerMixin,
+                          serializers.ModelSerializer):
     """Сериализатор для GET-запросов с рецептами."""
 
     author = FoodgramUserSerializer(read_only=True)
@@ -86,15 +87,28 @@ class RecipeGetSerializer(serializers.ModelSerializer):
                   'cooking_time',
                   )
 
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.context.get('normalize_authors') and 'author' in fields:
+            fields['author'] = serializers.PrimaryKeyRelatedField(
+                read_only=True)
+        return fields
+
     def get_is_favorited(self, obj):
         user = self.context.get('request').user
-        return user.is_authenticated and obj.favorites.filter(
-            user=user).exists()
+        if not user.is_authenticated:
+            return False
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
+        return obj.favorites.filter(user=user).exists()
 
     def get_is_in_shopping_cart(self, obj):
         user = self.context.get('request').user
-        return user.is_authenticated and obj.shopping_carts.filter(
-            user=user).exists()
+        if not user.is_authenticated:
+            return False
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
+        return obj.shopping_carts.filter(user=user).exists()
 
 
 class RecipePostSerializer(serializers.ModelSerializer):
@@ -102,9 +116,8 @@ class RecipePostSerializer(serializers.ModelSerializer):
 
     ingredients = IngredientRecipePostSerializer(many=True,
                                                  required=True)
-    tags = serializers.PrimaryKeyRelatedField(many=True,
-                                              queryset=Tag.objects.all(),
-                                              required=True)
+    tags = serializers.ListField(child=serializers.IntegerField(),
+                                 required=True)
     image = Base64ImageField()
 
     class Meta:
@@ -128,6 +141,13 @@ class RecipePostSerializer(serializers.ModelSerializer):
         if len(ingredient_ids) != len(set(ingredient_ids)):
             raise serializers.ValidationError(
                 'Ингредиенты не должны повторяться.')
+        existing_ingredients = Ingredient.objects.in_bulk(ingredient_ids)
+        missing_ids = [id for id in ingredient_ids
+                       if id not in existing_ingredients]
+        if missing_ids:
+            raise serializers.ValidationError(
+                {'ingredients': 'Ингредиенты с id '
+                 f'{", ".join(map(str, missing_ids))} не существуют.'})
 
         tags = data.get('tags')
         if tags is None:
@@ -137,6 +157,12 @@ class RecipePostSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError('Нужно указать тег/теги.')
         if len(tags) != len(set(tags)):
             raise serializers.ValidationError('Теги не должны повторяться.')
+        existing_tags = Tag.objects.in_bulk(tags)
+        missing_ids = [id for id in tags if id not in existing_tags]
+        if missing_ids:
+            raise serializers.ValidationError(
+                {'tags': 'Теги с id '
+                 f'{", ".join(map(str, missing_ids))} не существуют.'})
         return data
 
     def validate_image(self, image):
@@ -147,17 +173,45 @@ class RecipePostSerializer(serializers.ModelSerializer):
 
     def add_ingredients_and_tags(self, recipe, ingredients_data, tags_data):
         '''Добавление в рецепт ингредиентов и тегов.'''
-        ingredient_recipe_objs = [
+        IngredientRecipe.objects.bulk_create(
             IngredientRecipe(recipe=recipe,
-                             ingredient=Ingredient.objects.get(
-                                 id=ingredient_data['id']),
+                             ingredient_id=ingredient_data['id'],
                              amount=ingredient_data['amount']
                              ) for ingredient_data in ingredients_data
-        ]
-        IngredientRecipe.objects.bulk_create(ingredient_recipe_objs)
+        )
         recipe.tags.set(tags_data)
         return recipe
 
+    def update_ingredients(self, recipe, ingredients_data):
+        '''Обновление ингредиентов рецепта только по изменившимся строкам.'''
+        current = {
+            ingredient_recipe.ingredient_id: ingredient_recipe
+            for ingredient_recipe in IngredientRecipe.objects.filter(
+                recipe=recipe)
+        }
+        new_amounts = {ingredient_data['id']: ingredient_data['amount']
+                       for ingredient_data in ingredients_data}
+        to_create = [
+            IngredientRecipe(recipe=recipe, ingredient_id=id, amount=amount)
+            for id, amount in new_amounts.items() if id not in current
+        ]
+        to_update = []
+        for id, ingredient_recipe in current.items():
+            amount = new_amounts.get(id)
+            if amount is not None and ingredient_recipe.amount != amount:
+                ingredient_recipe.amount = amount
+                to_update.append(ingredient_recipe)
+        to_delete = [ingredient_recipe.pk
+                     for id, ingredient_recipe in current.items()
+                     if id not in new_amounts]
+        if to_delete:
+            IngredientRecipe.objects.filter(pk__in=to_delete).delete()
+        if to_update:
+            IngredientRecipe.objects.bulk_update(to_update, ('amount',))
+        if to_create:
+            IngredientRecipe.objects.bulk_create(to_create)
+
+    @transaction.atomic
     def create(self, validated_data):
         validated_data['author'] = self.context.get('request').user
         ingredients_data = validated_data.pop('ingredients')
@@ -166,15 +220,23 @@ class RecipePostSerializer(serializers.ModelSerializer):
         return self.add_ingredients_and_tags(
             recipe, ingredients_data, tags_data)
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients_data = validated_data.pop('ingredients')
         tags_data = validated_data.pop('tags')
         super().update(instance, validated_data)
-        instance.ingredients.clear()
-        return self.add_ingredients_and_tags(
-            instance, ingredients_data, tags_data)
+        self.update_ingredients(instance, ingredients_data)
+        instance.tags.set(tags_data)
+        return instance
 
     def to_representation(self, instance):
+        prefetch_related_objects(
+            [instance],
+            'tags',
+            Prefetch('recipe_ingredients',
+                     queryset=IngredientRecipe.objects.select_related(
+                         'ingredient')),
+        )
         response_serializer = RecipeGetSerializer(
             instance,
             context={'request': self.context.get('request')}
@@ -182,6 +244,42 @@ class RecipePostSerializer(serializers.ModelSerializer):
         return response_serializer.data
 
 
+class IngredientRecipeExportSerializer(serializers.ModelSerializer):
+    """Сериализатор ингредиентов рецепта для выгрузки в NDJSON."""
+
+    id = serializers.IntegerField(source='ingredient_id', read_only=True)
+
+    class Meta:
+        model = IngredientRecipe
+        fields = ('id', 'amount')
+
+
+class RecipeExportSerializer(serializers.ModelSerializer):
+    """Сериализатор для построчной выгрузки рецептов.
+
+    Формат ингредиентов и тегов совпадает с телом POST-запроса рецепта,
+    поэтому строки выгрузки можно передать в команду import_recipes.
+    """
+
+    ingredients = IngredientRecipeExportSerializer(
+        many=True, source='recipe_ingredients', read_only=True)
+    tags = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+    image = serializers.ImageField(read_only=True)
+
+    class Meta:
+        model = Recipe
+        fields = ('id',
+                  'author',
+                  'name',
+                  'text',
+                  'cooking_time',
+                  'tags',
+                  'ingredients',
+                  'image',
+                  'pub_date',
+                  )
+
+
 class RecipeSubscribeSerializer(serializers.ModelSerializer):
     '''Сериализатор для представления рецептов в подписках.'''
 
@@ -292,7 +390,7 @@ class SubscribeUserSerializer(FoodgramUserSerializer):
     """Сериализатор для получения списка подписок."""
 
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.ReadOnlyField(source='recipes.count')
+    recipes_count = serializers.SerializerMethodField()
 
     class Meta:
         model = User
@@ -315,6 +413,11 @@ class SubscribeUserSerializer(FoodgramUserSerializer):
                                                context=self.context)
         return serializer.data
 
+    def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
+        return obj.recipes.count()
+
 
 class SubscriptionSerializer(serializers.ModelSerializer):
     """Сериализатор для создания подписок."""
@@ -0,0 +1,77 @@
+'''
+Список покупок: суммы ингредиентов рецептов из корзины пользователя.
+
+Небольшой список отдаётся потоком прямо в ответе. Список для корзины
+от SHOPPING_LIST_ASYNC_THRESHOLD рецептов собирает фоновая задача в
+файл хранилища медиа. Имя файла - подпись состояния корзины: число
+рецептов, последняя добавленная запись и время последнего изменения
+рецептов. Добавление или удаление рецепта, правка его ингредиентов и
+переименование ингредиента меняют подпись, поэтому устаревший файл
+больше не выдаётся.
+'''
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Count, Max, Sum
+from django.utils.crypto import salted_hmac
+
+from api.constants import EXPORT_CHUNK_SIZE, SHOPPING_LIST_DIR
+from recipes.models import IngredientRecipe, ShoppingCart
+
+
+def cart_ingredients(user):
+    '''Ингредиенты корзины с суммарным количеством, по алфавиту.'''
+    return (
+        IngredientRecipe.objects.filter(
+            recipe__shopping_carts__user=user
+        )
+        .values(
+            'ingredient__name',
+            'ingredient__measurement_unit'
+        )
+        .annotate(amount=Sum('amount'))
+        .order_by('ingredient__name')
+    )
+
+
+def cart_state(user_id):
+    '''Число рецептов в корзине и подпись её текущего состояния.'''
+    state = ShoppingCart.objects.filter(user_id=user_id).aggregate(
+        count=Count('pk'), last_pk=Max('pk'),
+        updated_at=Max('recipe__updated_at'))
+    signature = salted_hmac(
+        'api.shopping_list',
+        f'{user_id}:{state["count"]}:{state["last_pk"]}:'
+        f'{state["updated_at"]}').hexdigest()
+    return state['count'], signature
+
+
+def document_name(user_id, signature):
+    return f'{SHOPPING_LIST_DIR}/{user_id}/{signature}.txt'
+
+
+def shopping_list_chunks(ingredients):
+    '''Строки списка покупок порциями по EXPORT_CHUNK_SIZE.'''
+    for start in range(0, len(ingredients), EXPORT_CHUNK_SIZE):
+        yield ''.join(
+            f"{item['ingredient__name']} "
+            f"({item['ingredient__measurement_unit']}) — "
+            f"{item['amount']}\n"
+            for item in ingredients[start:start + EXPORT_CHUNK_SIZE]
+        ).encode('utf-8')
+
+
+def save_document(user_id, signature, ingredients):
+    '''
+    Запись файла списка покупок; прежние файлы пользователя удаляются.
+
+    Возвращает имя файла в хранилище.
+    '''
+    name = default_storage.save(
+        document_name(user_id, signature),
+        ContentFile(b''.join(shopping_list_chunks(ingredients))))
+    directory = f'{SHOPPING_LIST_DIR}/{user_id}'
+    for filename in default_storage.listdir(directory)[1]:
+        path = f'{directory}/{filename}'
+        if path != name:
+            default_storage.delete(path)
+    return name
@@ -0,0 +1,23 @@
+from django.core.files.storage import default_storage
+
+from api.shopping_list import (cart_ingredients, cart_state, document_name,
+                               save_document)
+from jobs.queue import task
+
+
+@task('api.build_shopping_list')
+def build_shopping_list(user_id):
+    '''
+    Файл списка покупок для текущего состояния корзины.
+
+    Корзина могла измениться после постановки задачи; файл собирается
+    по состоянию на момент выполнения.
+    '''
+    # Подпись читается до сумм: если корзина изменится между запросами,
+    # файл окажется новее подписи, и следующий запрос соберёт его заново.
+    _, signature = cart_state(user_id)
+    name = document_name(user_id, signature)
+    if not default_storage.exists(name):
+        name = save_document(user_id, signature,
+                             list(cart_ingredients(user_id)))
+    return {'name': name}
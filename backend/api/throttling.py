@@ -0,0 +1,211 @@
+'''
+Ограничение частоты запросов скользящим окном в общем хранилище.
+
+Для каждого ключа хранятся только номер текущего окна и два счётчика:
+запросы в текущем и в предыдущем окне. Оценка числа запросов за
+последние duration секунд - это счётчик текущего окна плюс доля
+предыдущего, пропорциональная ещё не истёкшей части окна.
+
+Хранилище задаётся настройкой THROTTLE_STORE:
+sqlite:///путь/к/файлу - общий файл SQLite для всех воркеров сервера;
+redis://host:port/db - Redis (нужен пакет redis);
+memory:// - память процесса (тесты и запуск в одном процессе).
+'''
+import logging
+import os
+import sqlite3
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
+
+from api.constants import (THROTTLE_CLEANUP_INTERVAL,
+                           THROTTLE_SQLITE_TIMEOUT)
+
+
+logger = logging.getLogger('foodgram.throttling')
+
+
+def evaluate(current, previous, limit, duration, elapsed):
+    '''
+    Решение по запросу и время ожидания при отказе.
+
+    elapsed - сколько секунд прошло с начала текущего окна.
+    '''
+    weight = 1 - elapsed / duration
+    if previous * weight + current < limit:
+        return True, None
+    remaining = duration - elapsed
+    if current < limit:
+        # Доля предыдущего окна убывает и освобождает место до смены окна.
+        return False, duration * (1 - (limit - current) / previous) - elapsed
+    # После смены окна текущий счётчик становится предыдущим.
+    return False, remaining + duration * (1 - limit / current)
+
+
+def shift(window, stored_window, current, previous):
+    '''Счётчики с учётом смены окон с момента последнего запроса.'''
+    if stored_window == window:
+        return current, previous
+    if stored_window == window - 1:
+        return 0, current
+    return 0, 0
+
+
+class MemoryThrottleStore:
+    '''Хранилище в памяти процесса.'''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+
+    def hit(self, key, limit, duration, now):
+        window, elapsed = divmod(now, duration)
+        window = int(window)
+        with self.lock:
+            stored = self.counters.get(key)
+            current, previous = shift(
+                window, *stored) if stored else (0, 0)
+            allowed, wait = evaluate(current, previous, limit, duration,
+                                     elapsed)
+            self.counters[key] = (window, current + allowed, previous)
+        return allowed, wait
+
+
+class SQLiteThrottleStore:
+    '''
+    Хранилище в файле SQLite, общем для процессов одного сервера.
+
+    Чтение и запись счётчиков выполняются в транзакции BEGIN IMMEDIATE,
+    поэтому одновременные запросы разных воркеров не теряют обновления.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+
+    def connection(self):
+        # Соединение нельзя наследовать при fork воркеров gunicorn.
+        if getattr(self.local, 'pid', None) != os.getpid():
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(
+                self.path, timeout=THROTTLE_SQLITE_TIMEOUT,
+                isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS throttle ('
+                'key TEXT PRIMARY KEY, window INTEGER NOT NULL, '
+                'current INTEGER NOT NULL, previous INTEGER NOT NULL, '
+                'expires_at REAL NOT NULL) WITHOUT ROWID')
+            self.local.connection = connection
+            self.local.pid = os.getpid()
+            self.local.hits = 0
+        return self.local.connection
+
+    def hit(self, key, limit, duration, now):
+        window, elapsed = divmod(now, duration)
+        window = int(window)
+        try:
+            connection = self.connection()
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                row = connection.execute(
+                    'SELECT window, current, previous FROM throttle '
+                    'WHERE key = ?', (key,)).fetchone()
+                current, previous = shift(window, *row) if row else (0, 0)
+                allowed, wait = evaluate(current, previous, limit, duration,
+                                         elapsed)
+                connection.execute(
+                    'INSERT OR REPLACE INTO throttle VALUES (?, ?, ?, ?, ?)',
+                    (key, window, current + allowed, previous,
+                     (window + 2) * duration))
+                self.local.hits += 1
+                if self.local.hits % THROTTLE_CLEANUP_INTERVAL == 0:
+                    connection.execute(
+                        'DELETE FROM throttle WHERE expires_at < ?', (now,))
+                connection.execute('COMMIT')
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+        except sqlite3.Error:
+            # Недоступное хранилище не должно останавливать сервис.
+            logger.exception('Ошибка хранилища троттлинга %s', self.path)
+            return True, None
+        return allowed, wait
+
+
+class RedisThrottleStore:
+    '''
+    Хранилище в Redis: счётчик каждого окна - отдельный ключ с TTL.
+
+    Запрос сначала учитывается атомарным INCR и снимается DECR при
+    отказе, поэтому воркеры не могут одновременно превысить лимит.
+    '''
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured(
+                'Для THROTTLE_STORE=redis:// установите пакет redis.')
+        self.client = redis.Redis.from_url(url)
+
+    def hit(self, key, limit, duration, now):
+        window, elapsed = divmod(now, duration)
+        current_key = f'{key}:{int(window)}'
+        pipeline = self.client.pipeline()
+        pipeline.incr(current_key)
+        pipeline.expire(current_key, int(duration * 2))
+        pipeline.get(f'{key}:{int(window) - 1}')
+        current, _, previous = pipeline.execute()
+        allowed, wait = evaluate(current - 1, int(previous or 0), limit,
+                                 duration, elapsed)
+        if not allowed:
+            self.client.decr(current_key)
+        return allowed, wait
+
+
+@lru_cache(maxsize=None)
+def get_store(url):
+    scheme, _, location = url.partition('://')
+    if scheme == 'sqlite':
+        return SQLiteThrottleStore(location)
+    if scheme == 'redis':
+        return RedisThrottleStore(url)
+    if scheme == 'memory':
+        return MemoryThrottleStore()
+    raise ImproperlyConfigured(
+        f'Неизвестное хранилище троттлинга: {url}.')
+
+
+class SlidingWindowThrottleMixin:
+    '''Замена списка меток времени в кэше на скользящее окно.'''
+
+    wait_time = None
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        allowed, self.wait_time = get_store(settings.THROTTLE_STORE).hit(
+            self.key, self.num_requests, self.duration, self.timer())
+        return allowed
+
+    def wait(self):
+        return self.wait_time
+
+
+class UserSlidingWindowThrottle(SlidingWindowThrottleMixin,
+                                UserRateThrottle):
+    pass
+
+
+class AnonSlidingWindowThrottle(SlidingWindowThrottleMixin,
+                                AnonRateThrottle):
+    pass
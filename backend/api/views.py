@@ -1,59 +1,81 @@
-import tempfile
+from operator import itemgetter
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Sum
-from django.http import FileResponse
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Exists, OuterRef, Prefetch
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.permissions import (IsAuthenticated,
                                         IsAuthenticatedOrReadOnly,
                                         SAFE_METHODS)
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
 
-from api.constants import SIZE_OF_PREFIX
+from api.constants import (CHANGES_LIMIT, EXPORT_CHUNK_SIZE, MAX_BATCH_SIZE,
+                           NORMALIZE_QUERY_PARAM, SIZE_OF_PREFIX)
+from api.cursors import after_cursor, decode_cursor, encode_cursor
 from api.filters import IngredientFilter, RecipeFilter
-from api.mixins import TagIngredientMixin
+from api.mixins import (AsyncActionsMixin, SparseFieldsetViewMixin,
+                        TagIngredientMixin)
 from api.paginators import FoodgramPageNumberPagination
 from api.permissions import IsAuthorOrReadOnly
-from api.serializers import (IngredientGetSerializer,
+from api.read_serializers import (IngredientReadSerializer,
+                                  RecipeReadSerializer, TagReadSerializer)
+from api.renderers import FastJSONRenderer
+from api.serializers import (RecipeExportSerializer,
                              RecipeFavoritePostSerializer,
-                             RecipeGetSerializer,
                              RecipePostSerializer,
                              RecipeShoppingCartPostSerializer,
-                             ShortenedURLSerializer,
-                             TagGetSerializer,)
-from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
-                            ShoppingCart, ShortenedURL, Tag)
+                             ShortenedURLSerializer,)
+from api.shopping_list import (cart_ingredients, cart_state, document_name,
+                               shopping_list_chunks)
+from api.tasks import build_shopping_list
+from foodgram_backend.async_support import async_capable
+from jobs.models import Job
+from jobs.queue import enqueue
+from recipes.deletion import delete_recipes
+from recipes.models import (DeletedRecipe, Favorite, Ingredient,
+                            IngredientRecipe, Recipe, ShoppingCart,
+                            ShortenedURL, Tag)
+from users.serializers import FoodgramUserSerializer
 
 
 User = get_user_model()
 
 
-class IngredientViewSet(TagIngredientMixin, viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(AsyncActionsMixin, SparseFieldsetViewMixin,
+                        TagIngredientMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет для операций с ингредиентами."""
 
+    async_actions = ('list', 'retrieve')
     queryset = Ingredient.objects.all()
-    serializer_class = IngredientGetSerializer
+    serializer_class = IngredientReadSerializer
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
 
 
-class TagViewSet(TagIngredientMixin, viewsets.ReadOnlyModelViewSet):
+class TagViewSet(AsyncActionsMixin, SparseFieldsetViewMixin,
+                 TagIngredientMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет для операций с тегами."""
 
+    async_actions = ('list', 'retrieve')
     queryset = Tag.objects.all()
-    serializer_class = TagGetSerializer
+    serializer_class = TagReadSerializer
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(AsyncActionsMixin, SparseFieldsetViewMixin,
+                    viewsets.ModelViewSet):
     """Вьюсет для операций с рецептами."""
 
-    queryset = Recipe.objects.select_related(
-        "author"
-    ).prefetch_related(
-        "tags", "ingredients")
+    async_actions = ('download_shopping_cart', 'shopping_list_job')
+    queryset = Recipe.objects.all()
     http_method_names = ('get', 'post', 'patch', 'delete')
     permission_classes = (IsAuthenticatedOrReadOnly,
                           IsAuthorOrReadOnly,)
@@ -61,11 +83,68 @@ class RecipeViewSet(viewsets.ModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
+    def perform_destroy(self, instance):
+        delete_recipes(Recipe.objects.filter(pk=instance.pk))
+
+    def get_queryset(self):
+        '''Подгрузка только тех связей, которые попадут в ответ.'''
+        queryset = super().get_queryset()
+        if self.request.method not in SAFE_METHODS:
+            return queryset.select_related('author')
+        if self.is_field_requested('author') and not self.is_normalized():
+            queryset = queryset.select_related('author')
+        if self.is_field_requested('tags'):
+            queryset = queryset.prefetch_related('tags')
+        if self.is_field_requested('ingredients'):
+            queryset = queryset.prefetch_related(Prefetch(
+                'recipe_ingredients',
+                queryset=IngredientRecipe.objects.select_related(
+                    'ingredient')))
+        user = self.request.user
+        if user.is_authenticated:
+            for field, model in (('is_favorited', Favorite),
+                                 ('is_in_shopping_cart', ShoppingCart)):
+                if self.is_field_requested(field):
+                    queryset = queryset.annotate(**{field: Exists(
+                        model.objects.filter(user=user,
+                                             recipe=OuterRef('pk')))})
+        return queryset
+
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
-            return RecipeGetSerializer
+            return RecipeReadSerializer
         return RecipePostSerializer
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['normalize_authors'] = self.is_normalized()
+        return context
+
+    def is_normalized(self):
+        '''Запрошен ли список с авторами, вынесенными в поле authors.'''
+        return self.action == 'list' and self.request.query_params.get(
+            NORMALIZE_QUERY_PARAM, '').lower() in ('1', 'true')
+
+    def list(self, request, *args, **kwargs):
+        if not self.is_normalized():
+            return super().list(request, *args, **kwargs)
+        page = self.paginate_queryset(
+            self.filter_queryset(self.get_queryset()))
+        serializer = self.get_serializer(page, many=True)
+        response = self.get_paginated_response(serializer.data)
+        fields, omit = self.get_sparse_fieldsets()
+        if self.is_field_requested('author'):
+            authors = User.objects.filter(
+                pk__in={recipe.author_id for recipe in page})
+            response.data['authors'] = FoodgramUserSerializer(
+                authors,
+                many=True,
+                context=self.get_serializer_context(),
+                fields=fields.get('author'),
+                omit=omit.get('author'),
+            ).data
+        return response
+
     def create_delete_object_for_recipe(self, request, id, model, serializer):
         '''Общий метод для операций с моделями, связанными с рецептом.'''
         recipe = get_object_or_404(Recipe, id=id)
@@ -103,40 +182,188 @@ class RecipeViewSet(viewsets.ModelViewSet):
         methods=['get'],
         permission_classes=(IsAuthenticated,))
     def download_shopping_cart(self, request):
-        '''Экшн-метод для загрузки списка покупок ингредиентов.'''
+        '''
+        Экшн-метод для загрузки списка покупок ингредиентов.
+
+        Для корзины от SHOPPING_LIST_ASYNC_THRESHOLD рецептов отвечает
+        перенаправлением на собранный файл или ставит его сборку в
+        очередь и возвращает задачу для опроса.
+        '''
         user = request.user
-        ingredients = (
-            IngredientRecipe.objects.filter(
-                recipe__shopping_carts__user=user
-            )
-            .values(
-                'ingredient__name',
-                'ingredient__measurement_unit'
-            )
-            .annotate(amount=Sum('amount'))
-            .order_by('ingredient__name')
-        )
-        return self.writing_data(ingredients)
+        count, signature = cart_state(user.pk)
+        if count < settings.SHOPPING_LIST_ASYNC_THRESHOLD:
+            return self.writing_data(cart_ingredients(user))
+        name = document_name(user.pk, signature)
+        if default_storage.exists(name):
+            return self.document_redirect(name)
+        job = enqueue(build_shopping_list.task_name, {'user_id': user.pk},
+                      dedupe_key=f'shopping-list:{user.pk}:{signature}')
+        return self.shopping_list_job_response(job)
+
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=(IsAuthenticated,),
+        url_path=r'download_shopping_cart/(?P<job_id>\d+)')
+    def shopping_list_job(self, request, job_id):
+        '''Экшн-метод для опроса задачи сборки списка покупок.'''
+        # Состояние задачи меняет воркер, поэтому читается с основной
+        # базы. Опрос ничего не записывает и не закрепляет клиента
+        # за основной базой.
+        job = get_object_or_404(
+            Job.objects.using(DEFAULT_DB_ALIAS), pk=job_id,
+            task=build_shopping_list.task_name,
+            payload__user_id=request.user.pk)
+        return self.shopping_list_job_response(job)
+
+    def shopping_list_job_response(self, job):
+        if job.status == Job.Status.DONE:
+            name = job.result['name']
+            if default_storage.exists(name):
+                return self.document_redirect(name)
+            return Response(
+                {'detail': 'Список покупок устарел, запросите его заново.'},
+                status=status.HTTP_410_GONE)
+        url = reverse('api:recipes-shopping-list-job',
+                      kwargs={'job_id': job.pk}, request=self.request)
+        return Response(
+            {'id': job.pk, 'status': job.status, 'url': url},
+            status=(status.HTTP_200_OK if job.status == Job.Status.FAILED
+                    else status.HTTP_202_ACCEPTED),
+            headers={'Location': url})
+
+    def document_redirect(self, name):
+        '''Перенаправление на собранный файл списка покупок.'''
+        url = self.request.build_absolute_uri(default_storage.url(name))
+        return Response({'url': url}, status=status.HTTP_303_SEE_OTHER,
+                        headers={'Location': url})
 
     def writing_data(self, ingredients):
-        '''Создание файла со списком покупок.'''
-        with tempfile.NamedTemporaryFile(
-            delete=False, suffix='.txt'
-        ) as tmp_file:
-            for item in ingredients:
-                ingredient_name = item['ingredient__name']
-                total_amount = item['amount']
-                unit = item['ingredient__measurement_unit']
-                tmp_file.write(
-                    f"{ingredient_name} ({unit}) — {total_amount}\n".encode(
-                        'utf-8'))
-            tmp_file_path = tmp_file.name
-        response = FileResponse(open(tmp_file_path, 'rb'),
-                                content_type='text/plain')
+        '''Потоковая отдача списка покупок порциями строк.'''
+        response = StreamingHttpResponse(
+            shopping_list_chunks(list(ingredients)),
+            content_type='text/plain')
         response['Content-Disposition'] = (
             'attachment; filename="shopping_cart.txt"')
         return response
 
+    @action(detail=False,
+            methods=['get'])
+    def batch(self, request):
+        '''
+        Экшн-метод для получения рецептов по списку id (?ids=1,2,3).
+
+        Порядок ответа совпадает с порядком id в запросе,
+        несуществующие id пропускаются.
+        '''
+        raw_ids = [id.strip() for id
+                   in request.query_params.get('ids', '').split(',')
+                   if id.strip()]
+        if not raw_ids or not all(id.isdigit() for id in raw_ids):
+            return Response(
+                {'ids': 'Укажите id рецептов через запятую.'},
+                status=status.HTTP_400_BAD_REQUEST)
+        ids = list(dict.fromkeys(map(int, raw_ids)))
+        if len(ids) > MAX_BATCH_SIZE:
+            return Response(
+                {'ids': f'Можно запросить не более {MAX_BATCH_SIZE} '
+                        'рецептов.'},
+                status=status.HTTP_400_BAD_REQUEST)
+        recipes = self.get_queryset().in_bulk(ids)
+        serializer = self.get_serializer(
+            [recipes[id] for id in ids if id in recipes], many=True)
+        return Response(serializer.data)
+
+    @action(detail=False,
+            methods=['get'])
+    def changes(self, request):
+        '''
+        Экшн-метод для дельта-синхронизации.
+
+        Первый запрос передаёт since - дату и время в формате ISO 8601,
+        следующие - курсор из поля cursor предыдущего ответа. Возвращает
+        не больше CHANGES_LIMIT событий: рецепты, созданные или
+        изменённые после курсора, и id рецептов, удалённых после него.
+        '''
+        if 'cursor' in request.query_params:
+            position = decode_cursor(request.query_params['cursor'])
+            if position is None:
+                return Response(
+                    {'cursor': 'Передайте курсор из предыдущего ответа.'},
+                    status=status.HTTP_400_BAD_REQUEST)
+        else:
+            try:
+                since = parse_datetime(request.query_params.get('since', ''))
+            except ValueError:
+                since = None
+            if since is None:
+                return Response(
+                    {'since': 'Укажите дату и время в формате ISO 8601.'},
+                    status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since, timezone.utc)
+            position = (since, 0)
+
+        changed = self.filter_queryset(self.get_queryset()).filter(
+            after_cursor('updated_at', 'pk', *position)
+        ).order_by('updated_at', 'pk')[:CHANGES_LIMIT + 1]
+        deleted = DeletedRecipe.objects.filter(
+            after_cursor('deleted_at', 'recipe_id', *position)
+        ).order_by('deleted_at', 'recipe_id').values_list(
+            'deleted_at', 'recipe_id')[:CHANGES_LIMIT + 1]
+        events = sorted(
+            [(recipe.updated_at, recipe.pk, recipe) for recipe in changed]
+            + [(deleted_at, pk, None) for deleted_at, pk in deleted],
+            key=itemgetter(0, 1))
+        page = events[:CHANGES_LIMIT]
+        if page:
+            position = page[-1][:2]
+        serializer = self.get_serializer(
+            [recipe for _, _, recipe in page if recipe is not None],
+            many=True)
+        return Response({
+            'cursor': encode_cursor(*position),
+            'has_more': len(events) > CHANGES_LIMIT,
+            'changed': serializer.data,
+            'deleted': [pk for _, pk, recipe in page if recipe is None],
+        })
+
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=(IsAuthenticated,))
+    def export(self, request):
+        '''Экшн-метод для потоковой выгрузки рецептов в формате NDJSON.'''
+        queryset = self.filter_queryset(self.get_queryset())
+        response = StreamingHttpResponse(
+            self.export_lines(queryset),
+            content_type='application/x-ndjson')
+        response['Content-Disposition'] = (
+            'attachment; filename="recipes.ndjson"')
+        return response
+
+    def export_lines(self, queryset):
+        '''
+        Генератор строк выгрузки.
+
+        Рецепты читаются порциями по первичному ключу, поэтому память
+        не растёт с размером выгрузки, а связи подгружаются
+        фиксированным числом запросов на порцию.
+        '''
+        queryset = queryset.select_related(None).prefetch_related(
+            None).prefetch_related('tags', 'recipe_ingredients').order_by('pk')
+        renderer = FastJSONRenderer()
+        last_pk = 0
+        while True:
+            chunk = list(queryset.filter(pk__gt=last_pk)[:EXPORT_CHUNK_SIZE])
+            if not chunk:
+                return
+            serializer = RecipeExportSerializer(
+                chunk, many=True, context={'request': self.request})
+            for item in serializer.data:
+                yield renderer.render(item) + b'\n'
+            last_pk = chunk[-1].pk
+
     @action(detail=True,
             methods=['get'],
             url_path='get-link',
@@ -159,6 +386,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+@async_capable
 def redirect_from_short_url(request, short_url):
     '''Вью-функция для перенаправления с коротких ссылок на рецепты.'''
     shortened_url_instance = get_object_or_404(ShortenedURL,
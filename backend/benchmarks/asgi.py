@@ -0,0 +1,199 @@
+'''
+Пропускная способность при одновременных медленных клиентах:
+синхронные воркеры WSGI против обработчика ASGI с асинхронными вью.
+'''
+import asyncio
+import io
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+from time import perf_counter
+from urllib.parse import urlencode
+
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.db.models import Count
+from rest_framework.authtoken.models import Token
+
+from benchmarks.endpoints import throttle_rates
+from benchmarks.runner import summarize
+from foodgram_backend.async_support import ASGIHandler
+from recipes.models import Ingredient, ShortenedURL
+
+
+User = get_user_model()
+
+# Одновременные клиенты и синхронные воркеры (как gunicorn --workers 4).
+CLIENTS = 50
+SYNC_WORKERS = 4
+# Задержка сети клиента на передачу тела запроса и на чтение ответа.
+CLIENT_DELAY = 0.02
+
+Probe = namedtuple('Probe', ('name', 'path', 'query', 'token'),
+                   defaults=('', None))
+
+
+def build_probes(token):
+    '''Сценарии на асинхронных вью; данные только читаются.'''
+    probes = [Probe('tags', '/api/tags/')]
+    ingredient = Ingredient.objects.first()
+    if ingredient is not None:
+        probes.append(Probe('ingredients-search', '/api/ingredients/',
+                            urlencode({'name': ingredient.name[:2]})))
+    short_url = ShortenedURL.objects.first()
+    if short_url is not None:
+        probes.append(Probe('short-link', f'/s/{short_url.short_url}/'))
+    if token is not None:
+        probes.append(Probe('shopping-list',
+                            '/api/recipes/download_shopping_cart/',
+                            token=token))
+    return probes
+
+
+def wsgi_environ(probe):
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': probe.path,
+        'QUERY_STRING': probe.query,
+        'SCRIPT_NAME': '',
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'localhost',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': io.StringIO(),
+        'wsgi.url_scheme': 'http',
+    }
+    if probe.token:
+        environ['HTTP_AUTHORIZATION'] = f'Token {probe.token}'
+    return environ
+
+
+def asgi_scope(probe):
+    headers = [(b'host', b'localhost')]
+    if probe.token:
+        headers.append((b'authorization', f'Token {probe.token}'.encode()))
+    return {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': probe.path,
+        'root_path': '',
+        'query_string': probe.query.encode(),
+        'headers': headers,
+        'client': ('127.0.0.1', 50000),
+        'server': ('localhost', 80),
+    }
+
+
+def run_wsgi(probe, total):
+    '''
+    CLIENTS клиентов в потоках и SYNC_WORKERS воркеров: воркер занят
+    запросом, пока клиент передаёт тело и читает ответ.
+    '''
+    handler = WSGIHandler()
+    statuses = set()
+
+    def start_response(status, headers, exc_info=None):
+        statuses.add(int(status.split()[0]))
+
+    def work():
+        time.sleep(CLIENT_DELAY)
+        body = handler(wsgi_environ(probe), start_response)
+        try:
+            for _ in body:
+                pass
+        finally:
+            body.close()
+        time.sleep(CLIENT_DELAY)
+
+    def serve(_):
+        # Очередь пула потоков общая и упорядоченная, как очередь
+        # соединений, ожидающих свободного воркера.
+        start = perf_counter()
+        workers.submit(work).result()
+        return perf_counter() - start
+
+    workers = ThreadPoolExecutor(max_workers=SYNC_WORKERS)
+    with workers, ThreadPoolExecutor(max_workers=CLIENTS) as clients:
+        start = perf_counter()
+        latencies = list(clients.map(serve, range(total)))
+    return latencies, perf_counter() - start, statuses
+
+
+def run_asgi(probe, total):
+    '''CLIENTS клиентов в одном цикле событий с ASGIHandler.'''
+    handler = ASGIHandler()
+    statuses = set()
+    latencies = []
+    remaining = count(total, -1)
+
+    async def receive():
+        await asyncio.sleep(CLIENT_DELAY)
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            statuses.add(message['status'])
+        elif not message.get('more_body'):
+            await asyncio.sleep(CLIENT_DELAY)
+
+    async def client():
+        while next(remaining) > 0:
+            start = perf_counter()
+            await handler(asgi_scope(probe), receive, send)
+            latencies.append(perf_counter() - start)
+
+    async def main():
+        await asyncio.gather(*(client() for _ in range(CLIENTS)))
+
+    start = perf_counter()
+    asyncio.run(main())
+    return latencies, perf_counter() - start, statuses
+
+
+def token_for_cart_owner():
+    '''Токен пользователя с самым большим списком покупок.'''
+    user = User.objects.annotate(
+        cart_count=Count('shopping_carts')).filter(
+        cart_count__gt=0).order_by('-cart_count', 'id').first()
+    if user is None:
+        return None, False
+    return Token.objects.get_or_create(user=user)
+
+
+def run(command, options):
+    '''
+    Каждый сценарий выполняется --repeat раз обоими серверами.
+    Данные читаются из базы без транзакции-песочницы: потоки
+    воркеров работают через собственные соединения.
+    '''
+    results = {}
+    token, created = token_for_cart_owner()
+    try:
+        with throttle_rates(options['with_throttling']):
+            for probe in build_probes(token and token.key):
+                for model, runner in (('wsgi', run_wsgi),
+                                      ('asgi', run_asgi)):
+                    name = f'{probe.name}-{model}'
+                    if options['filter'] and options['filter'] not in name:
+                        continue
+                    if options['warmup']:
+                        runner(probe, options['warmup'])
+                    latencies, elapsed, statuses = runner(
+                        probe, options['repeat'])
+                    result = summarize(latencies)
+                    result['rps'] = round(len(latencies) / elapsed, 1)
+                    result['status'] = sorted(statuses)
+                    results[name] = result
+                    command.stdout.write(
+                        f'{name}: {result["rps"]} запросов/с, '
+                        f'p50 {result["p50_ms"]} ms, '
+                        f'статус {result["status"]}')
+    finally:
+        if created:
+            token.delete()
+    return results
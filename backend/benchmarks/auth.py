@@ -0,0 +1,80 @@
+'''Пропускная способность регистрации и входа по токену для хешеров.'''
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import Client, override_settings
+from django.utils.module_loading import import_string
+
+from benchmarks.endpoints import Endpoint, request, sandbox
+from benchmarks.runner import measure
+
+
+User = get_user_model()
+
+PASSWORD = 'Auth-benchmark-password-1'
+
+
+def is_available(hasher_path):
+    '''Хешеры argon2 и bcrypt работают только с установленным пакетом.'''
+    hasher = import_string(hasher_path)()
+    if not hasher.library:
+        return True
+    try:
+        hasher._load_library()
+    except ValueError:
+        return False
+    return True
+
+
+def build_endpoints(name):
+    user = User.objects.create_user(
+        username=f'login_{name}', email=f'login_{name}@example.com',
+        first_name='Вход', last_name='Бенчмарк', password=PASSWORD)
+    return [
+        Endpoint(f'signup-{name}', 'post', '/api/users/', {
+            'email': f'signup_{name}@example.com',
+            'username': f'signup_{name}',
+            'first_name': 'Регистрация',
+            'last_name': 'Бенчмарк',
+            'password': PASSWORD,
+        }, auth=False),
+        Endpoint(f'token-login-{name}', 'post', '/api/auth/token/login/', {
+            'email': user.email,
+            'password': PASSWORD,
+        }, auth=False),
+    ]
+
+
+def run(command, options):
+    '''
+    Регистрация и вход с каждым доступным хешером. Изменения каждого
+    запроса откатываются, поэтому одни и те же данные можно отправлять
+    повторно.
+    '''
+    results = {}
+    client = Client(HTTP_HOST='localhost')
+    with sandbox(options['with_throttling']):
+        for name, hasher in settings.PASSWORD_HASHER_CHOICES.items():
+            if not is_available(hasher):
+                command.stderr.write(f'Хешер {name} недоступен: '
+                                     'не установлен пакет.')
+                continue
+            with override_settings(PASSWORD_HASHERS=[hasher]):
+                for endpoint in build_endpoints(name):
+                    if (options['filter']
+                            and options['filter'] not in endpoint.name):
+                        continue
+                    statuses = set()
+
+                    def call():
+                        statuses.add(request(client, endpoint, None))
+
+                    result = measure(call, options['repeat'],
+                                     options['warmup'])
+                    result['status'] = sorted(statuses)
+                    result['rps'] = round(1000 / result['mean_ms'], 1)
+                    results[endpoint.name] = result
+                    command.stdout.write(
+                        f'{endpoint.name}: p50 {result["p50_ms"]} ms, '
+                        f'{result["rps"]} запросов/с в один поток, '
+                        f'статус {result["status"]}')
+    return results
@@ -0,0 +1,230 @@
+'''Бенчмарк всех эндпоинтов API через тестовый клиент Django.'''
+import json
+import tempfile
+from collections import namedtuple
+from contextlib import contextmanager, nullcontext
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef
+from django.test import Client, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.throttling import SimpleRateThrottle
+
+from benchmarks.runner import measure
+from recipes.models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                            ShortenedURL, Subscription, Tag)
+
+
+User = get_user_model()
+
+IMAGE = ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAgMAAABiey'
+         'waAAAACVBMVEUAAAD///9fX1/S0ecCAAAACXBIWXMAAA7EAAAOxAGVKw4bAAAACkl'
+         'EQVQImWNoAAAAggCByxOyYQAAAABJRU5ErkJggg==')
+
+Endpoint = namedtuple('Endpoint', ('name', 'method', 'path', 'data', 'auth'),
+                      defaults=(None, True))
+
+
+def build_context(password):
+    '''Выбор объектов набора данных, к которым обращаются сценарии.'''
+    user = User.objects.filter(
+        Exists(Recipe.objects.filter(author=OuterRef('pk')))
+    ).annotate(
+        cart_count=Count('shopping_carts')
+    ).order_by('-cart_count', 'id').first()
+    if user is None:
+        return None
+    recipe = Recipe.objects.filter(author=user).first()
+    other_recipe = Recipe.objects.exclude(author=user).exclude(
+        favorites__user=user).exclude(shopping_carts__user=user).first()
+    favorite = Favorite.objects.filter(user=user).first()
+    cart_item = ShoppingCart.objects.filter(user=user).first()
+    subscription = Subscription.objects.filter(follower=user).first()
+    not_followed = User.objects.exclude(pk=user.pk).exclude(
+        followings__follower=user).first()
+    ingredient = Ingredient.objects.first()
+    short_url = ShortenedURL.objects.filter(recipe=recipe).first()
+    if short_url is None:
+        short_url = ShortenedURL.objects.create(
+            recipe=recipe,
+            original_url=f'http://localhost/recipes/{recipe.pk}')
+    return {
+        'user': user,
+        'password': password,
+        'token': Token.objects.get_or_create(user=user)[0].key,
+        'recipe': recipe,
+        'other_recipe': other_recipe,
+        'favorite_recipe': favorite.recipe_id if favorite else None,
+        'cart_recipe': cart_item.recipe_id if cart_item else None,
+        'followed': subscription.following_id if subscription else None,
+        'not_followed': not_followed.pk if not_followed else None,
+        'ingredient': ingredient,
+        'tags': list(Tag.objects.values_list('slug', flat=True)[:2]),
+        'short_url': short_url.short_url,
+        'recipe_ids': list(
+            Recipe.objects.values_list('id', flat=True)[:20]),
+    }
+
+
+def build_endpoints(context):
+    user = context['user']
+    recipe = context['recipe'].pk
+    other = context['other_recipe'].pk if context['other_recipe'] else None
+    ingredient = context['ingredient']
+    recipe_body = {
+        'ingredients': [{'id': ingredient.pk, 'amount': 10}],
+        'tags': list(Tag.objects.values_list('id', flat=True)[:1]),
+        'name': 'Бенчмарк',
+        'image': IMAGE,
+        'text': 'Рецепт для бенчмарка.',
+        'cooking_time': 10,
+    }
+    tags = '&'.join(f'tags={slug}' for slug in context['tags'])
+    endpoints = [
+        Endpoint('recipes-list-anon', 'get', '/api/recipes/', auth=False),
+        Endpoint('recipes-list', 'get', '/api/recipes/'),
+        Endpoint('recipes-list-tags', 'get', f'/api/recipes/?{tags}'),
+        Endpoint('recipes-list-favorited', 'get',
+                 '/api/recipes/?is_favorited=1'),
+        Endpoint('recipes-list-cart', 'get',
+                 '/api/recipes/?is_in_shopping_cart=1'),
+        Endpoint('recipes-list-author', 'get',
+                 f'/api/recipes/?author={user.pk}'),
+        Endpoint('recipes-detail', 'get', f'/api/recipes/{recipe}/'),
+        Endpoint('recipes-create', 'post', '/api/recipes/', recipe_body),
+        Endpoint('recipes-update', 'patch', f'/api/recipes/{recipe}/',
+                 recipe_body),
+        Endpoint('recipes-delete', 'delete', f'/api/recipes/{recipe}/'),
+        Endpoint('recipes-get-link', 'get',
+                 f'/api/recipes/{recipe}/get-link/'),
+        Endpoint('recipes-download-shopping-cart', 'get',
+                 '/api/recipes/download_shopping_cart/'),
+        Endpoint('recipes-export', 'get',
+                 f'/api/recipes/export/?author={user.pk}'),
+        Endpoint('recipes-changes', 'get',
+                 '/api/recipes/changes/?since=2000-01-01T00:00:00'),
+        Endpoint('recipes-batch', 'get', '/api/recipes/batch/?ids='
+                 + ','.join(map(str, context['recipe_ids']))),
+        Endpoint('ingredients-list', 'get', '/api/ingredients/', auth=False),
+        Endpoint('ingredients-search', 'get',
+                 f'/api/ingredients/?name={ingredient.name[:2]}', auth=False),
+        Endpoint('ingredients-detail', 'get',
+                 f'/api/ingredients/{ingredient.pk}/', auth=False),
+        Endpoint('tags-list', 'get', '/api/tags/', auth=False),
+        Endpoint('users-list', 'get', '/api/users/', auth=False),
+        Endpoint('users-detail', 'get', f'/api/users/{user.pk}/'),
+        Endpoint('users-me', 'get', '/api/users/me/'),
+        Endpoint('users-create', 'post', '/api/users/', {
+            'email': 'benchmark@example.com',
+            'username': 'benchmark',
+            'first_name': 'Бенч',
+            'last_name': 'Марк',
+            'password': 'Benchmark-password-1',
+        }, auth=False),
+        Endpoint('users-set-password', 'post', '/api/users/set_password/', {
+            'current_password': context['password'],
+            'new_password': 'Benchmark-password-2',
+        }),
+        Endpoint('users-avatar', 'put', '/api/users/me/avatar/',
+                 {'avatar': IMAGE}),
+        Endpoint('users-subscriptions', 'get',
+                 '/api/users/subscriptions/?recipes_limit=3'),
+        Endpoint('auth-token-login', 'post', '/api/auth/token/login/', {
+            'email': user.email,
+            'password': context['password'],
+        }, auth=False),
+        Endpoint('auth-token-logout', 'post', '/api/auth/token/logout/'),
+        Endpoint('short-link-redirect', 'get',
+                 f'/s/{context["short_url"]}/', auth=False),
+    ]
+    if other:
+        endpoints += [
+            Endpoint('recipes-favorite-add', 'post',
+                     f'/api/recipes/{other}/favorite/'),
+            Endpoint('recipes-shopping-cart-add', 'post',
+                     f'/api/recipes/{other}/shopping_cart/'),
+        ]
+    if context['favorite_recipe']:
+        endpoints.append(Endpoint(
+            'recipes-favorite-remove', 'delete',
+            f'/api/recipes/{context["favorite_recipe"]}/favorite/'))
+    if context['cart_recipe']:
+        endpoints.append(Endpoint(
+            'recipes-shopping-cart-remove', 'delete',
+            f'/api/recipes/{context["cart_recipe"]}/shopping_cart/'))
+    if context['not_followed']:
+        endpoints.append(Endpoint(
+            'users-subscribe', 'post',
+            f'/api/users/{context["not_followed"]}/subscribe/'))
+    if context['followed']:
+        endpoints.append(Endpoint(
+            'users-unsubscribe', 'delete',
+            f'/api/users/{context["followed"]}/subscribe/'))
+    return endpoints
+
+
+def request(client, endpoint, token):
+    '''Запрос с полным чтением тела; изменения данных откатываются.'''
+    headers = {'HTTP_AUTHORIZATION': f'Token {token}'} if endpoint.auth else {}
+    body = json.dumps(endpoint.data) if endpoint.data is not None else ''
+    with transaction.atomic():
+        response = client.generic(endpoint.method.upper(), endpoint.path,
+                                  body, content_type='application/json',
+                                  **headers)
+        if response.streaming:
+            # Обёртка тестового клиента закрывает ответ после чтения.
+            b''.join(response.streaming_content)
+        if endpoint.method != 'get':
+            transaction.set_rollback(True)
+    return response.status_code
+
+
+def throttle_rates(with_throttling=False):
+    '''Отключение ограничения частоты запросов, если оно не запрошено.'''
+    if with_throttling:
+        return nullcontext()
+    return mock.patch.dict(SimpleRateThrottle.THROTTLE_RATES,
+                           {'user': None, 'anon': None})
+
+
+@contextmanager
+def sandbox(with_throttling=False):
+    '''
+    Окружение прогона: транзакция, которая затем откатывается,
+    и временный MEDIA_ROOT для загружаемых изображений.
+    '''
+    throttling = throttle_rates(with_throttling)
+    with throttling, tempfile.TemporaryDirectory() as media_root:
+        with override_settings(MEDIA_ROOT=media_root), transaction.atomic():
+            yield
+            transaction.set_rollback(True)
+
+
+def run(command, options):
+    '''Прогон всех сценариев без изменения набора данных.'''
+    results = {}
+    with sandbox(options['with_throttling']):
+        context = build_context(options['password'])
+        if context is None:
+            command.stderr.write('Нет пользователей с рецептами: '
+                                 'запустите generate_dataset.')
+            return results
+        client = Client(HTTP_HOST='localhost')
+        for endpoint in build_endpoints(context):
+            if options['filter'] and options['filter'] not in endpoint.name:
+                continue
+            statuses = set()
+
+            def call():
+                statuses.add(request(client, endpoint, context['token']))
+
+            result = measure(call, options['repeat'], options['warmup'])
+            result['status'] = sorted(statuses)
+            results[endpoint.name] = result
+            command.stdout.write(
+                f'{endpoint.name}: p50 {result["p50_ms"]} ms, '
+                f'{result["queries"]} запросов, '
+                f'статус {result["status"]}')
+    return results
@@ -0,0 +1,70 @@
+'''Рендеринг и разбор JSON: стандартные классы DRF против orjson.'''
+import base64
+import io
+import json
+import os
+
+from django.test import Client
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api.constants import MAX_PAGE_SIZE, PAGE_SIZE_QUERY_PARAM
+from api.parsers import FastJSONParser
+from api.renderers import FastJSONRenderer, orjson
+from benchmarks.endpoints import sandbox
+from benchmarks.runner import measure
+
+
+# Размер тела POST-запроса рецепта с изображением в Base64.
+POST_BODY_SIZE = 5 * 1024 * 1024
+
+
+def recipe_page():
+    '''Данные полной страницы списка рецептов, как их отдаёт API.'''
+    response = Client(HTTP_HOST='localhost').get(
+        '/api/recipes/', {PAGE_SIZE_QUERY_PARAM: MAX_PAGE_SIZE})
+    return response.data
+
+
+def recipe_post_body():
+    image = base64.b64encode(os.urandom(POST_BODY_SIZE * 3 // 4)).decode()
+    return json.dumps({
+        'ingredients': [{'id': id, 'amount': 10} for id in range(1, 21)],
+        'tags': [1, 2],
+        'image': f'data:image/png;base64,{image}',
+        'name': 'Рецепт',
+        'text': 'Описание ' * 100,
+        'cooking_time': 30,
+    }).encode()
+
+
+def run(command, options):
+    '''
+    Рендеринг страницы списка рецептов и разбор тела POST-запроса
+    рецепта размером 5 МБ каждым из классов.
+    '''
+    results = {}
+    with sandbox(options['with_throttling']):
+        page = recipe_page()
+    if not page['results']:
+        command.stderr.write('Нет рецептов: запустите generate_dataset.')
+        return results
+    body = recipe_post_body()
+    codecs = {'stdlib': (JSONRenderer(), JSONParser())}
+    if orjson is not None:
+        codecs['orjson'] = (FastJSONRenderer(), FastJSONParser())
+    else:
+        command.stderr.write('Пакет orjson не установлен.')
+    for codec, (renderer, parser) in codecs.items():
+        scenarios = {
+            f'render-recipe-page-{codec}': lambda: renderer.render(page),
+            f'parse-recipe-post-{codec}': lambda: parser.parse(
+                io.BytesIO(body)),
+        }
+        for name, func in scenarios.items():
+            if options['filter'] and options['filter'] not in name:
+                continue
+            result = measure(func, options['repeat'], options['warmup'])
+            results[name] = result
+            command.stdout.write(f'{name}: p50 {result["p50_ms"]} ms')
+    return results
@@ -0,0 +1,53 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.query_plans import audit, format_report
+from benchmarks.runner import metadata
+from recipes.management.commands.generate_dataset import DEFAULT_PASSWORD
+
+
+class Command(BaseCommand):
+    help = ('Аудит планов выполнения SQL-запросов эндпоинтов API: полные '
+            'просмотры таблиц, фильтры без индексов и сортировки во '
+            'временных структурах с привязкой к представлению и '
+            'сериализатору.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--analyze', action='store_true',
+            help='EXPLAIN ANALYZE на PostgreSQL: фактические строки и '
+                 'сортировки с выгрузкой на диск.')
+        parser.add_argument(
+            '--min-rows', type=int, default=500,
+            help='Не сообщать о просмотре таблиц меньшего размера.')
+        parser.add_argument(
+            '--filter', default='',
+            help='Проверять только сценарии, имя которых содержит строку.')
+        parser.add_argument('--output', help='Файл для сохранения JSON.')
+        parser.add_argument(
+            '--password', default=DEFAULT_PASSWORD,
+            help='Пароль пользователей, созданных generate_dataset.')
+        parser.add_argument(
+            '--fail-on-findings', action='store_true',
+            help='Завершаться с ошибкой, если найдены замечания.')
+
+    def handle(self, *args, **options):
+        try:
+            statements = audit(self, options)
+        except NotImplementedError as error:
+            raise CommandError(error)
+        self.stdout.write(format_report(statements))
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump({
+                    'metadata': metadata(analyze=options['analyze'],
+                                         min_rows=options['min_rows']),
+                    'statements': [statement.as_dict()
+                                   for statement in statements],
+                }, file, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(
+                f'Отчёт сохранён в {options["output"]}.'))
+        if options['fail_on_findings'] and any(
+                statement.findings for statement in statements):
+            raise CommandError('Найдены замечания к планам запросов.')
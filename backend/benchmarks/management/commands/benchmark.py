@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks import (asgi, auth, endpoints, json_codec, serializers,
+                        throttling)
+from benchmarks.runner import (format_table, load_results, metadata,
+                               save_results)
+from recipes.management.commands.generate_dataset import DEFAULT_PASSWORD
+
+
+SUITES = {
+    'asgi': asgi.run,
+    'auth': auth.run,
+    'endpoints': endpoints.run,
+    'json': json_codec.run,
+    'serializers': serializers.run,
+    'throttling': throttling.run,
+}
+
+
+class Command(BaseCommand):
+    help = ('Бенчмарк: задержки p50/p95/p99, число SQL-запросов и пиковая '
+            'память с сохранением результатов в JSON для сравнения.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('suite', nargs='?', default='endpoints',
+                            choices=sorted(SUITES))
+        parser.add_argument('--repeat', type=int, default=30)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument(
+            '--filter', default='',
+            help='Запускать только сценарии, имя которых содержит строку.')
+        parser.add_argument('--output', help='Файл для сохранения JSON.')
+        parser.add_argument(
+            '--compare', help='JSON предыдущего прогона для сравнения.')
+        parser.add_argument(
+            '--password', default=DEFAULT_PASSWORD,
+            help='Пароль пользователей, созданных generate_dataset.')
+        parser.add_argument(
+            '--with-throttling', action='store_true',
+            help='Не отключать ограничение частоты запросов.')
+        parser.add_argument(
+            '--redis-url',
+            help='Сравнить также хранилище Redis (набор throttling).')
+
+    def handle(self, *args, **options):
+        if options['repeat'] <= 0:
+            raise CommandError('--repeat должен быть положительным.')
+        previous = (load_results(options['compare'])
+                    if options['compare'] else None)
+        results = SUITES[options['suite']](self, options)
+        self.stdout.write(format_table(results, previous))
+        if options['output']:
+            save_results(options['output'], options['suite'], results,
+                         metadata(repeat=options['repeat']))
+            self.stdout.write(self.style.SUCCESS(
+                f'Результаты сохранены в {options["output"]}.'))
@@ -0,0 +1,358 @@
+'''
+Аудит планов выполнения SQL-запросов, которые выполняют эндпоинты API.
+
+Сценарии бенчмарка воспроизводятся по одному разу, каждый уникальный
+запрос пропускается через EXPLAIN, а в плане ищутся полные просмотры
+таблиц, фильтры без индекса и сортировки во временных структурах.
+'''
+import json
+import re
+import sys
+from urllib.parse import urlsplit
+
+from django.db import DatabaseError, connection, transaction
+from django.test import Client
+from django.urls import Resolver404, resolve
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+from benchmarks.endpoints import (build_context, build_endpoints, request,
+                                  sandbox)
+
+
+PROJECT_PACKAGES = ('api', 'users', 'recipes')
+EXPLAINED_STATEMENTS = ('SELECT', 'UPDATE', 'DELETE')
+
+SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\S+)(?: AS (\S+))?(.*)$')
+SQLITE_TEMP_SORT = re.compile(r'USE TEMP B-TREE FOR (.+)$')
+JOIN_OPERAND = re.compile(r'=\s*\(*(?:"\w+"|[A-Z]\d+)\."\w+"')
+CLAUSES_AFTER_WHERE = (' ORDER BY ', ' GROUP BY ', ' HAVING ', ' LIMIT ')
+SQL_ALIAS = re.compile(r'"(\w+)" (?:AS )?([A-Z]\d+)\b')
+
+FINDINGS = {
+    'missing_index': 'фильтр по столбцам без индекса',
+    'full_scan': 'полный просмотр таблицы',
+    'temp_sort': 'сортировка во временной структуре',
+    'sort_spill': 'сортировка с выгрузкой на диск',
+}
+
+
+class Statement:
+    '''Уникальный SQL-запрос и места, из которых он выполнялся.'''
+
+    def __init__(self, sql, params):
+        self.sql = sql
+        self.params = params
+        self.count = 0
+        self.origins = set()
+        self.plan = None
+        self.error = None
+        self.findings = []
+
+    def as_dict(self):
+        return {
+            'sql': self.sql,
+            'count': self.count,
+            'origins': [dict(zip(('endpoint', 'view', 'serializer',
+                                  'source'), origin))
+                        for origin in sorted(self.origins, key=str)],
+            'plan': self.plan,
+            'error': self.error,
+            'findings': self.findings,
+        }
+
+
+def describe_object(obj):
+    if isinstance(obj, ListSerializer):
+        return f'{type(obj.child).__name__}(many=True)'
+    return type(obj).__name__
+
+
+def is_project_module(module):
+    return module.split('.')[0] in PROJECT_PACKAGES
+
+
+def find_origin(frame):
+    '''
+    Ближайший к запросу код проекта и сериализатор в стеке вызовов.
+
+    Методы классов DRF и Django учитываются по классу экземпляра,
+    поэтому ленивый queryset, вычисленный внутри ListSerializer,
+    приписывается сериализатору проекта, а не коду фреймворка.
+    '''
+    serializer = source = None
+    while frame is not None and (serializer is None or source is None):
+        obj = frame.f_locals.get('self')
+        name = frame.f_code.co_name
+        if serializer is None and isinstance(obj, BaseSerializer):
+            serializer = describe_object(obj)
+        if source is None:
+            if obj is not None and is_project_module(
+                    type(getattr(obj, 'child', obj)).__module__):
+                source = f'{describe_object(obj)}.{name}'
+            elif is_project_module(frame.f_globals.get('__name__', '')):
+                source = f'{frame.f_globals["__name__"]}.{name}'
+        frame = frame.f_back
+    return serializer, source
+
+
+def view_name(endpoint):
+    '''Класс представления и действие, обрабатывающие запрос.'''
+    try:
+        match = resolve(urlsplit(endpoint.path).path)
+    except Resolver404:
+        return None
+    view = getattr(match.func, 'cls', None) or getattr(
+        match.func, 'view_class', None)
+    if view is None:
+        return match.func.__name__
+    actions = getattr(match.func, 'actions', None) or {}
+    action = actions.get(endpoint.method, endpoint.method)
+    return f'{view.__name__}.{action}'
+
+
+class StatementCollector:
+    '''Обёртка выполнения запросов, собирающая уникальные SQL.'''
+
+    def __init__(self):
+        self.statements = {}
+        self.endpoint = None
+        self.view = None
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith(
+                EXPLAINED_STATEMENTS):
+            statement = self.statements.get(sql)
+            if statement is None:
+                statement = self.statements[sql] = Statement(sql, params)
+            statement.count += 1
+            statement.origins.add(
+                (self.endpoint, self.view) + find_origin(sys._getframe(1)))
+        return execute(sql, params, many, context)
+
+
+def collect_statements(endpoints, token):
+    collector = StatementCollector()
+    client = Client(HTTP_HOST='localhost')
+    for endpoint in endpoints:
+        collector.endpoint = endpoint.name
+        collector.view = view_name(endpoint)
+        with connection.execute_wrapper(collector):
+            request(client, endpoint, token)
+    return list(collector.statements.values())
+
+
+def explain(statement, analyze=False):
+    '''
+    План запроса в виде, пригодном для разбора.
+
+    EXPLAIN ANALYZE выполняет запрос, поэтому он запускается в точке
+    сохранения, которая затем откатывается.
+    '''
+    if connection.vendor == 'postgresql':
+        options = 'FORMAT JSON, ANALYZE, BUFFERS' if analyze else (
+            'FORMAT JSON')
+        prefix = f'EXPLAIN ({options}) '
+    elif connection.vendor == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    else:
+        raise NotImplementedError(
+            f'EXPLAIN для {connection.vendor} не поддерживается.')
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + statement.sql, statement.params)
+            rows = cursor.fetchall()
+        transaction.set_rollback(True)
+    if connection.vendor == 'postgresql':
+        plan = rows[0][0]
+        return json.loads(plan) if isinstance(plan, str) else plan
+    return [row[-1] for row in rows]
+
+
+class TableSizes(dict):
+    '''Число строк в таблицах с кешированием на время аудита.'''
+
+    def __missing__(self, table):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}')
+            self[table] = cursor.fetchone()[0]
+        return self[table]
+
+
+def top_level_where(sql):
+    '''Условие WHERE внешнего запроса без ORDER BY, GROUP BY и LIMIT.'''
+    depth = 0
+    start = None
+    upper = sql.upper()
+    for position, char in enumerate(upper):
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif depth == 0 and char == ' ':
+            if start is None and upper.startswith(' WHERE ', position):
+                start = position
+            elif start is not None and upper.startswith(
+                    CLAUSES_AFTER_WHERE, position):
+                return sql[start:position]
+    return sql[start:] if start is not None else ''
+
+
+def filtered_columns(sql, names):
+    '''Столбцы таблицы, которые встречаются в условиях WHERE.'''
+    # Правые части сравнений — это условия соединения и коррелированных
+    # подзапросов, а не фильтры по таблице.
+    where = JOIN_OPERAND.sub('=', top_level_where(sql))
+    pattern = '|'.join(
+        f'"{re.escape(name)}"' if not re.fullmatch(r'[A-Z]\d+', name)
+        else rf'\b{name}' for name in names)
+    return sorted(set(re.findall(rf'(?:{pattern})\."(\w+)"', where)))
+
+
+def sqlite_findings(statement, min_rows, sizes):
+    aliases = dict(
+        (alias, table) for table, alias in SQL_ALIAS.findall(statement.sql))
+    findings = []
+    largest = 0
+    for detail in statement.plan:
+        if SQLITE_TEMP_SORT.search(detail):
+            findings.append({'kind': 'temp_sort', 'table': None,
+                             'detail': detail})
+            continue
+        scan = SQLITE_SCAN.match(detail)
+        if scan is None or not scan.group(1).isidentifier():
+            continue
+        name = scan.group(1)
+        table = aliases.get(name, name)
+        try:
+            rows = sizes[table]
+        except DatabaseError:
+            continue
+        largest = max(largest, rows)
+        if rows < min_rows:
+            continue
+        columns = filtered_columns(statement.sql, {table, name})
+        # Полный просмотр индекса без фильтра — это чтение в порядке
+        # индекса; с фильтром индекс не помогает отбирать строки.
+        if 'INDEX' in scan.group(3) and not columns:
+            continue
+        findings.append({
+            'kind': 'missing_index' if columns else 'full_scan',
+            'table': table,
+            'columns': columns,
+            'rows': rows,
+            'detail': detail,
+        })
+    # Сортировка выборки из небольших таблиц или по индексу не стоит
+    # внимания: временная структура помещается в память.
+    if largest < min_rows:
+        findings = [finding for finding in findings
+                    if finding['kind'] != 'temp_sort']
+    return findings
+
+
+def walk_plan(node):
+    yield node
+    for child in node.get('Plans', ()):
+        yield from walk_plan(child)
+
+
+def postgresql_findings(statement, min_rows, sizes):
+    findings = []
+    for root in statement.plan:
+        for node in walk_plan(root['Plan']):
+            node_type = node['Node Type']
+            if node_type == 'Seq Scan':
+                rows = node.get('Actual Rows', node['Plan Rows']) + node.get(
+                    'Rows Removed by Filter', 0)
+                if rows < min_rows:
+                    continue
+                condition = node.get('Filter')
+                findings.append({
+                    'kind': 'missing_index' if condition else 'full_scan',
+                    'table': node['Relation Name'],
+                    'columns': sorted(set(re.findall(
+                        r'\(?(\w+) (?:=|~~|>|<|IS)', condition or ''))),
+                    'rows': rows,
+                    'detail': condition or node_type,
+                })
+            elif node_type in ('Sort', 'Incremental Sort') and node.get(
+                    'Sort Space Type') == 'Disk':
+                findings.append({
+                    'kind': 'sort_spill',
+                    'table': None,
+                    'detail': f'{node.get("Sort Method")}, '
+                              f'{node.get("Sort Space Used")} kB',
+                })
+    return findings
+
+
+def analyze_statement(statement, analyze, min_rows, sizes):
+    try:
+        statement.plan = explain(statement, analyze)
+    except DatabaseError as error:
+        statement.error = str(error).strip()
+        return
+    if connection.vendor == 'postgresql':
+        statement.findings = postgresql_findings(statement, min_rows, sizes)
+    else:
+        statement.findings = sqlite_findings(statement, min_rows, sizes)
+
+
+def audit(command, options):
+    '''Сбор запросов всех сценариев и разбор их планов.'''
+    with sandbox():
+        context = build_context(options['password'])
+        if context is None:
+            command.stderr.write('Нет пользователей с рецептами: '
+                                 'запустите generate_dataset.')
+            return []
+        endpoints = [endpoint for endpoint in build_endpoints(context)
+                     if options['filter'] in endpoint.name]
+        statements = collect_statements(endpoints, context['token'])
+        sizes = TableSizes()
+        for statement in statements:
+            analyze_statement(statement, options['analyze'],
+                              options['min_rows'], sizes)
+    return statements
+
+
+def format_origin(origin):
+    endpoint, view, serializer, source = origin
+    parts = [endpoint, view or '?']
+    if serializer:
+        parts.append(serializer)
+    if source and not source.startswith(parts[-1]):
+        parts.append(source)
+    return ' → '.join(parts)
+
+
+def format_report(statements, sql_width=300):
+    lines = []
+    flagged = [statement for statement in statements if statement.findings]
+    for statement in flagged:
+        for finding in statement.findings:
+            title = f'[{finding["kind"]}] {FINDINGS[finding["kind"]]}'
+            if finding['table']:
+                title += f': {finding["table"]}'
+            if finding.get('columns'):
+                title += f' ({", ".join(finding["columns"])})'
+            if 'rows' in finding:
+                title += f', строк: {finding["rows"]}'
+            lines.append(title)
+            lines.append(f'  План: {finding["detail"]}')
+        sql = statement.sql
+        if len(sql) > sql_width:
+            sql = sql[:sql_width] + '…'
+        lines.append(f'  SQL (выполнен {statement.count} раз): {sql}')
+        for origin in sorted(statement.origins, key=str):
+            lines.append(f'  Источник: {format_origin(origin)}')
+        lines.append('')
+    for statement in statements:
+        if statement.error:
+            lines.append(f'[error] {statement.error}: {statement.sql}')
+    lines.append(
+        f'Уникальных запросов: {len(statements)}, '
+        f'с замечаниями: {len(flagged)}, '
+        f'замечаний: {sum(len(item.findings) for item in flagged)}.')
+    return '\n'.join(lines)
@@ -0,0 +1,110 @@
+'''Общие средства измерения и сохранения результатов бенчмарков.'''
+import json
+import math
+import platform
+import subprocess
+import tracemalloc
+from datetime import datetime, timezone
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connection
+
+from foodgram_backend.middleware import QueryStats, track_queries
+
+
+def percentile(values, percent):
+    '''Процентиль методом ближайшего ранга.'''
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def measure(func, repeat, warmup=0, memory=True):
+    '''
+    Многократный вызов func с замером задержки и числа SQL-запросов.
+
+    Пиковая память измеряется отдельным прогоном под tracemalloc,
+    чтобы трассировка не искажала задержку.
+    '''
+    for _ in range(warmup):
+        func()
+    latencies = []
+    queries = []
+    for _ in range(repeat):
+        stats = QueryStats()
+        with track_queries(stats):
+            start = perf_counter()
+            func()
+            latencies.append(perf_counter() - start)
+        queries.append(stats.count)
+    result = summarize(latencies)
+    result['queries'] = max(queries) if queries else 0
+    if memory:
+        tracemalloc.start()
+        try:
+            func()
+            result['memory_peak_kb'] = round(
+                tracemalloc.get_traced_memory()[1] / 1024, 1)
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def summarize(latencies):
+    return {
+        'repeat': len(latencies),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ('git', 'rev-parse', '--short', 'HEAD'), capture_output=True,
+            text=True, cwd=settings.BASE_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata(**extra):
+    return {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'database': connection.vendor,
+        **extra,
+    }
+
+
+def save_results(path, suite, results, meta):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump({'suite': suite, 'meta': meta, 'results': results},
+                  file, ensure_ascii=False, indent=2)
+
+
+def load_results(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)['results']
+
+
+def format_table(results, previous=None):
+    '''Таблица результатов с изменением p50 относительно прошлого прогона.'''
+    columns = ('p50_ms', 'p95_ms', 'p99_ms', 'queries', 'memory_peak_kb')
+    width = max([len(name) for name in results] + [10])
+    lines = [f'{"name":<{width}} ' + ' '.join(f'{c:>14}' for c in columns)
+             + (f' {"p50 delta":>10}' if previous else '')]
+    for name, result in results.items():
+        line = f'{name:<{width}} ' + ' '.join(
+            f'{result.get(column, ""):>14}' for column in columns)
+        old = (previous or {}).get(name)
+        if old and old.get('p50_ms'):
+            change = (result['p50_ms'] - old['p50_ms']) / old['p50_ms']
+            line += f' {change:>+10.1%}'
+        lines.append(line)
+    return '\n'.join(lines)
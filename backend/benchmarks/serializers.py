@@ -0,0 +1,81 @@
+'''Сериализация ответов чтения: сериализаторы DRF против компилированных.'''
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import Exists, OuterRef, Prefetch
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.constants import MAX_BATCH_SIZE
+from api.read_serializers import (IngredientReadSerializer,
+                                  RecipeReadSerializer, TagReadSerializer)
+from api.serializers import (IngredientGetSerializer, RecipeGetSerializer,
+                             TagGetSerializer)
+from benchmarks.endpoints import build_context, sandbox
+from benchmarks.runner import measure
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, Tag)
+
+
+def recipes(user):
+    '''Рецепты с подгруженными связями, как их готовит вьюсет.'''
+    queryset = Recipe.objects.select_related('author').prefetch_related(
+        'tags',
+        Prefetch('recipe_ingredients',
+                 queryset=IngredientRecipe.objects.select_related(
+                     'ingredient')))
+    if user.is_authenticated:
+        queryset = queryset.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk'))))
+    return list(queryset[:MAX_BATCH_SIZE])
+
+
+def request_for(user):
+    request = Request(APIRequestFactory().get(
+        '/api/recipes/', HTTP_HOST='localhost'))
+    request.user = user
+    return request
+
+
+def run(command, options):
+    '''
+    Сериализация MAX_BATCH_SIZE рецептов (как в /api/recipes/batch/)
+    анонимно и от имени пользователя, а также полных справочников
+    ингредиентов и тегов. Данные загружаются заранее, поэтому
+    замеряется только построение представления.
+    '''
+    results = {}
+    with sandbox(options['with_throttling']):
+        context = build_context(options['password'])
+        if context is None:
+            command.stderr.write('Нет рецептов: запустите generate_dataset.')
+            return results
+        users = {'anonymous': AnonymousUser(), 'user': context['user']}
+        pages = {name: recipes(user) for name, user in users.items()}
+        scenarios = {}
+        for codec, classes in (
+            ('drf', (RecipeGetSerializer, IngredientGetSerializer,
+                     TagGetSerializer)),
+            ('compiled', (RecipeReadSerializer, IngredientReadSerializer,
+                          TagReadSerializer)),
+        ):
+            recipe_class, ingredient_class, tag_class = classes
+            for name, user in users.items():
+                scenarios[f'recipes-{name}-{codec}'] = (
+                    lambda recipe_class=recipe_class, name=name, user=user:
+                    recipe_class(pages[name], many=True, context={
+                        'request': request_for(user)}).data)
+            scenarios[f'ingredients-{codec}'] = (
+                lambda ingredient_class=ingredient_class: ingredient_class(
+                    Ingredient.objects.all(), many=True).data)
+            scenarios[f'tags-{codec}'] = (
+                lambda tag_class=tag_class: tag_class(
+                    Tag.objects.all(), many=True).data)
+        for name, func in scenarios.items():
+            if options['filter'] and options['filter'] not in name:
+                continue
+            result = measure(func, options['repeat'], options['warmup'])
+            results[name] = result
+            command.stdout.write(f'{name}: p50 {result["p50_ms"]} ms')
+    return results
@@ -0,0 +1,60 @@
+'''Накладные расходы троттлинга на один запрос для разных хранилищ.'''
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import RequestFactory, override_settings
+from rest_framework.request import Request
+from rest_framework.throttling import SimpleRateThrottle, UserRateThrottle
+
+from api.throttling import UserSlidingWindowThrottle, get_store
+from benchmarks.runner import measure
+
+
+# Лимит не достигается за время прогона: измеряется только учёт запроса.
+BENCHMARK_RATE = '100000000/hour'
+
+
+def build_request():
+    request = Request(RequestFactory().get('/api/recipes/'))
+    request.user = SimpleNamespace(is_authenticated=True, pk=1)
+    return request
+
+
+def measure_throttle(throttle_class, options):
+    request = build_request()
+    throttle = throttle_class()
+    return measure(lambda: throttle.allow_request(request, None),
+                   options['repeat'], options['warmup'])
+
+
+def run(command, options):
+    '''
+    Сравнение стандартного UserRateThrottle (список меток времени в
+    кэше по умолчанию) со скользящим окном в каждом из хранилищ.
+    '''
+    results = {}
+    with tempfile.TemporaryDirectory() as directory, mock.patch.dict(
+            SimpleRateThrottle.THROTTLE_RATES, {'user': BENCHMARK_RATE}):
+        stores = {
+            'memory': 'memory://',
+            'sqlite': f'sqlite://{Path(directory) / "throttle.sqlite3"}',
+        }
+        if options['redis_url']:
+            stores['redis'] = options['redis_url']
+        cache.clear()
+        scenarios = [('throttle-drf-cache', UserRateThrottle, None)] + [
+            (f'throttle-{name}', UserSlidingWindowThrottle, url)
+            for name, url in stores.items()]
+        for name, throttle_class, url in scenarios:
+            if options['filter'] and options['filter'] not in name:
+                continue
+            get_store.cache_clear()
+            with override_settings(THROTTLE_STORE=url):
+                result = measure_throttle(throttle_class, options)
+            results[name] = result
+            command.stdout.write(f'{name}: p50 {result["p50_ms"]} ms')
+    get_store.cache_clear()
+    return results
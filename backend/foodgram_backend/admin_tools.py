@@ -0,0 +1,100 @@
+'''
+Общие средства для списков админки на больших таблицах.
+
+Счётчики связанных объектов считаются подзапросами, а не JOIN с
+GROUP BY: подзапрос вычисляется только для строк текущей страницы.
+Пагинатор не выполняет полный COUNT по большой таблице без фильтров
+в PostgreSQL, а берёт оценку числа строк из статистики планировщика.
+Удаление с большим числом зависимых строк выполняет сервис массового
+удаления без загрузки этих строк в память.
+'''
+from django.contrib.admin.options import csrf_protect_m
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils.functional import cached_property
+
+
+# Начиная с этого числа строк по статистике точный COUNT не выполняется.
+ESTIMATED_COUNT_THRESHOLD = 100_000
+
+
+def related_count(model, field):
+    '''Число строк model, ссылающихся полем field на текущий объект.'''
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by().values(field).annotate(count=Count('pk'))
+        .values('count')
+    ), 0)
+
+
+class EstimatedCountPaginator(Paginator):
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                    [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+            if row and row[0] >= ESTIMATED_COUNT_THRESHOLD:
+                return int(row[0])
+        return super().count
+
+
+class EstimatedCountAdminMixin:
+    '''Список без полного COUNT для строки «показать все».'''
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class BulkDeletionAdminMixin:
+    '''
+    Удаление через сервис массового удаления.
+
+    delete_objects(queryset) удаляет объекты, dependents(queryset)
+    возвращает querysets зависимых строк. Страница подтверждения
+    показывает число зависимых строк каждой модели вместо полного
+    списка, который пришлось бы загрузить в память.
+    '''
+
+    delete_objects = None
+    dependents = None
+
+    @csrf_protect_m
+    def delete_view(self, request, object_id, extra_context=None):
+        # Без общей транзакции: сервис удаляет пачками в своих транзакциях.
+        return self._delete_view(request, object_id, extra_context)
+
+    def delete_model(self, request, obj):
+        self.delete_objects(self.model._default_manager.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        self.delete_objects(queryset)
+
+    def get_deleted_objects(self, objs, request):
+        objs = list(objs)
+        queryset = self.model._default_manager.filter(
+            pk__in=[obj.pk for obj in objs])
+        merged = {}
+        for dependents in self.dependents(queryset):
+            model = dependents.model
+            merged[model] = (merged[model] | dependents
+                             if model in merged else dependents)
+        model_count = {self.model._meta.verbose_name_plural: len(objs)}
+        perms_needed = set()
+        for model, dependents in merged.items():
+            count = dependents.count()
+            if not count:
+                continue
+            model_count[model._meta.verbose_name_plural] = count
+            model_admin = self.admin_site._registry.get(model)
+            if (model_admin is not None
+                    and not model_admin.has_delete_permission(request)):
+                perms_needed.add(model._meta.verbose_name)
+        return [str(obj) for obj in objs], model_count, perms_needed, set()
@@ -9,8 +9,13 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram_backend.settings')
 
-application = get_asgi_application()
+# Как в get_asgi_application, но с обработчиком асинхронных вью.
+django.setup(set_prefix=False)
+
+from foodgram_backend.async_support import ASGIHandler  # noqa: E402
+
+application = ASGIHandler()
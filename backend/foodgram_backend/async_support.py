@@ -0,0 +1,294 @@
+'''
+Режим ASGI: асинхронные вью и обработчик запросов.
+
+Вью, помеченные async_capable, под ASGIHandler выполняются как
+асинхронные: блокирующая работа с базой данных уходит в пул из
+ASYNC_THREAD_POOL_SIZE потоков, а чтение тела запроса и отправка
+ответа медленному клиенту не занимают ни один поток. Под WSGI те же
+вью остаются синхронными и работают без изменений.
+
+Синхронный код остальных вью и промежуточных слоёв выполняется в одном
+из ASGI_REQUEST_THREADS постоянных потоков процесса. Поток занимается
+после чтения тела запроса и принадлежит запросу, пока ответ не готов
+к отправке, поэтому соединения с базой данных живут в нём по правилам
+CONN_MAX_AGE, как у синхронных воркеров. Запросы к асинхронным вью
+поток не занимают.
+'''
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import SyncToAsync, sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.handlers.asgi import ASGIHandler as DjangoASGIHandler
+from django.db import close_old_connections
+from django.urls import Resolver404, resolve
+
+from foodgram_backend.middleware import (active_query_stats,
+                                         attach_query_stats)
+
+
+# Внутренние атрибуты SyncToAsync, на которых построен RequestThread
+# (asgiref закреплён в requirements.txt).
+ASGIREF_INTERNALS = ('thread_sensitive_context', 'context_to_thread_executor')
+
+executor = ThreadPoolExecutor(max_workers=settings.ASYNC_THREAD_POOL_SIZE,
+                              thread_name_prefix='async-views')
+# Сигналы начала и конца запроса к асинхронной вью: с базой данных
+# такие запросы работают только в пуле executor.
+signal_thread = ThreadPoolExecutor(max_workers=1,
+                                   thread_name_prefix='asgi-signals')
+
+
+class RequestThreads:
+    '''
+    Постоянные потоки для синхронного кода запросов.
+
+    Каждый поток - исполнитель из одного потока. Запрос получает
+    свободный поток, а если все заняты, ждёт в очереди, как запрос
+    к занятым синхронным воркерам. Освободившийся поток отдаётся
+    первому ожидающему запросу.
+    '''
+
+    def __init__(self, size):
+        self.size = size
+        self.created = 0
+        self.idle = []
+        self.waiters = deque()
+
+    async def acquire(self):
+        if self.idle:
+            return self.idle.pop()
+        if self.created < self.size:
+            self.created += 1
+            return ThreadPoolExecutor(max_workers=1,
+                                      thread_name_prefix='asgi-request')
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            return await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(waiter.result())
+            raise
+
+    def release(self, thread):
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(thread)
+                return
+        self.idle.append(thread)
+
+
+request_threads = RequestThreads(settings.ASGI_REQUEST_THREADS)
+
+
+class RequestThread:
+    '''
+    Контекст запроса для sync_to_async(thread_sensitive=True).
+
+    asgiref выполняет синхронный код в исполнителе, привязанном
+    к контексту; здесь это поток из request_threads, который после
+    запроса возвращается в пул, а не завершается. Запрос к асинхронной
+    вью (shared) поток не занимает: его сигналы выполняются в общем
+    signal_thread.
+    '''
+
+    def __init__(self, shared=False):
+        self.shared = shared
+        self.thread = None
+        self.token = None
+
+    @staticmethod
+    def current():
+        return SyncToAsync.thread_sensitive_context.get(None)
+
+    async def __aenter__(self):
+        self.token = SyncToAsync.thread_sensitive_context.set(self)
+        if self.shared:
+            SyncToAsync.context_to_thread_executor[self] = signal_thread
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.release()
+        SyncToAsync.thread_sensitive_context.reset(self.token)
+
+    async def acquire(self):
+        if self.shared:
+            return
+        self.thread = await request_threads.acquire()
+        SyncToAsync.context_to_thread_executor[self] = self.thread
+
+    def release(self):
+        executor = SyncToAsync.context_to_thread_executor.pop(self, None)
+        if self.thread is not None:
+            request_threads.release(self.thread)
+        # Синхронный код вне занятого потока asgiref выполнил
+        # в собственном исполнителе, который больше не нужен.
+        if executor not in (None, self.thread, signal_thread):
+            executor.shutdown(wait=False)
+        self.thread = None
+
+
+def run_sync(func):
+    '''
+    Корутина, выполняющая блокирующую функцию в пуле потоков.
+
+    Соединения с базой данных потоков пула живут по правилам
+    CONN_MAX_AGE, как у синхронных воркеров, а запросы учитываются
+    счётчиками track_queries, открытыми в вызывающем запросе.
+    '''
+    def call(*args, **kwargs):
+        close_old_connections()
+        try:
+            with attach_query_stats(*active_query_stats.get()):
+                return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(call, thread_sensitive=False, executor=executor)
+
+
+def async_capable(view):
+    '''
+    Пометка синхронной вью, которую ASGIHandler вызывает асинхронно.
+
+    Вью и рендеринг её ответа выполняются одной задачей пула потоков.
+    '''
+    def respond(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if callable(getattr(response, 'render', None)):
+            response.render()
+        return response
+
+    run = run_sync(respond)
+
+    @wraps(view)
+    async def async_view(request, *args, **kwargs):
+        return await run(request, *args, **kwargs)
+
+    view.async_view = async_view
+    return view
+
+
+class ASGIHandler(DjangoASGIHandler):
+    '''Обработчик ASGI с асинхронными версиями помеченных вью.'''
+
+    def __init__(self):
+        missing = [name for name in ASGIREF_INTERNALS
+                   if not hasattr(SyncToAsync, name)]
+        if missing:
+            raise ImproperlyConfigured(
+                'Установленная версия asgiref не поддерживается: у '
+                f'SyncToAsync нет {", ".join(missing)}. Установите версию '
+                'из requirements.txt.')
+        super().__init__()
+
+    async def __call__(self, scope, receive, send):
+        # Без контекста Django 3.2 выполняет синхронный код всех
+        # запросов процесса в одном потоке.
+        async with RequestThread(shared=self.is_async_request(scope)):
+            await super().__call__(scope, receive, send)
+
+    def is_async_request(self, scope):
+        '''
+        Обработает ли запрос асинхронная вью без синхронного кода
+        вокруг неё. Синхронные промежуточные слои (метрики,
+        профилирование) выполняют всю цепочку в потоке запроса.
+        '''
+        if (scope['type'] != 'http'
+                or not asyncio.iscoroutinefunction(self._middleware_chain)):
+            return False
+        # Путь вычисляется так же, как path_info в ASGIRequest.
+        script_name = scope.get('root_path', '')
+        path = scope['path']
+        if script_name and path.startswith(script_name):
+            path = path[len(script_name):]
+        try:
+            return hasattr(resolve(path).func, 'async_view')
+        except Resolver404:
+            return False
+
+    async def read_body(self, receive):
+        # Поток занимается после получения тела: медленная загрузка
+        # не держит его.
+        body_file = await super().read_body(receive)
+        try:
+            await RequestThread.current().acquire()
+        except BaseException:
+            body_file.close()
+            raise
+        return body_file
+
+    def resolve_request(self, request):
+        resolver_match = super().resolve_request(request)
+        async_view = getattr(resolver_match.func, 'async_view', None)
+        if async_view is not None:
+            resolver_match.func = async_view
+        return resolver_match
+
+    async def send_response(self, response, send):
+        '''
+        Django 3.2 перебирает потоковый ответ прямо в цикле событий,
+        и генератор с запросами к базе данных падает с
+        SynchronousOnlyOperation. Здесь каждая часть ответа, как и
+        закрытие ответа, готовится в пуле потоков, а поток запроса
+        возвращается в пул до отправки: медленный клиент его не держит.
+        '''
+        if not response.streaming:
+            await self.send_content(response, send)
+            return
+        RequestThread.current().release()
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': self.response_headers(response),
+        })
+        parts = iter(response)
+        next_part = run_sync(next)
+        while True:
+            part = await next_part(parts, None)
+            if part is None:
+                break
+            for chunk, _ in self.chunk_bytes(part):
+                await send({'type': 'http.response.body', 'body': chunk,
+                            'more_body': True})
+        await send({'type': 'http.response.body'})
+        await run_sync(response.close)()
+
+    async def send_content(self, response, send):
+        '''
+        Ответ уже в памяти: его закрытие (и сигнал request_finished)
+        выполняется в потоке запроса до отправки, и поток возвращается
+        в пул, не дожидаясь медленного клиента.
+        '''
+        headers = self.response_headers(response)
+        content = response.content
+        await sync_to_async(response.close, thread_sensitive=True)()
+        RequestThread.current().release()
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': headers,
+        })
+        for chunk, last in self.chunk_bytes(content):
+            await send({'type': 'http.response.body', 'body': chunk,
+                        'more_body': not last})
+
+    @staticmethod
+    def response_headers(response):
+        '''Заголовки и cookie ответа в формате ASGI, как в Django.'''
+        headers = []
+        for header, value in response.items():
+            if isinstance(header, str):
+                header = header.encode('ascii')
+            if isinstance(value, str):
+                value = value.encode('latin1')
+            headers.append((bytes(header), bytes(value)))
+        for cookie in response.cookies.values():
+            headers.append(
+                (b'Set-Cookie', cookie.output(header='').encode('ascii')
+                 .strip()))
+        return headers
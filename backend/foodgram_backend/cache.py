@@ -0,0 +1,37 @@
+'''
+Файловый кэш, общий для процессов одного сервера.
+
+В кэше лежат данные аутентификации, поэтому каталог доступен только
+владельцу (0700): каталог, открытый группе или остальным, закрывается
+при создании кэша. Стандартный FileBasedCache перед каждой записью
+перечисляет весь каталог, чтобы соблюсти MAX_ENTRIES; здесь проверка
+выполняется не чаще раза в CULL_CHECK_INTERVAL записей.
+'''
+import os
+import stat
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.exceptions import ImproperlyConfigured
+
+
+CULL_CHECK_INTERVAL = 100
+
+
+class PrivateFileBasedCache(FileBasedCache):
+
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        self.writes = 0
+        if stat.S_IMODE(os.stat(self._dir).st_mode) & 0o077:
+            try:
+                os.chmod(self._dir, 0o700)
+            except PermissionError:
+                raise ImproperlyConfigured(
+                    f'Каталог кэша {self._dir} принадлежит другому '
+                    'пользователю и доступен не только владельцу.'
+                ) from None
+
+    def _cull(self):
+        self.writes += 1
+        if self.writes % CULL_CHECK_INTERVAL == 1:
+            super()._cull()
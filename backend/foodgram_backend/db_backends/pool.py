@@ -0,0 +1,139 @@
+'''
+Пул соединений с базой данных для воркеров с потоками.
+
+Соединения Django привязаны к потоку: поток берёт соединение из пула
+при первом запросе к базе и возвращает его при закрытии соединения
+в конце HTTP-запроса. Пул ограничивает общее число соединений
+процесса, а лишние потоки ждут освобождения соединения не дольше
+заданного времени.
+'''
+import threading
+from collections import deque
+from time import monotonic
+
+from foodgram_backend import metrics
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+
+    def __init__(self, alias, size, timeout, max_idle, check=None,
+                 reset=None):
+        '''
+        check проверяет пригодность соединения перед повторной выдачей,
+        reset готовит соединение к возврату в пул и возвращает False,
+        если его нужно закрыть.
+        '''
+        self.alias = alias
+        self.size = size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.check = check
+        self.reset = reset
+        self.condition = threading.Condition()
+        # Свободные соединения и время их возврата в пул.
+        self.idle = deque()
+        self.in_use = 0
+        self.counters = dict.fromkeys(
+            ('created', 'reused', 'discarded', 'waits', 'timeouts'), 0)
+
+    @property
+    def open(self):
+        return self.in_use + len(self.idle)
+
+    def acquire(self, factory):
+        '''Свободное соединение или новое, созданное вызовом factory.'''
+        start = monotonic()
+        deadline = start + self.timeout
+        with self.condition:
+            if not self.idle and self.open >= self.size:
+                self.counters['waits'] += 1
+            while not self.idle and self.open >= self.size:
+                remaining = deadline - monotonic()
+                if remaining <= 0 or not self.condition.wait(remaining):
+                    if not self.idle and self.open >= self.size:
+                        self.counters['timeouts'] += 1
+                        self.publish()
+                        raise PoolTimeout(
+                            f'Нет свободных соединений с {self.alias} '
+                            f'за {self.timeout} с (размер пула {self.size}).')
+            entry = self.idle.pop() if self.idle else None
+            self.in_use += 1
+        metrics.observe('foodgram_db_pool_wait_seconds',
+                        {'alias': self.alias}, monotonic() - start)
+        try:
+            connection = self.reuse(entry) if entry else None
+            if connection is None:
+                connection = factory()
+                self.count('created')
+        except BaseException:
+            self.forget()
+            raise
+        self.publish()
+        return connection
+
+    def reuse(self, entry):
+        '''Свободное соединение, если оно не устарело и работает.'''
+        connection, released_at = entry
+        if monotonic() - released_at > self.max_idle or (
+                self.check is not None and not self.check(connection)):
+            self.close(connection)
+            return None
+        self.count('reused')
+        return connection
+
+    def release(self, connection):
+        if self.reset is not None and not self.reset(connection):
+            self.discard(connection)
+            return
+        with self.condition:
+            self.in_use -= 1
+            self.idle.append((connection, monotonic()))
+            self.condition.notify()
+        self.publish()
+
+    def discard(self, connection):
+        self.close(connection)
+        self.forget()
+
+    def forget(self):
+        with self.condition:
+            self.in_use -= 1
+            self.condition.notify()
+        self.publish()
+
+    def close(self, connection):
+        self.count('discarded')
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def count(self, name):
+        with self.condition:
+            self.counters[name] += 1
+
+    def stats(self):
+        with self.condition:
+            return {
+                'size': self.size,
+                'open': self.open,
+                'in_use': self.in_use,
+                'idle': len(self.idle),
+                **self.counters,
+            }
+
+    def publish(self):
+        '''Текущее состояние пула в метриках процесса.'''
+        stats = self.stats()
+        for state in ('in_use', 'idle'):
+            metrics.set_value('foodgram_db_pool_connections',
+                              {'alias': self.alias, 'state': state},
+                              stats[state])
+        for event in ('created', 'reused', 'discarded', 'waits', 'timeouts'):
+            metrics.set_value('foodgram_db_pool_events_total',
+                              {'alias': self.alias, 'event': event},
+                              stats[event])
@@ -0,0 +1,113 @@
+'''
+PostgreSQL с проверкой постоянных соединений и необязательным пулом.
+
+CONN_HEALTH_CHECKS: постоянное соединение (CONN_MAX_AGE > 0)
+проверяется запросом SELECT 1 перед первым использованием в каждом
+HTTP-запросе и переоткрывается, если база его разорвала. Так работает
+одноимённая настройка Django 4.1, которой нет в Django 3.2.
+
+POOL: словарь с ключами SIZE, TIMEOUT и MAX_IDLE включает пул
+соединений процесса (см. foodgram_backend.db_backends.pool).
+'''
+import os
+import threading
+
+import psycopg2
+from django.db.backends.postgresql import base
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+from foodgram_backend.db_backends.pool import ConnectionPool, PoolTimeout
+
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+def is_usable(connection):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except psycopg2.Error:
+        return False
+    return True
+
+
+def reset(connection):
+    '''Откат незавершённой транзакции перед возвратом в пул.'''
+    if connection.closed:
+        return False
+    try:
+        if connection.info.transaction_status != TRANSACTION_STATUS_IDLE:
+            connection.rollback()
+        connection.autocommit = True
+    except psycopg2.Error:
+        return False
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_done = False
+
+    @property
+    def pool(self):
+        options = self.settings_dict.get('POOL')
+        if not options:
+            return None
+        # Соединения пула нельзя наследовать при fork воркеров.
+        key = (self.alias, os.getpid())
+        with pools_lock:
+            if key not in pools:
+                pools[key] = ConnectionPool(
+                    self.alias,
+                    size=options.get('SIZE', 10),
+                    timeout=options.get('TIMEOUT', 5),
+                    max_idle=options.get('MAX_IDLE', 300),
+                    check=(is_usable
+                           if self.settings_dict.get('CONN_HEALTH_CHECKS')
+                           else None),
+                    reset=reset,
+                )
+            return pools[key]
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        try:
+            connection = pool.acquire(
+                lambda: super(DatabaseWrapper, self).get_new_connection(
+                    conn_params))
+        except PoolTimeout as error:
+            raise psycopg2.OperationalError(str(error))
+        options = self.settings_dict['OPTIONS']
+        self.isolation_level = options.get('isolation_level',
+                                           connection.isolation_level)
+        return connection
+
+    def _close(self):
+        pool = self.pool
+        if pool is None or self.connection is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            pool.release(self.connection)
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+
+    def close_if_unusable_or_obsolete(self):
+        # Вызывается в начале и в конце каждого HTTP-запроса.
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def ensure_connection(self):
+        if (self.connection is not None and not self.health_check_done
+                and self.settings_dict.get('CONN_HEALTH_CHECKS')
+                and not self.in_atomic_block):
+            if not self.is_usable():
+                self.close()
+            self.health_check_done = True
+        super().ensure_connection()
@@ -0,0 +1,318 @@
+'''
+Метрики приложения в формате Prometheus.
+
+Каждый процесс gunicorn накапливает счётчики и гистограммы в памяти
+и периодически сохраняет их в свой файл в каталоге METRICS_DIR.
+Эндпоинт /metrics суммирует файлы всех процессов, поэтому значения
+не зависят от того, какой воркер обработал запрос на сбор метрик.
+
+Файл завершившегося процесса переносится в общий итог RETIRED_FILE:
+счётчики и гистограммы добавляются к итогу, значения датчиков (gauge)
+отбрасываются. Это делает мастер gunicorn в child_exit, сбор метрик -
+для брошенных файлов процессов этого хоста и процесс, получивший PID
+завершившегося, перед первой записью своего файла.
+'''
+import atexit
+import fcntl
+import json
+import os
+import socket
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from time import monotonic
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+JOB_DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0,
+                        300.0, 900.0)
+
+RETIRED_FILE = 'retired.json'
+LOCK_FILE = '.lock'
+
+METRICS = {
+    'foodgram_request_duration_seconds': (
+        'histogram', 'Длительность обработки запроса.', LATENCY_BUCKETS),
+    'foodgram_request_queries': (
+        'histogram', 'Количество SQL-запросов на HTTP-запрос.',
+        QUERY_COUNT_BUCKETS),
+    'foodgram_requests_total': (
+        'counter', 'Количество обработанных запросов.', None),
+    'foodgram_throttled_requests_total': (
+        'counter', 'Количество запросов, отклонённых троттлингом.', None),
+    'foodgram_cache_hits_total': (
+        'counter', 'Количество попаданий в кэш.', None),
+    'foodgram_cache_misses_total': (
+        'counter', 'Количество промахов кэша.', None),
+    'foodgram_db_pool_connections': (
+        'gauge', 'Соединения пула с базой данных по состоянию.', None),
+    'foodgram_db_pool_events_total': (
+        'counter', 'События пула соединений: создание, повторное '
+        'использование, закрытие, ожидание, тайм-аут.', None),
+    'foodgram_db_pool_wait_seconds': (
+        'histogram', 'Время получения соединения из пула.',
+        POOL_WAIT_BUCKETS),
+    'foodgram_jobs_total': (
+        'counter', 'События фоновых задач: постановка в очередь, '
+        'дедупликация, выполнение, повтор, ошибка, возврат брошенной.',
+        None),
+    'foodgram_job_duration_seconds': (
+        'histogram', 'Длительность выполнения фоновой задачи.',
+        JOB_DURATION_BUCKETS),
+    'foodgram_job_wait_seconds': (
+        'histogram', 'Ожидание фоновой задачи в очереди после срока запуска.',
+        JOB_DURATION_BUCKETS),
+}
+
+
+class MetricsRegistry:
+    '''Хранилище метрик одного процесса.'''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = defaultdict(dict)
+        self.last_flush = monotonic()
+        # Процесс, записавший файл метрик; после fork файл чужой.
+        self.owner_pid = None
+
+    def inc(self, name, labels, value=1):
+        key = self.key(labels)
+        with self.lock:
+            series = self.values[name]
+            series[key] = series.get(key, 0) + value
+
+    def set_value(self, name, labels, value):
+        key = self.key(labels)
+        with self.lock:
+            self.values[name][key] = value
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = self.key(labels)
+        with self.lock:
+            series = self.values[name]
+            if key not in series:
+                series[key] = [0] * (len(buckets) + 2)
+            histogram = series[key]
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram[index] += 1
+                    break
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    @staticmethod
+    def key(labels):
+        return json.dumps(sorted(labels.items()), ensure_ascii=False)
+
+    def snapshot(self):
+        with self.lock:
+            return {name: {key: (list(value) if isinstance(value, list)
+                                 else value)
+                           for key, value in series.items()}
+                    for name, series in self.values.items()}
+
+    def file_path(self):
+        return process_file(settings.METRICS_DIR, os.getpid())
+
+    def flush(self):
+        '''Атомарная запись метрик процесса в общий каталог.'''
+        if not settings.METRICS_ENABLED or not settings.METRICS_DIR:
+            return
+        path = self.file_path()
+        if self.owner_pid != os.getpid():
+            if not self.values:
+                return
+            # Файл с тем же PID остался от завершившегося процесса.
+            path.parent.mkdir(parents=True, exist_ok=True)
+            retire(path)
+            self.owner_pid = os.getpid()
+        tmp_path = path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(self.snapshot(), ensure_ascii=False),
+                            encoding='utf-8')
+        os.replace(tmp_path, path)
+        self.last_flush = monotonic()
+
+    def maybe_flush(self):
+        if monotonic() - self.last_flush >= settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+
+registry = MetricsRegistry()
+atexit.register(registry.flush)
+
+
+def inc(name, labels, value=1):
+    if settings.METRICS_ENABLED:
+        registry.inc(name, labels, value)
+
+
+def observe(name, labels, value):
+    if settings.METRICS_ENABLED:
+        registry.observe(name, labels, value)
+
+
+def set_value(name, labels, value):
+    '''Значение, которое ведёт сам источник: размер пула, счётчики пула.'''
+    if settings.METRICS_ENABLED:
+        registry.set_value(name, labels, value)
+
+
+def record_cache_access(cache, hit):
+    '''Учёт обращения к кэшу для расчёта доли попаданий.'''
+    inc('foodgram_cache_hits_total' if hit else 'foodgram_cache_misses_total',
+        {'cache': cache})
+
+
+def process_file(directory, pid):
+    # Имя хоста различает процессы разных контейнеров с общим томом.
+    return Path(directory) / f'metrics_{socket.gethostname()}_{pid}.json'
+
+
+def parse_process_file(path):
+    '''Имя хоста и PID процесса из имени его файла метрик.'''
+    host, _, pid = path.stem[len('metrics_'):].rpartition('_')
+    return host, int(pid) if pid.isdigit() else None
+
+
+def is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+@contextmanager
+def locked(directory, operation=fcntl.LOCK_EX):
+    '''Блокировка каталога метрик между процессами.'''
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / LOCK_FILE, 'a') as lock_file:
+        fcntl.flock(lock_file, operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def read_snapshot(path):
+    try:
+        return json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+
+
+def merge(total, snapshot, gauges=True):
+    '''Добавление снимка метрик к итогу total.'''
+    for name, series in snapshot.items():
+        if not gauges and METRICS.get(name, ('gauge',))[0] == 'gauge':
+            continue
+        for key, value in series.items():
+            current = total[name].get(key)
+            if current is None:
+                total[name][key] = value
+            elif isinstance(value, list):
+                total[name][key] = [a + b for a, b in zip(current, value)]
+            else:
+                total[name][key] = current + value
+    return total
+
+
+def retire(path):
+    '''Перенос файла завершившегося процесса в общий итог.'''
+    with locked(path.parent):
+        snapshot = read_snapshot(path)
+        if snapshot is None:
+            return
+        retired_path = path.parent / RETIRED_FILE
+        total = merge(defaultdict(dict, read_snapshot(retired_path) or {}),
+                      snapshot, gauges=False)
+        tmp_path = retired_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(total, ensure_ascii=False),
+                            encoding='utf-8')
+        os.replace(tmp_path, retired_path)
+        path.unlink()
+
+
+def retire_process(directory, pid):
+    '''Перенос файла завершившегося воркера; вызывается мастером.'''
+    retire(process_file(directory, pid))
+
+
+def collect():
+    '''
+    Сумма метрик всех процессов, включая текущий.
+
+    Брошенные файлы завершившихся процессов этого хоста сначала
+    переносятся в общий итог. Жизнь процессов других хостов проверить
+    нельзя, их файлы учитываются целиком.
+    '''
+    total = merge(defaultdict(dict), registry.snapshot())
+    if not settings.METRICS_DIR:
+        return total
+    directory = Path(settings.METRICS_DIR)
+    own_file = registry.file_path()
+    host = socket.gethostname()
+    for path in directory.glob('metrics_*.json'):
+        file_host, pid = parse_process_file(path)
+        if file_host == host and pid is not None and not is_alive(pid):
+            retire(path)
+    with locked(directory, fcntl.LOCK_SH):
+        paths = [directory / RETIRED_FILE,
+                 *directory.glob('metrics_*.json')]
+        for path in paths:
+            if path == own_file:
+                continue
+            snapshot = read_snapshot(path)
+            if snapshot is not None:
+                merge(total, snapshot)
+    return total
+
+
+def format_labels(labels):
+    return ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\')
+                         .replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels)
+
+
+def render(values):
+    '''Представление метрик в текстовом формате Prometheus.'''
+    lines = []
+    for name, (kind, description, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        for key, value in sorted(values.get(name, {}).items()):
+            labels = json.loads(key)
+            if kind != 'histogram':
+                lines.append(f'{name}{{{format_labels(labels)}}} {value}')
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets, value):
+                cumulative += count
+                bucket_labels = format_labels(labels + [['le', str(bound)]])
+                lines.append(f'{name}_bucket{{{bucket_labels}}} {cumulative}')
+            bucket_labels = format_labels(labels + [['le', '+Inf']])
+            lines.append(f'{name}_bucket{{{bucket_labels}}} {value[-1]}')
+            lines.append(f'{name}_sum{{{format_labels(labels)}}} {value[-2]}')
+            lines.append(
+                f'{name}_count{{{format_labels(labels)}}} {value[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    '''Вью-функция для сбора метрик Prometheus.'''
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    return HttpResponse(render(collect()),
+                        content_type='text/plain; version=0.0.4')
@@ -0,0 +1,281 @@
+import cProfile
+import json
+import logging
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.urls import Resolver404, resolve
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from foodgram_backend import metrics
+from foodgram_backend.profiling import save_profile
+from foodgram_backend.routers import RoutingState, routing_state
+
+
+logger = logging.getLogger('foodgram.performance')
+
+# Счётчики запросов, открытые в текущем контексте: асинхронные вью
+# подключают их к соединениям потока, в котором работают с базой.
+active_query_stats = ContextVar('active_query_stats', default=())
+
+
+class QueryStats:
+    '''Обёртка выполнения SQL, считающая запросы и время в базе данных.'''
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += perf_counter() - start
+            self.count += 1
+            self.statements[sql] += 1
+
+    @property
+    def duplicates(self):
+        '''Число повторов одинаковых запросов - признак проблемы N+1.'''
+        return sum(count - 1 for count in self.statements.values())
+
+
+@contextmanager
+def attach_query_stats(*all_stats):
+    '''Подключение счётчиков ко всем соединениям текущего потока.'''
+    with ExitStack() as stack:
+        for stats in all_stats:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+        yield
+
+
+@contextmanager
+def track_queries(stats):
+    '''Подключение счётчика запросов ко всем соединениям с базами данных.'''
+    token = active_query_stats.set(active_query_stats.get() + (stats,))
+    try:
+        with attach_query_stats(stats):
+            yield stats
+    finally:
+        active_query_stats.reset(token)
+
+
+class RequestStats:
+    '''Показатели производительности одного HTTP-запроса.'''
+
+    def __init__(self):
+        self.queries = QueryStats()
+        self.start = perf_counter()
+        self.render_start = None
+        self.render_end = None
+        self.end = None
+
+    @property
+    def total(self):
+        return self.end - self.start
+
+    @property
+    def render(self):
+        if self.render_start is None or self.render_end is None:
+            return 0.0
+        return self.render_end - self.render_start
+
+    @property
+    def app(self):
+        '''Время работы Python-кода без базы данных и рендеринга.'''
+        return max(self.total - self.queries.duration - self.render, 0.0)
+
+
+class PerformanceMiddleware:
+    '''
+    Сбор показателей производительности каждого запроса.
+
+    Включается настройкой PERFORMANCE_INSTRUMENTATION: добавляет заголовок
+    Server-Timing и пишет в логгер foodgram.performance строку JSON
+    с именем вью, статусом, числом запросов и повторов запросов.
+    При выключенной настройке удаляется из цепочки middleware.
+    '''
+
+    def __init__(self, get_response):
+        if not settings.PERFORMANCE_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = request.performance_stats = RequestStats()
+        with track_queries(stats.queries):
+            response = self.get_response(request)
+        stats.end = perf_counter()
+        response['Server-Timing'] = self.server_timing(stats)
+        logger.info(json.dumps(self.log_record(request, response, stats),
+                               ensure_ascii=False))
+        return response
+
+    def process_template_response(self, request, response):
+        stats = request.performance_stats
+        stats.render_start = perf_counter()
+
+        def finish_render(response):
+            stats.render_end = perf_counter()
+
+        response.add_post_render_callback(finish_render)
+        return response
+
+    @staticmethod
+    def server_timing(stats):
+        return ', '.join((
+            f'db;dur={stats.queries.duration * 1000:.1f};'
+            f'desc="{stats.queries.count} queries"',
+            f'app;dur={stats.app * 1000:.1f}',
+            f'render;dur={stats.render * 1000:.1f}',
+            f'total;dur={stats.total * 1000:.1f}',
+        ))
+
+    @staticmethod
+    def log_record(request, response, stats):
+        resolver_match = request.resolver_match
+        return {
+            'view': resolver_match.view_name if resolver_match else None,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(stats.total * 1000, 1),
+            'db_ms': round(stats.queries.duration * 1000, 1),
+            'app_ms': round(stats.app * 1000, 1),
+            'render_ms': round(stats.render * 1000, 1),
+            'queries': stats.queries.count,
+            'duplicate_queries': stats.queries.duplicates,
+        }
+
+
+class MetricsMiddleware:
+    '''
+    Учёт метрик запросов по вью и HTTP-методу.
+
+    Включается настройкой METRICS_ENABLED, метрики доступны по /metrics.
+    '''
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = perf_counter()
+        with track_queries(QueryStats()) as queries:
+            response = self.get_response(request)
+        duration = perf_counter() - start
+        resolver_match = request.resolver_match
+        labels = {
+            'view': (resolver_match.view_name if resolver_match
+                     else '<unresolved>'),
+            'method': request.method,
+        }
+        metrics.observe('foodgram_request_duration_seconds', labels, duration)
+        metrics.observe('foodgram_request_queries', labels, queries.count)
+        metrics.inc('foodgram_requests_total',
+                    {**labels, 'status': str(response.status_code)})
+        if response.status_code == 429:
+            metrics.inc('foodgram_throttled_requests_total', labels)
+        metrics.registry.maybe_flush()
+        return response
+
+
+class ProfilingMiddleware:
+    '''
+    Профилирование отдельных запросов через cProfile.
+
+    Включается настройкой PROFILING_DIR. Запрос профилируется,
+    если администратор передал заголовок X-Profile или параметр ?profile,
+    либо если это каждый N-й запрос вью из настройки PROFILING_SAMPLING.
+    '''
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_DIR:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_counters = defaultdict(int)
+
+    def __call__(self, request):
+        requested = self.is_requested_by_staff(request)
+        if not requested and not self.is_sampled(request):
+            return self.get_response(request)
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        name = save_profile(profiler, request)
+        if requested:
+            response['X-Profile-Id'] = name
+        return response
+
+    def is_requested_by_staff(self, request):
+        if ('HTTP_X_PROFILE' not in request.META
+                and 'profile' not in request.GET):
+            return False
+        drf_request = Request(request, authenticators=[
+            authentication() for authentication
+            in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+        ])
+        try:
+            user = drf_request.user
+        except APIException:
+            return False
+        request.profiled_user_id = user.pk
+        return user.is_staff
+
+    def is_sampled(self, request):
+        if not settings.PROFILING_SAMPLING:
+            return False
+        try:
+            view_name = resolve(request.path_info).view_name
+        except Resolver404:
+            return False
+        rate = settings.PROFILING_SAMPLING.get(view_name)
+        if not rate:
+            return False
+        self.sample_counters[view_name] += 1
+        return self.sample_counters[view_name] % rate == 0
+
+
+class ReplicaRoutingMiddleware:
+    '''
+    Разметка запроса для маршрутизатора реплик.
+
+    Запросы с небезопасным методом и запросы клиента, недавно
+    выполнившего запись (cookie REPLICA_PIN_COOKIE), работают только
+    с основной базой. Без настроенных реплик удаляется из цепочки.
+    '''
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RoutingState(
+            pinned=request.method not in SAFE_METHODS
+            or settings.REPLICA_PIN_COOKIE in request.COOKIES)
+        token = routing_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            routing_state.reset(token)
+        if state.wrote:
+            response.set_cookie(settings.REPLICA_PIN_COOKIE, '1',
+                                max_age=settings.REPLICA_STICKY_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
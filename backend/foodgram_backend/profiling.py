@@ -0,0 +1,86 @@
+'''Сохранение результатов профилирования отдельных запросов.'''
+import pstats
+from collections import Counter, defaultdict
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+
+
+MAX_STACK_DEPTH = 128
+MAX_RECURSION_DEPTH = 16
+MIN_STACK_TIME = 1e-6
+
+
+def function_label(func):
+    filename, lineno, name = func
+    return f'{name} ({filename}:{lineno})'.replace(';', ',')
+
+
+def collapse_stacks(stats):
+    '''
+    Преобразование статистики cProfile в свёрнутые стеки для flamegraph.
+
+    cProfile хранит только пары вызывающий-вызываемый, поэтому время
+    вызываемой функции распределяется по путям вызова пропорционально
+    времени, которое на этом пути провела вызывающая функция. Корнями
+    считаются функции, часть вызовов которых пришла из непрофилируемого
+    кода, например функция, вызванная сразу после profiler.enable().
+    '''
+    callees = defaultdict(dict)
+    for func, (_, _, _, _, callers) in stats.stats.items():
+        for caller, edge in callers.items():
+            callees[caller][func] = edge
+    stacks = Counter()
+
+    def walk(func, path, own_time, total_time):
+        stacks[path] += own_time
+        func_total_time = stats.stats[func][3]
+        if len(path) >= MAX_STACK_DEPTH or not func_total_time:
+            return
+        # Время потомков на пути не может превышать время самой функции:
+        # для рекурсивных вызовов cProfile учитывает время вложенно.
+        share = total_time / func_total_time
+        children_time = share * sum(
+            edge[3] for edge in callees[func].values())
+        children_limit = max(total_time - own_time, 0)
+        if children_time > children_limit:
+            share *= children_limit / children_time
+        for callee, (_, _, edge_own, edge_total) in callees[func].items():
+            callee_label = function_label(callee)
+            if (path.count(callee_label) >= MAX_RECURSION_DEPTH
+                    or edge_total * share < MIN_STACK_TIME):
+                continue
+            walk(callee, path + (callee_label,),
+                 edge_own * share, edge_total * share)
+
+    for func, (_, calls, own_time, total_time, callers) in (
+            stats.stats.items()):
+        root_calls = calls - sum(edge[1] for edge in callers.values())
+        if root_calls > 0:
+            share = root_calls / calls
+            walk(func, (function_label(func),),
+                 own_time * share, total_time * share)
+    return [f'{";".join(path)} {round(time * 1e6)}'
+            for path, time in stacks.items() if round(time * 1e6)]
+
+
+def save_profile(profiler, request):
+    '''
+    Запись файла .prof для pstats/snakeviz и файла .collapsed
+    для flamegraph.pl/speedscope. Возвращает общее имя файлов.
+    '''
+    resolver_match = request.resolver_match
+    view_name = resolver_match.view_name if resolver_match else 'unresolved'
+    name = '{}_{}_{}'.format(
+        datetime.now().strftime('%Y%m%dT%H%M%S%f'),
+        view_name.replace(':', '-'),
+        getattr(request, 'profiled_user_id', None) or 'anon',
+    )
+    directory = Path(settings.PROFILING_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    profiler.dump_stats(directory / f'{name}.prof')
+    stats = pstats.Stats(profiler)
+    (directory / f'{name}.collapsed').write_text(
+        '\n'.join(collapse_stacks(stats)) + '\n', encoding='utf-8')
+    return name
@@ -0,0 +1,59 @@
+'''
+Маршрутизация чтения на реплики базы данных.
+
+Реплики используются только внутри HTTP-запросов с безопасным методом,
+которые размечает ReplicaRoutingMiddleware. Запись, чтение внутри
+транзакции и любое чтение после записи в том же запросе идут на
+основную базу. После запроса с записью клиент получает cookie, и его
+запросы в течение REPLICA_STICKY_SECONDS тоже читают с основной базы,
+чтобы не увидеть данные реплики, отстающей от только что сделанной записи.
+Вне HTTP-запросов (команды, shell) всё выполняется на основной базе.
+'''
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class RoutingState:
+    '''Состояние маршрутизации одного запроса.'''
+
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.wrote = False
+        self.replica = None
+
+
+routing_state = ContextVar('routing_state', default=None)
+
+
+def pin_to_primary():
+    state = routing_state.get()
+    if state is not None:
+        state.pinned = state.wrote = True
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        state = routing_state.get()
+        if (state is None or state.pinned or not settings.DATABASE_REPLICAS
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        if state.replica is None:
+            # Одна реплика на весь запрос: разные реплики могут отставать
+            # по-разному, и ответ собирался бы из несогласованных данных.
+            state.replica = random.choice(settings.DATABASE_REPLICAS)
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная база.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
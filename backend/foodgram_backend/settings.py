@@ -33,9 +33,57 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'recipes.apps.RecipesConfig',
     'api.apps.ApiConfig',
+    'jobs.apps.JobsConfig',
+    'benchmarks.apps.BenchmarksConfig',
 ]
 
+PERFORMANCE_INSTRUMENTATION = os.getenv('PERFORMANCE_INSTRUMENTATION', 'False') == 'True'
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'False') == 'True'
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = 5
+
+PROFILING_DIR = os.getenv('PROFILING_DIR', '')
+# Формат: "api:recipes-download-shopping-cart=100,api:recipes-list=1000" -
+# профилировать каждый N-й запрос указанной вью.
+PROFILING_SAMPLING = {
+    view_name.strip(): int(rate)
+    for view_name, rate in (
+        item.rsplit('=', 1)
+        for item in os.getenv('PROFILING_SAMPLING', '').split(',') if '=' in item
+    )
+}
+
+# Файловый кэш общий для всех воркеров gunicorn на одном сервере;
+# каталог закрыт для всех, кроме владельца.
+SHARED_CACHE_LOCATION = os.getenv('SHARED_CACHE_LOCATION',
+                                  str(BASE_DIR / 'var' / 'cache'))
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'foodgram_backend.cache.PrivateFileBasedCache',
+        'LOCATION': SHARED_CACHE_LOCATION,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+AUTH_TOKEN_CACHE = 'shared'
+# 0 отключает кэширование токенов.
+AUTH_TOKEN_CACHE_TTL = int(os.getenv('AUTH_TOKEN_CACHE_TTL', 60))
+
+# Хранилище счётчиков троттлинга, общее для всех воркеров:
+# sqlite:///путь, redis://host:port/db или memory:// (один процесс).
+# Файл SQLite должен лежать в каталоге приложения, а не в общем /tmp.
+THROTTLE_STORE = os.getenv(
+    'THROTTLE_STORE', f'sqlite://{BASE_DIR / "var" / "throttle.sqlite3"}')
+
 MIDDLEWARE = [
+    'foodgram_backend.middleware.PerformanceMiddleware',
+    'foodgram_backend.middleware.MetricsMiddleware',
+    'foodgram_backend.middleware.ProfilingMiddleware',
+    'foodgram_backend.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -65,14 +113,43 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram_backend.wsgi.application'
 
+TEST_RUNNER = 'tests.runner.FoodgramTestRunner'
+
+# Потоки для блокирующей работы асинхронных вью в режиме ASGI; каждый
+# держит своё соединение с базой данных по правилам DB_CONN_MAX_AGE.
+ASYNC_THREAD_POOL_SIZE = int(os.getenv('ASYNC_THREAD_POOL_SIZE', 8))
+# Постоянные потоки для синхронного кода остальных запросов в режиме ASGI:
+# столько запросов процесс обрабатывает одновременно.
+ASGI_REQUEST_THREADS = int(os.getenv('ASGI_REQUEST_THREADS', 8))
+
+# Список покупок для корзины от этого числа рецептов собирается фоновой
+# задачей в файл; для меньших корзин он отдаётся прямо в ответе.
+SHOPPING_LIST_ASYNC_THRESHOLD = int(
+    os.getenv('SHOPPING_LIST_ASYNC_THRESHOLD', 100))
+
+# Постоянные соединения (секунды жизни, 0 - новое соединение на запрос)
+# с проверкой перед первым использованием в каждом запросе.
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', 60))
+DB_CONN_HEALTH_CHECKS = os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True'
+# Пул соединений процесса для воркеров с потоками (gunicorn --threads);
+# 0 - пул выключен. Соединение возвращается в пул в конце запроса.
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 0))
+
 POSTGRES_DATABASE = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'foodgram_backend.db_backends.postgresql',
         'NAME': os.getenv('POSTGRES_DB', 'django'),
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', 'db'),
-        'PORT': os.getenv('DB_PORT', DEFAULT_DB_PORT)
+        'PORT': os.getenv('DB_PORT', DEFAULT_DB_PORT),
+        'CONN_MAX_AGE': 0 if DB_POOL_SIZE else DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
+        'POOL': {
+            'SIZE': DB_POOL_SIZE,
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', 5)),
+            'MAX_IDLE': float(os.getenv('DB_POOL_MAX_IDLE', 300)),
+        } if DB_POOL_SIZE else None,
     }
 }
 SQLITE_DATABASE = {
@@ -83,6 +160,64 @@ SQLITE_DATABASE = {
 }
 DATABASES = POSTGRES_DATABASE if os.getenv('POSTGRES_BASE_CHOICE', 'False') == 'True' else SQLITE_DATABASE
 
+# Реплики только для чтения: через запятую хосты PostgreSQL или пути
+# к файлам SQLite (копиям основной базы для локальной проверки).
+for index, location in enumerate(
+        filter(None, os.getenv('DATABASE_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST' if DATABASES is POSTGRES_DATABASE else 'NAME': location.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['foodgram_backend.routers.ReplicaRouter']
+# Сколько секунд после записи клиент читает только с основной базы.
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 5))
+REPLICA_PIN_COOKIE = 'db_primary'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'foodgram.performance': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'foodgram.deletion': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'foodgram.jobs': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# Первый хешер используется для новых паролей, остальные - для проверки
+# существующих: при входе такие пароли прозрачно перехешируются.
+# argon2 и bcrypt требуют пакетов argon2-cffi и bcrypt; md5 - только для
+# тестов и бенчмарков.
+PASSWORD_HASHER_CHOICES = {
+    'argon2': 'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'bcrypt': 'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'md5': 'django.contrib.auth.hashers.MD5PasswordHasher',
+}
+PASSWORD_HASHER = os.getenv('PASSWORD_HASHER', 'pbkdf2')
+PASSWORD_HASHERS = [PASSWORD_HASHER_CHOICES[PASSWORD_HASHER]] + [
+    hasher for name, hasher in PASSWORD_HASHER_CHOICES.items()
+    if name not in (PASSWORD_HASHER, 'md5')
+] + ['django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -124,16 +259,25 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.UserRateThrottle',
-        'rest_framework.throttling.AnonRateThrottle',
+        'api.throttling.UserSlidingWindowThrottle',
+        'api.throttling.AnonSlidingWindowThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         'user': '5000/hour',
         'anon': '1000/hour',
     },
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 6,
 }
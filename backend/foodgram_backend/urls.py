@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.urls import include, path
 
 from api.views import redirect_from_short_url
+from foodgram_backend.metrics import metrics_view
 
 
 urlpatterns = [
@@ -10,4 +11,5 @@ urlpatterns = [
     path('s/<slug:short_url>/',
          redirect_from_short_url,
          name='redirect_from_short_url'),
+    path('metrics', metrics_view, name='metrics'),
 ]
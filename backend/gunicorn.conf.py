@@ -0,0 +1,21 @@
+'''Настройки gunicorn: SERVER_MODE=asgi запускает воркеры uvicorn.'''
+import os
+
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram_backend.settings')
+
+bind = '0:8000'
+
+if os.getenv('SERVER_MODE', 'wsgi') == 'asgi':
+    wsgi_app = 'foodgram_backend.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'foodgram_backend.wsgi:application'
+
+
+def child_exit(server, worker):
+    '''Счётчики завершившегося воркера переносятся в общий итог метрик.'''
+    metrics_dir = os.getenv('METRICS_DIR')
+    if os.getenv('METRICS_ENABLED') == 'True' and metrics_dir:
+        from foodgram_backend.metrics import retire_process
+        retire_process(metrics_dir, worker.pid)
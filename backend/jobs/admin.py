@@ -0,0 +1,28 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from foodgram_backend.admin_tools import EstimatedCountAdminMixin
+from jobs.models import Job
+
+
+@admin.register(Job)
+class JobAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
+    list_display = ('id', 'task', 'status', 'attempts', 'run_at',
+                    'finished_at', 'locked_by')
+    list_filter = ('status', 'task')
+    search_fields = ('task', 'dedupe_key')
+    readonly_fields = ('created_at', 'locked_by', 'locked_at',
+                       'finished_at', 'result', 'last_error')
+    actions = ('requeue',)
+
+    @admin.action(description='Повторить упавшие задачи')
+    def requeue(self, request, queryset):
+        # Задача с ключом, по которому уже есть активная, не повторяется.
+        active_keys = Job.objects.filter(
+            status__in=(Job.Status.QUEUED, Job.Status.RUNNING),
+            dedupe_key__isnull=False).values('dedupe_key')
+        count = queryset.filter(status=Job.Status.FAILED).exclude(
+            dedupe_key__in=active_keys).update(
+            status=Job.Status.QUEUED, attempts=0, run_at=timezone.now(),
+            finished_at=None)
+        self.message_user(request, f'Поставлено в очередь задач: {count}.')
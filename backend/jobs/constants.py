@@ -0,0 +1,16 @@
+MAX_TASK_NAME_LENGTH = 128
+MAX_DEDUPE_KEY_LENGTH = 255
+MAX_WORKER_NAME_LENGTH = 128
+STR_VIEW_LENGTH = 40
+DEFAULT_MAX_ATTEMPTS = 3
+# Пауза перед повтором растёт вдвое с каждой попыткой (в секундах).
+RETRY_BASE_DELAY = 10
+RETRY_MAX_DELAY = 60 * 60
+# Задача в работе дольше этого времени считается брошенной воркером.
+LOCK_TIMEOUT = 10 * 60
+POLL_INTERVAL = 1.0
+CLAIM_BATCH_SIZE = 1
+MAINTENANCE_INTERVAL = 60
+# Выполненные задачи хранятся неделю.
+FINISHED_JOB_RETENTION = 7 * 24 * 60 * 60
+PURGE_BATCH_SIZE = 1000
@@ -0,0 +1,84 @@
+import os
+import signal
+import socket
+import threading
+from time import monotonic
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from foodgram_backend import metrics
+from jobs.constants import (CLAIM_BATCH_SIZE, MAINTENANCE_INTERVAL,
+                            POLL_INTERVAL)
+from jobs.queue import (claim_jobs, purge_finished_jobs, requeue_stale_jobs,
+                        run_job)
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполнение фоновых задач из очереди в базе данных. Можно '
+        'запускать несколько процессов: каждая задача достаётся одному.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Завершиться, когда в очереди не останется готовых задач.')
+        parser.add_argument(
+            '--poll-interval', type=float, default=POLL_INTERVAL,
+            help='Пауза между опросами пустой очереди, в секундах.')
+        parser.add_argument(
+            '--batch-size', type=int, default=CLAIM_BATCH_SIZE,
+            help='Количество задач, забираемых за один запрос.')
+        parser.add_argument(
+            '--max-jobs', type=int, default=0,
+            help='Завершиться после выполнения этого числа задач.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError('Размер порции должен быть положительным.')
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = threading.Event()
+        handlers = {
+            signum: signal.signal(signum, self.stop)
+            for signum in (signal.SIGTERM, signal.SIGINT)
+        }
+        self.stdout.write(f'Воркер {worker} запущен.')
+        processed = 0
+        last_maintenance = None
+        try:
+            while not self.stopping.is_set():
+                # Соединения живут по правилам CONN_MAX_AGE, как в запросах.
+                close_old_connections()
+                if (last_maintenance is None
+                        or monotonic() - last_maintenance
+                        >= MAINTENANCE_INTERVAL):
+                    requeue_stale_jobs()
+                    purge_finished_jobs()
+                    last_maintenance = monotonic()
+                jobs = claim_jobs(worker, options['batch_size'])
+                if not jobs:
+                    if options['burst']:
+                        break
+                    metrics.registry.maybe_flush()
+                    self.stopping.wait(options['poll_interval'])
+                    continue
+                # Забранные задачи выполняются и при остановке воркера.
+                for job in jobs:
+                    outcome = run_job(job, worker)
+                    processed += 1
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f'{job}: {outcome}')
+                metrics.registry.maybe_flush()
+                if options['max_jobs'] and processed >= options['max_jobs']:
+                    break
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+            close_old_connections()
+            metrics.registry.flush()
+        self.stdout.write(f'Воркер {worker} остановлен, выполнено задач: '
+                          f'{processed}.')
+
+    def stop(self, signum, frame):
+        self.stopping.set()
@@ -0,0 +1,100 @@
+from django.db import models
+from django.utils import timezone
+
+from jobs.constants import (DEFAULT_MAX_ATTEMPTS, MAX_DEDUPE_KEY_LENGTH,
+                            MAX_TASK_NAME_LENGTH, MAX_WORKER_NAME_LENGTH,
+                            STR_VIEW_LENGTH)
+
+
+class Job(models.Model):
+    '''Модель фоновой задачи.'''
+
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'В очереди'
+        RUNNING = 'running', 'Выполняется'
+        DONE = 'done', 'Выполнена'
+        FAILED = 'failed', 'Ошибка'
+
+    task = models.CharField(
+        max_length=MAX_TASK_NAME_LENGTH,
+        verbose_name='Задача'
+    )
+    payload = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='Аргументы'
+    )
+    status = models.CharField(
+        max_length=max(len(value) for value in Status.values),
+        choices=Status.choices,
+        default=Status.QUEUED,
+        verbose_name='Состояние'
+    )
+    dedupe_key = models.CharField(
+        max_length=MAX_DEDUPE_KEY_LENGTH,
+        null=True,
+        blank=True,
+        verbose_name='Ключ дедупликации'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Попыток'
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        default=DEFAULT_MAX_ATTEMPTS,
+        verbose_name='Максимум попыток'
+    )
+    run_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Запуск не раньше'
+    )
+    locked_by = models.CharField(
+        max_length=MAX_WORKER_NAME_LENGTH,
+        blank=True,
+        verbose_name='Воркер'
+    )
+    locked_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Взята в работу'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Создана'
+    )
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Завершена'
+    )
+    result = models.JSONField(
+        null=True,
+        blank=True,
+        verbose_name='Результат'
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name='Последняя ошибка'
+    )
+
+    class Meta:
+        ordering = ('-created_at',)
+        verbose_name = 'фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = (
+            # Выборка готовых к запуску задач и поиск брошенных.
+            models.Index(fields=('status', 'run_at'),
+                         name='job_status_run_at_idx'),
+        )
+        constraints = (
+            # Пока задача с ключом ждёт или выполняется, вторая такая же
+            # не ставится в очередь.
+            models.UniqueConstraint(
+                fields=('dedupe_key',),
+                condition=models.Q(status__in=('queued', 'running')),
+                name='unique_active_job_dedupe_key',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.task[:STR_VIEW_LENGTH]} #{self.pk} ({self.status})'
@@ -0,0 +1,226 @@
+'''
+Очередь фоновых задач в базе данных.
+
+Задача - строка таблицы Job с именем зарегистрированной функции и её
+аргументами в JSON. Постановка в очередь - обычный INSERT, поэтому
+задача, поставленная внутри транзакции, становится видна воркерам
+только после её фиксации и пропадает при откате.
+
+Воркеры (команда run_worker) забирают готовые задачи: в PostgreSQL -
+SELECT ... FOR UPDATE SKIP LOCKED, и несколько процессов не ждут друг
+друга на одних и тех же строках; в SQLite блокировок строк нет, и
+каждая задача забирается условным UPDATE по состоянию «в очереди»,
+который выигрывает ровно один воркер. Упавшая задача повторяется с
+растущей паузой до max_attempts попыток. Задача, брошенная
+остановившимся воркером, через LOCK_TIMEOUT возвращается в очередь.
+'''
+import logging
+import traceback
+from collections import namedtuple
+from datetime import timedelta
+from time import monotonic
+
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from foodgram_backend import metrics
+from jobs.constants import (CLAIM_BATCH_SIZE, DEFAULT_MAX_ATTEMPTS,
+                            FINISHED_JOB_RETENTION, LOCK_TIMEOUT,
+                            PURGE_BATCH_SIZE, RETRY_BASE_DELAY,
+                            RETRY_MAX_DELAY)
+from jobs.models import Job
+
+
+logger = logging.getLogger('foodgram.jobs')
+
+Task = namedtuple('Task', ('name', 'func', 'max_attempts'))
+
+# Зарегистрированные задачи по имени.
+tasks = {}
+
+ACTIVE_STATUSES = (Job.Status.QUEUED, Job.Status.RUNNING)
+STALE_LOCK_ERROR = 'Воркер не завершил задачу за {} с.'
+
+
+def task(name, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    '''
+    Регистрация функции как фоновой задачи.
+
+    Функция получает аргументы payload как именованные, а её результат
+    сохраняется в Job.result и должен сериализоваться в JSON.
+    '''
+    def register(func):
+        tasks[name] = Task(name, func, max_attempts)
+        func.task_name = name
+        return func
+    return register
+
+
+def get_task(name):
+    try:
+        return tasks[name]
+    except KeyError:
+        raise LookupError(f'Неизвестная задача: {name}.') from None
+
+
+def database():
+    return router.db_for_write(Job)
+
+
+def enqueue(name, payload=None, dedupe_key=None, delay=0):
+    '''
+    Постановка задачи в очередь.
+
+    Если задача с тем же dedupe_key ещё ждёт или выполняется,
+    новая не создаётся и возвращается существующая.
+    '''
+    using = database()
+    job = Job(task=name, payload=payload or {}, dedupe_key=dedupe_key,
+              max_attempts=get_task(name).max_attempts,
+              run_at=timezone.now() + timedelta(seconds=delay))
+    if dedupe_key is None:
+        job.save(using=using)
+        metrics.inc('foodgram_jobs_total', {'task': name, 'event': 'enqueued'})
+        return job
+    while True:
+        try:
+            with transaction.atomic(using=using):
+                job.save(using=using, force_insert=True)
+        except IntegrityError:
+            existing = Job.objects.using(using).filter(
+                dedupe_key=dedupe_key, status__in=ACTIVE_STATUSES).first()
+            # Активная задача могла завершиться между INSERT и SELECT.
+            if existing is None:
+                continue
+            metrics.inc('foodgram_jobs_total',
+                        {'task': name, 'event': 'deduplicated'})
+            return existing
+        metrics.inc('foodgram_jobs_total', {'task': name, 'event': 'enqueued'})
+        return job
+
+
+def claim_jobs(worker, limit=CLAIM_BATCH_SIZE):
+    '''До limit готовых задач, переведённых в работу воркером worker.'''
+    using = database()
+    now = timezone.now()
+    ready = Job.objects.using(using).filter(
+        status=Job.Status.QUEUED, run_at__lte=now).order_by('run_at', 'pk')
+    claim = {'status': Job.Status.RUNNING, 'locked_by': worker,
+             'locked_at': now, 'attempts': F('attempts') + 1}
+    if connections[using].features.has_select_for_update_skip_locked:
+        with transaction.atomic(using=using):
+            pks = list(ready.select_for_update(skip_locked=True)
+                       .values_list('pk', flat=True)[:limit])
+            Job.objects.using(using).filter(pk__in=pks).update(**claim)
+    else:
+        # Задачу, которую успел забрать другой воркер, условие
+        # по состоянию не обновит.
+        pks = [
+            pk for pk in ready.values_list('pk', flat=True)[:limit]
+            if Job.objects.using(using).filter(
+                pk=pk, status=Job.Status.QUEUED).update(**claim)
+        ]
+    return list(Job.objects.using(using).filter(pk__in=pks)
+                .order_by('run_at', 'pk'))
+
+
+def retry_delay(attempts):
+    '''Пауза перед следующей попыткой после attempts неудачных.'''
+    return min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+
+
+def finish(job, worker, **fields):
+    '''
+    Запись итога задачи, если она всё ещё закреплена за воркером.
+
+    Задачу, которую вернули в очередь как брошенную, мог забрать
+    другой воркер; её состояние здесь не перезаписывается.
+    '''
+    updated = Job.objects.using(database()).filter(
+        pk=job.pk, status=Job.Status.RUNNING, locked_by=worker,
+    ).update(locked_by='', locked_at=None, **fields)
+    if not updated:
+        logger.warning('Задача %s больше не закреплена за воркером %s.',
+                       job.pk, worker)
+    return bool(updated)
+
+
+def run_job(job, worker):
+    '''Выполнение забранной задачи; возвращает итог для метрик.'''
+    metrics.observe('foodgram_job_wait_seconds', {'task': job.task},
+                    max((job.locked_at - job.run_at).total_seconds(), 0))
+    start = monotonic()
+    try:
+        result = get_task(job.task).func(**job.payload)
+    except Exception:
+        logger.exception('Задача %s (%s) завершилась ошибкой.',
+                         job.pk, job.task)
+        error = traceback.format_exc()
+        now = timezone.now()
+        if job.attempts < job.max_attempts:
+            outcome = 'retried'
+            fields = {'status': Job.Status.QUEUED, 'last_error': error,
+                      'run_at': now + timedelta(
+                          seconds=retry_delay(job.attempts))}
+        else:
+            outcome = 'failed'
+            fields = {'status': Job.Status.FAILED, 'last_error': error,
+                      'finished_at': now}
+    else:
+        outcome = 'done'
+        fields = {'status': Job.Status.DONE, 'result': result,
+                  'finished_at': timezone.now()}
+    metrics.observe('foodgram_job_duration_seconds', {'task': job.task},
+                    monotonic() - start)
+    if not finish(job, worker, **fields):
+        outcome = 'lost'
+    metrics.inc('foodgram_jobs_total', {'task': job.task, 'event': outcome})
+    return outcome
+
+
+def requeue_stale_jobs(timeout=LOCK_TIMEOUT):
+    '''
+    Возврат в очередь задач, брошенных остановившимися воркерами.
+
+    Задача, исчерпавшая попытки, отмечается как упавшая.
+    '''
+    using = database()
+    now = timezone.now()
+    stale = Job.objects.using(using).filter(
+        status=Job.Status.RUNNING,
+        locked_at__lt=now - timedelta(seconds=timeout))
+    error = STALE_LOCK_ERROR.format(timeout)
+    requeued = 0
+    for pk, name, attempts, max_attempts, locked_at in stale.values_list(
+            'pk', 'task', 'attempts', 'max_attempts', 'locked_at'):
+        if attempts < max_attempts:
+            event = 'requeued'
+            fields = {'status': Job.Status.QUEUED, 'run_at': now}
+        else:
+            event = 'failed'
+            fields = {'status': Job.Status.FAILED, 'finished_at': now}
+        # Условие по locked_at: задача не завершилась за это время.
+        if stale.filter(pk=pk, locked_at=locked_at).update(
+                locked_by='', locked_at=None, last_error=error, **fields):
+            logger.warning('Задача %s (%s) брошена воркером: %s.',
+                           pk, name, event)
+            metrics.inc('foodgram_jobs_total', {'task': name, 'event': event})
+            requeued += event == 'requeued'
+    return requeued
+
+
+def purge_finished_jobs(retention=FINISHED_JOB_RETENTION,
+                        batch_size=PURGE_BATCH_SIZE):
+    '''Удаление завершённых задач старше retention секунд пачками.'''
+    jobs = Job.objects.using(database())
+    expired = jobs.filter(
+        status__in=(Job.Status.DONE, Job.Status.FAILED),
+        finished_at__lt=timezone.now() - timedelta(seconds=retention),
+    ).order_by().values_list('pk', flat=True)
+    deleted = 0
+    while True:
+        pks = list(expired[:batch_size])
+        if not pks:
+            return deleted
+        deleted += jobs.filter(pk__in=pks).delete()[0]
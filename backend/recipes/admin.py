@@ -1,59 +1,142 @@
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.forms.models import BaseInlineFormSet
 
+from foodgram_backend.admin_tools import (BulkDeletionAdminMixin,
+                                          EstimatedCountAdminMixin,
+                                          related_count)
+from recipes.deletion import delete_recipes, recipe_dependents
 from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
                             ShoppingCart, ShortenedURL, Subscription, Tag)
 
 
 @admin.register(Ingredient)
-class IngredientAdmin(admin.ModelAdmin):
+class IngredientAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
     search_fields = ('name',)
 
+    def get_search_results(self, request, queryset, search_term):
+        # Автодополнение в форме рецепта ищет по началу названия: такой
+        # запрос использует индекс по UPPER(name). Список ингредиентов
+        # по-прежнему ищет по подстроке.
+        if request.resolver_match.url_name == 'autocomplete':
+            return queryset.filter(name__istartswith=search_term), False
+        return super().get_search_results(request, queryset, search_term)
+
 
 @admin.register(Tag)
-class TagAdmin(admin.ModelAdmin):
+class TagAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
     search_fields = ('name',)
 
 
+class IngredientAutocomplete(AutocompleteSelect):
+    '''
+    Виджет автодополнения, берущий подпись выбранного ингредиента
+    из словаря labels, если формсет загрузил его заранее.
+    '''
+
+    labels = None
+
+    def optgroups(self, name, value, attr=None):
+        if self.labels is None:
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        for pk in value:
+            if str(pk) in self.labels:
+                options.append(self.create_option(
+                    name, pk, self.labels[str(pk)], True, len(options)))
+        return [(None, options, 0)]
+
+
+class IngredientRecipeFormSet(BaseInlineFormSet):
+    '''Подписи выбранных ингредиентов всех строк одним запросом.'''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        ids = {str(form['ingredient'].value()) for form in self.forms}
+        labels = {
+            str(ingredient.pk): str(ingredient)
+            for ingredient in Ingredient.objects.filter(
+                pk__in=[pk for pk in ids if pk.isdigit()])
+        }
+        for form in self.forms:
+            widget = form.fields['ingredient'].widget
+            getattr(widget, 'widget', widget).labels = labels
+
+
 class IngredientRecipeInline(admin.TabularInline):
     model = IngredientRecipe
+    formset = IngredientRecipeFormSet
+    autocomplete_fields = ('ingredient',)
     extra = 1
     verbose_name = 'Ингредиент для рецепта'
     fields = ('ingredient', 'amount',)
     min_num = 1
 
+    def get_queryset(self, request):
+        # Заголовок строки (__str__) обращается к рецепту и ингредиенту.
+        return super().get_queryset(request).select_related('recipe',
+                                                            'ingredient')
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'ingredient':
+            kwargs['widget'] = IngredientAutocomplete(
+                db_field, self.admin_site, using=kwargs.get('using'))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(BulkDeletionAdminMixin, EstimatedCountAdminMixin,
+                  admin.ModelAdmin):
+    delete_objects = staticmethod(delete_recipes)
+    dependents = staticmethod(recipe_dependents)
     inlines = (IngredientRecipeInline,)
-    list_display = ('name', 'author', 'cooking_time', 'pub_date',)
+    list_display = ('name', 'author', 'cooking_time', 'pub_date',
+                    'favorite_count',)
     list_display_links = ('name',)
+    list_select_related = ('author',)
     fields = ('id', 'name', 'author', 'image', 'text', 'cooking_time', 'tags',
               'favorite_count',)
     readonly_fields = ('id', 'favorite_count',)
     filter_horizontal = ('tags',)
+    autocomplete_fields = ('author',)
     search_fields = ('author__username', 'name')
     list_filter = ('tags',)
 
-    @admin.display(description='Количество добавлений рецепта в избранное')
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            favorites_total=related_count(Favorite, 'recipe'))
+
+    @admin.display(description='Количество добавлений рецепта в избранное',
+                   ordering='favorites_total')
     def favorite_count(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_total
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
     list_display = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
     list_display = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
 
 
 @admin.register(Subscription)
-class SubscriptionAdmin(admin.ModelAdmin):
+class SubscriptionAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
     list_display = ('follower', 'following')
+    list_select_related = ('follower', 'following')
+    autocomplete_fields = ('follower', 'following')
 
 
 @admin.register(ShortenedURL)
-class ShortenedURLAdmin(admin.ModelAdmin):
+class ShortenedURLAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
     list_display = ('recipe', 'short_url')
+    list_select_related = ('recipe',)
+    autocomplete_fields = ('recipe',)
@@ -7,3 +7,8 @@ MAX_SLUG_LENGTH = 32
 MAX_UNIT_LENGTH = 64
 MIN_COOKING_TIME = 1
 NUMBER_OF_CHARS_FOR_SHORT_URL = 6
+MAX_SMALL_INTEGER_VALUE = 32767
+IMPORT_BATCH_SIZE = 1000
+DELETION_BATCH_SIZE = 1000
+CATALOG_BATCH_SIZE = 5000
+CATALOG_READ_CHUNK_SIZE = 64 * 1024
@@ -0,0 +1,159 @@
+'''
+Массовое удаление рецептов и пользователей.
+
+Каскадный сборщик Django загружает в память каждую зависимую строку
+(избранное, списки покупок, подписки) перед удалением. Здесь зависимые
+строки удаляются запросами DELETE по множествам: строки с большим
+разветвлением (избранное и списки покупок популярного рецепта,
+подписчики автора) - пачками по DELETION_BATCH_SIZE, каждая пачка
+отдельным запросом в своей транзакции. Сами рецепты и пользователи
+удаляются пачками в короткой транзакции, которая заодно удаляет
+появившиеся за это время зависимые строки.
+
+Файлы изображений удаляются после фиксации транзакции в фоновом
+потоке, чтобы не задерживать ответ.
+'''
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db import connections, router, transaction
+
+from recipes.constants import DELETION_BATCH_SIZE
+from recipes.models import (DeletedRecipe, Favorite, IngredientRecipe,
+                            Recipe, ShoppingCart, ShortenedURL, Subscription)
+
+
+User = get_user_model()
+
+logger = logging.getLogger('foodgram.deletion')
+
+file_cleanup_executor = ThreadPoolExecutor(
+    max_workers=1, thread_name_prefix='file-cleanup')
+
+
+def recipe_fan_out(recipes):
+    '''Зависимые строки рецептов, число которых не ограничено.'''
+    return [
+        Favorite.objects.filter(recipe__in=recipes),
+        ShoppingCart.objects.filter(recipe__in=recipes),
+    ]
+
+
+def recipe_dependents(recipes):
+    '''Все зависимые строки рецептов.'''
+    return recipe_fan_out(recipes) + [
+        IngredientRecipe.objects.filter(recipe__in=recipes),
+        Recipe.tags.through.objects.filter(recipe__in=recipes),
+        ShortenedURL.objects.filter(recipe__in=recipes),
+    ]
+
+
+def user_dependents(users):
+    '''Зависимые строки пользователей, кроме рецептов.'''
+    return [
+        Favorite.objects.filter(user__in=users),
+        ShoppingCart.objects.filter(user__in=users),
+        Subscription.objects.filter(follower__in=users),
+        Subscription.objects.filter(following__in=users),
+    ]
+
+
+def raw_delete(queryset):
+    '''Один DELETE без сборщика и сигналов; число удалённых строк.'''
+    return queryset._raw_delete(router.db_for_write(queryset.model))
+
+
+def delete_in_batches(queryset, batch_size=DELETION_BATCH_SIZE):
+    '''Удаление строк пачками, пока очередная пачка не окажется неполной.'''
+    deleted = 0
+    while True:
+        count = raw_delete(queryset.model.objects.filter(
+            pk__in=queryset.order_by().values('pk')[:batch_size]))
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+
+def iterate_batches(queryset, fields, batch_size=DELETION_BATCH_SIZE):
+    '''Значения fields строк queryset пачками по возрастанию pk.'''
+    last = None
+    queryset = queryset.order_by('pk')
+    while True:
+        page = queryset if last is None else queryset.filter(pk__gt=last)
+        batch = list(page.values_list('pk', *fields)[:batch_size])
+        if batch:
+            yield batch
+        if len(batch) < batch_size:
+            return
+        last = batch[-1][0]
+
+
+def delete_recipes(recipes):
+    '''Удаление рецептов queryset; возвращает число удалённых рецептов.'''
+    deleted = 0
+    for batch in iterate_batches(recipes, ('image',)):
+        pks = [pk for pk, _ in batch]
+        for dependents in recipe_fan_out(pks):
+            delete_in_batches(dependents)
+        with transaction.atomic(using=router.db_for_write(Recipe)):
+            for dependents in recipe_dependents(pks):
+                raw_delete(dependents)
+            DeletedRecipe.objects.bulk_create(
+                (DeletedRecipe(recipe_id=pk) for pk in pks),
+                ignore_conflicts=True)
+            deleted += raw_delete(Recipe.objects.filter(pk__in=pks))
+            schedule_file_cleanup([image for _, image in batch if image])
+    return deleted
+
+
+def delete_users(users):
+    '''Удаление пользователей queryset вместе с их рецептами.'''
+    deleted = 0
+    for batch in iterate_batches(users, ('avatar',)):
+        pks = [pk for pk, _ in batch]
+        delete_recipes(Recipe.objects.filter(author__in=pks))
+        for dependents in user_dependents(pks):
+            delete_in_batches(dependents)
+        with transaction.atomic(using=router.db_for_write(User)):
+            for dependents in user_dependents(pks):
+                raw_delete(dependents)
+            # Оставшиеся связи (токены, группы, журнал админки) малы;
+            # сборщик удалит их и отправит сигналы об удалении
+            # пользователей, сбрасывающие кэш токенов.
+            deleted += User.objects.filter(pk__in=pks).delete()[1].get(
+                User._meta.label, 0)
+            schedule_file_cleanup([avatar for _, avatar in batch if avatar])
+    return deleted
+
+
+def schedule_file_cleanup(names):
+    '''Удаление файлов в фоне после фиксации текущей транзакции.'''
+    if names:
+        transaction.on_commit(
+            lambda: file_cleanup_executor.submit(run_file_cleanup, names))
+
+
+def run_file_cleanup(names):
+    try:
+        delete_files(names)
+    except Exception:
+        logger.exception('Ошибка удаления файлов')
+    finally:
+        # Соединения фонового потока не закрывает обработчик
+        # конца HTTP-запроса.
+        connections.close_all()
+
+
+def delete_files(names):
+    '''Удаление файлов, на которые больше не ссылаются рецепты и аватары.'''
+    used = set(Recipe.objects.filter(image__in=names).values_list(
+        'image', flat=True))
+    used.update(User.objects.filter(avatar__in=names).values_list(
+        'avatar', flat=True))
+    for name in set(names) - used:
+        try:
+            default_storage.delete(name)
+        except OSError:
+            logger.exception('Не удалось удалить файл %s', name)
@@ -0,0 +1,187 @@
+import random
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, Subscription, Tag)
+
+
+User = get_user_model()
+
+DEFAULT_PASSWORD = 'foodgram-benchmark'
+WORDS = ('салат', 'суп', 'пирог', 'паста', 'рагу', 'запеканка', 'каша',
+         'омлет', 'соус', 'десерт', 'быстрый', 'домашний', 'острый',
+         'летний', 'сытный', 'постный', 'праздничный', 'бабушкин')
+
+
+class Command(BaseCommand):
+    help = ('Генерация воспроизводимого синтетического набора данных: '
+            'пользователи, рецепты, избранное, списки покупок и подписки. '
+            'Каталог ингредиентов и тегов должен быть загружен заранее.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument(
+            '--favorites', type=int, default=20,
+            help='Среднее число рецептов в избранном у пользователя.')
+        parser.add_argument(
+            '--cart', type=int, default=5,
+            help='Среднее число рецептов в списке покупок у пользователя.')
+        parser.add_argument(
+            '--subscriptions', type=int, default=10,
+            help='Среднее число подписок у пользователя.')
+        parser.add_argument('--min-ingredients', type=int, default=3)
+        parser.add_argument('--max-ingredients', type=int, default=15)
+        parser.add_argument('--max-tags', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--password', default=DEFAULT_PASSWORD,
+            help='Пароль всех сгенерированных пользователей.')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        ingredient_ids = list(
+            Ingredient.objects.order_by('id').values_list('id', flat=True))
+        tag_ids = list(Tag.objects.order_by('id').values_list('id', flat=True))
+        if not ingredient_ids or not tag_ids:
+            raise CommandError(
+                'Сначала загрузите ингредиенты и теги '
+                '(loaddata foodgram_fixture.json).')
+        if options['users'] <= 0:
+            raise CommandError('Нужен хотя бы один пользователь.')
+
+        with transaction.atomic():
+            user_ids = self.create_users(options['users'],
+                                         options['password'])
+            # Вес автора по закону Парето: немногие авторы пишут
+            # большую часть рецептов, как на реальной площадке.
+            author_weights = [self.rng.paretovariate(1.2) for _ in user_ids]
+            recipe_ids = self.create_recipes(
+                options['recipes'], user_ids, author_weights)
+            self.create_recipe_relations(
+                recipe_ids, ingredient_ids, tag_ids, options)
+            recipe_weights = [self.rng.paretovariate(1.5)
+                              for _ in recipe_ids]
+            for model, average in ((Favorite, options['favorites']),
+                                   (ShoppingCart, options['cart'])):
+                self.create_user_recipe_links(
+                    model, average, user_ids, recipe_ids, recipe_weights)
+            self.create_subscriptions(
+                options['subscriptions'], user_ids, author_weights)
+            self.reset_sequences()
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(user_ids)}, '
+            f'рецептов: {len(recipe_ids)}.'))
+
+    def next_id(self, model):
+        return (model.objects.aggregate(max_id=Max('id'))['max_id'] or 0) + 1
+
+    def bulk_create(self, model, objs):
+        model.objects.bulk_create(objs, batch_size=self.batch_size)
+        self.stdout.write(f'{model._meta.label}: {len(objs)}')
+
+    def create_users(self, count, password):
+        # Ключи задаются явно: bulk_create в SQLite не возвращает id.
+        first_id = self.next_id(User)
+        password_hash = make_password(password)
+        users = [
+            User(id=first_id + index,
+                 username=f'user{first_id + index}',
+                 email=f'user{first_id + index}@example.com',
+                 first_name=self.rng.choice(('Анна', 'Иван', 'Мария',
+                                             'Пётр', 'Ольга', 'Олег')),
+                 last_name=self.rng.choice(('Иванова', 'Петров', 'Смирнова',
+                                            'Кузнецов', 'Попова')),
+                 password=password_hash)
+            for index in range(count)
+        ]
+        self.bulk_create(User, users)
+        return [user.id for user in users]
+
+    def create_recipes(self, count, user_ids, author_weights):
+        first_id = self.next_id(Recipe)
+        authors = self.rng.choices(user_ids, weights=author_weights, k=count)
+        recipes = [
+            Recipe(id=first_id + index,
+                   author_id=author_id,
+                   name=' '.join(self.rng.sample(WORDS, 3)).capitalize(),
+                   text=' '.join(self.rng.choices(
+                       WORDS, k=self.rng.randint(20, 200))),
+                   cooking_time=self.rng.randint(5, 180))
+            for index, author_id in enumerate(authors)
+        ]
+        self.bulk_create(Recipe, recipes)
+        return [recipe.id for recipe in recipes]
+
+    def create_recipe_relations(self, recipe_ids, ingredient_ids, tag_ids,
+                                options):
+        ingredient_recipes = []
+        recipe_tags = []
+        max_tags = min(options['max_tags'], len(tag_ids))
+        max_ingredients = min(options['max_ingredients'], len(ingredient_ids))
+        min_ingredients = min(options['min_ingredients'], max_ingredients)
+        for recipe_id in recipe_ids:
+            for ingredient_id in self.rng.sample(
+                    ingredient_ids,
+                    self.rng.randint(min_ingredients, max_ingredients)):
+                ingredient_recipes.append(IngredientRecipe(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    amount=self.rng.randint(1, 1000)))
+            for tag_id in self.rng.sample(tag_ids,
+                                          self.rng.randint(1, max_tags)):
+                recipe_tags.append(Recipe.tags.through(
+                    recipe_id=recipe_id, tag_id=tag_id))
+        self.bulk_create(IngredientRecipe, ingredient_recipes)
+        self.bulk_create(Recipe.tags.through, recipe_tags)
+
+    def sample_weighted(self, population, weights, count):
+        '''Выборка без повторов с учётом популярности.'''
+        count = min(count, len(population) // 2)
+        chosen = set()
+        while len(chosen) < count:
+            chosen.update(self.rng.choices(population, weights=weights,
+                                           k=count - len(chosen)))
+        return chosen
+
+    def create_user_recipe_links(self, model, average, user_ids, recipe_ids,
+                                 recipe_weights):
+        if not recipe_ids or average <= 0:
+            return
+        links = [
+            model(user_id=user_id, recipe_id=recipe_id)
+            for user_id in user_ids
+            for recipe_id in self.sample_weighted(
+                recipe_ids, recipe_weights,
+                int(self.rng.expovariate(1 / average)))
+        ]
+        self.bulk_create(model, links)
+
+    def create_subscriptions(self, average, user_ids, author_weights):
+        if average <= 0 or len(user_ids) < 2:
+            return
+        subscriptions = [
+            Subscription(follower_id=follower_id, following_id=following_id)
+            for follower_id in user_ids
+            for following_id in self.sample_weighted(
+                user_ids, author_weights,
+                int(self.rng.expovariate(1 / average)))
+            if following_id != follower_id
+        ]
+        self.bulk_create(Subscription, subscriptions)
+
+    def reset_sequences(self):
+        '''Сдвиг последовательностей PostgreSQL после вставки с явными id.'''
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [User, Recipe])
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
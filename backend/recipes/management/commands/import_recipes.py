@@ -0,0 +1,285 @@
+import json
+import os
+import sys
+from urllib.parse import unquote, urlsplit
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import SuspiciousFileOperation, ValidationError
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, transaction
+from django.http.request import split_domain_port, validate_host
+from drf_extra_fields.fields import Base64ImageField
+from rest_framework.exceptions import ValidationError as DRFValidationError
+
+from recipes.constants import (IMPORT_BATCH_SIZE, MAX_RECIPE_NAME_LENGTH,
+                               MAX_SMALL_INTEGER_VALUE, MIN_COOKING_TIME,
+                               MIN_INGREDIENT_AMOUNT)
+from recipes.deletion import delete_files
+from recipes.models import Ingredient, IngredientRecipe, Recipe, Tag
+
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Массовый импорт рецептов из файла NDJSON: одна строка - '
+            'один рецепт в формате тела POST-запроса /api/recipes/. '
+            'Изображение передаётся в Base64 или ссылкой из выгрузки '
+            '/api/recipes/export/; по ссылке копируется файл из хранилища '
+            'этого же сервера, ссылки на другие серверы не загружаются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Путь к файлу NDJSON ("-" для чтения из stdin).')
+        parser.add_argument(
+            '--author', required=True,
+            help='Email пользователя, который станет автором рецептов.')
+        parser.add_argument(
+            '--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+            help='Количество рецептов, сохраняемых в одной транзакции.')
+        parser.add_argument(
+            '--ignore-images', action='store_true',
+            help='Не загружать изображения (например, при импорте '
+                 'выгрузки другого сервера).')
+
+    def handle(self, *args, **options):
+        author = User.objects.filter(email=options['author']).first()
+        if author is None:
+            raise CommandError(
+                f'Пользователь {options["author"]} не найден.')
+        if options['batch_size'] <= 0:
+            raise CommandError('Размер порции должен быть положительным.')
+        self.ignore_images = options['ignore_images']
+        self.image_field = Base64ImageField()
+        self.ingredient_ids = set(
+            Ingredient.objects.values_list('id', flat=True))
+        self.tag_ids = set(Tag.objects.values_list('id', flat=True))
+
+        if options['path'] == '-':
+            stream = sys.stdin
+        else:
+            try:
+                stream = open(options['path'], encoding='utf-8')
+            except OSError as error:
+                raise CommandError(
+                    f'Не удалось открыть файл {options["path"]}: '
+                    f'{error.strerror}.')
+        created = errors = 0
+        batch = []
+        with stream:
+            for line_number, line in enumerate(stream, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    batch.append((line_number, self.parse_line(line)))
+                except ValidationError as error:
+                    errors += 1
+                    self.stderr.write(
+                        f'Строка {line_number}: {"; ".join(error.messages)}')
+                if len(batch) >= options['batch_size']:
+                    saved, failed = self.import_batch(author, batch)
+                    created += saved
+                    errors += failed
+                    batch = []
+            if batch:
+                saved, failed = self.import_batch(author, batch)
+                created += saved
+                errors += failed
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано рецептов: {created}, строк с ошибками: {errors}.'))
+
+    def parse_line(self, line):
+        '''Разбор и проверка одной строки без обращений к базе данных.'''
+        try:
+            data = json.loads(line)
+        except ValueError as error:
+            raise ValidationError(f'некорректный JSON ({error}).')
+        if not isinstance(data, dict):
+            raise ValidationError('ожидается JSON-объект.')
+
+        name = data.get('name')
+        if not isinstance(name, str) or not name.strip():
+            raise ValidationError('не указано название.')
+        if len(name) > MAX_RECIPE_NAME_LENGTH:
+            raise ValidationError('слишком длинное название.')
+        text = data.get('text')
+        if not isinstance(text, str) or not text.strip():
+            raise ValidationError('не указано описание.')
+        cooking_time = self.parse_small_integer(
+            data.get('cooking_time'), MIN_COOKING_TIME, 'cooking_time')
+
+        tags = data.get('tags')
+        if not isinstance(tags, list) or not tags:
+            raise ValidationError('нужно указать тег/теги.')
+        if not all(isinstance(tag, int) for tag in tags):
+            raise ValidationError('теги указываются по id.')
+        if len(tags) != len(set(tags)):
+            raise ValidationError('теги не должны повторяться.')
+        unknown_tags = [tag for tag in tags if tag not in self.tag_ids]
+        if unknown_tags:
+            raise ValidationError(
+                f'теги с id {", ".join(map(str, unknown_tags))} '
+                'не существуют.')
+
+        ingredients = data.get('ingredients')
+        if not isinstance(ingredients, list) or not ingredients:
+            raise ValidationError('нужно указать ингредиенты.')
+        amounts = {}
+        for ingredient in ingredients:
+            if not isinstance(ingredient, dict):
+                raise ValidationError('некорректный формат ингредиента.')
+            id = ingredient.get('id')
+            if not isinstance(id, int) or id not in self.ingredient_ids:
+                raise ValidationError(f'ингредиент с id {id} не существует.')
+            if id in amounts:
+                raise ValidationError('ингредиенты не должны повторяться.')
+            amounts[id] = self.parse_small_integer(
+                ingredient.get('amount'), MIN_INGREDIENT_AMOUNT, 'amount')
+
+        # Изображение декодируется при записи порции: в памяти остаётся
+        # только исходная строка.
+        image = None
+        if not self.ignore_images:
+            image = data.get('image') or None
+            if image is not None and not isinstance(image, str):
+                raise ValidationError(
+                    'изображение передаётся строкой Base64 или ссылкой.')
+        return {
+            'name': name,
+            'text': text,
+            'cooking_time': cooking_time,
+            'image': image,
+            'tags': tags,
+            'ingredients': amounts,
+        }
+
+    def parse_small_integer(self, value, min_value, field_name):
+        if (isinstance(value, bool) or not isinstance(value, int)
+                or not min_value <= value <= MAX_SMALL_INTEGER_VALUE):
+            raise ValidationError(
+                f'{field_name} должно быть целым числом от {min_value} '
+                f'до {MAX_SMALL_INTEGER_VALUE}.')
+        return value
+
+    def import_batch(self, author, batch):
+        '''Сохранение изображений, затем рецептов порции.'''
+        stored, failed = self.store_images(batch)
+        saved, not_saved = self.save_batch(author, stored)
+        return saved, failed + not_saved
+
+    def store_images(self, batch):
+        '''
+        Запись изображений порции в хранилище по одному.
+
+        В данных рецепта строка изображения заменяется именем файла,
+        поэтому bulk_create уже не пишет файлы. Строки с некорректным
+        изображением пропускаются.
+        '''
+        stored = []
+        failed = 0
+        for line_number, data in batch:
+            if data['image'] is not None:
+                try:
+                    image = self.load_image(data['image'])
+                except ValidationError as error:
+                    failed += 1
+                    self.stderr.write(
+                        f'Строка {line_number}: {"; ".join(error.messages)}')
+                    continue
+                with image:
+                    data['image'] = default_storage.save(
+                        self.image_name(image), image)
+            stored.append((line_number, data))
+        return stored, failed
+
+    def load_image(self, value):
+        '''Файл изображения из строки Base64 или ссылки на файл сервера.'''
+        if not value.startswith(('http://', 'https://', '/')):
+            try:
+                return self.image_field.to_internal_value(value)
+            except DRFValidationError as error:
+                raise ValidationError(
+                    f'некорректное изображение ({"; ".join(error.detail)}).')
+            except ValidationError as error:
+                raise ValidationError(
+                    f'некорректное изображение ({"; ".join(error.messages)}).')
+        url = urlsplit(value)
+        host, _ = split_domain_port(url.netloc)
+        path = unquote(url.path)
+        if (url.netloc and not validate_host(host, settings.ALLOWED_HOSTS)
+                or not path.startswith(settings.MEDIA_URL)):
+            raise ValidationError(
+                f'ссылка {value} не указывает на файлы этого сервера.')
+        name = path[len(settings.MEDIA_URL):]
+        try:
+            if name and default_storage.exists(name):
+                return default_storage.open(name)
+        except SuspiciousFileOperation:
+            pass
+        raise ValidationError(f'файл по ссылке {value} не найден.')
+
+    def image_name(self, image):
+        return Recipe._meta.get_field('image').generate_filename(
+            None, os.path.basename(image.name))
+
+    def save_batch(self, author, batch):
+        '''
+        Сохранение порции рецептов в одной транзакции.
+
+        Если база данных отклонила порцию, рецепты сохраняются по одному,
+        чтобы записать остальные и указать строку с ошибкой. Изображения
+        несохранённых рецептов удаляются из хранилища.
+        '''
+        try:
+            self.write_batch(author, batch)
+        except DatabaseError as error:
+            if len(batch) == 1:
+                self.delete_images(batch)
+                self.stderr.write(
+                    f'Строка {batch[0][0]}: '
+                    f'ошибка записи в базу данных ({error}).')
+                return 0, 1
+            saved = failed = 0
+            for item in batch:
+                item_saved, item_failed = self.save_batch(author, [item])
+                saved += item_saved
+                failed += item_failed
+            return saved, failed
+        except BaseException:
+            self.delete_images(batch)
+            raise
+        return len(batch), 0
+
+    def delete_images(self, batch):
+        # Файлы уже сохранённых рецептов delete_files не удаляет.
+        delete_files([data['image'] for _, data in batch if data['image']])
+
+    def write_batch(self, author, batch):
+        with transaction.atomic():
+            recipes = [
+                Recipe(author=author,
+                       name=data['name'],
+                       text=data['text'],
+                       cooking_time=data['cooking_time'],
+                       image=data['image'])
+                for _, data in batch
+            ]
+            if connection.features.can_return_rows_from_bulk_insert:
+                Recipe.objects.bulk_create(recipes)
+            else:
+                for recipe in recipes:
+                    recipe.save()
+            IngredientRecipe.objects.bulk_create(
+                IngredientRecipe(recipe=recipe,
+                                 ingredient_id=id,
+                                 amount=amount)
+                for recipe, (_, data) in zip(recipes, batch)
+                for id, amount in data['ingredients'].items()
+            )
+            Recipe.tags.through.objects.bulk_create(
+                Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag_id)
+                for recipe, (_, data) in zip(recipes, batch)
+                for tag_id in data['tags']
+            )
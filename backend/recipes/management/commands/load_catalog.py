@@ -0,0 +1,293 @@
+import csv
+import io
+import json
+import re
+import sys
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_slug
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from recipes.constants import (CATALOG_BATCH_SIZE, CATALOG_READ_CHUNK_SIZE,
+                               MAX_INGREDIENT_NAME_LENGTH, MAX_SLUG_LENGTH,
+                               MAX_TAG_NAME_LENGTH, MAX_UNIT_LENGTH)
+from recipes.models import Ingredient, Recipe, Tag
+
+
+# Поля справочников и их максимальная длина.
+FIELDS = {
+    'ingredients': {'name': MAX_INGREDIENT_NAME_LENGTH,
+                    'measurement_unit': MAX_UNIT_LENGTH},
+    'tags': {'name': MAX_TAG_NAME_LENGTH, 'slug': MAX_SLUG_LENGTH},
+}
+FORMATS = {'.csv': 'csv', '.json': 'json', '.ndjson': 'ndjson',
+           '.jsonl': 'ndjson'}
+WHITESPACE = re.compile(r'\s*')
+
+
+def read_csv(stream, fields):
+    '''Строки CSV без заголовка или с заголовком из имён полей.'''
+    for number, row in enumerate(csv.reader(stream), start=1):
+        if number == 1 and tuple(row) == fields:
+            continue
+        if row:
+            yield number, dict(zip(fields, row))
+
+
+def read_ndjson(stream, fields):
+    for number, line in enumerate(stream, start=1):
+        if line.strip():
+            try:
+                yield number, json.loads(line)
+            except ValueError as error:
+                yield number, ValidationError(f'некорректный JSON ({error}).')
+
+
+class JSONArrayReader:
+    '''
+    Элементы JSON-массива по одному без чтения всего файла в память.
+
+    Разделители проверяются так же строго, как в json.load: пропущенная
+    или лишняя запятая - ошибка с номером символа в файле.
+    '''
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        # Номер в файле символа buffer[0] и позиция разбора в buffer.
+        self.offset = 0
+        self.position = 0
+        self.finished = False
+
+    def fill(self):
+        '''Следующая порция файла; False, если файл закончился.'''
+        if self.finished:
+            return False
+        chunk = self.stream.read(CATALOG_READ_CHUNK_SIZE)
+        self.finished = not chunk
+        self.offset += self.position
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return bool(chunk)
+
+    def peek(self):
+        '''Следующий непробельный символ, в конце файла - пустая строка.'''
+        while True:
+            self.position = WHITESPACE.match(self.buffer, self.position).end()
+            if self.position < len(self.buffer) or not self.fill():
+                return self.buffer[self.position:self.position + 1]
+
+    def error(self, message):
+        return CommandError(
+            f'Некорректный JSON (символ {self.offset + self.position + 1}): '
+            f'{message}.')
+
+    def decode(self, number):
+        while True:
+            try:
+                item, end = self.decoder.raw_decode(self.buffer, self.position)
+            except ValueError:
+                end = None
+            # Значение, дошедшее до конца порции, может продолжаться
+            # в следующей: например, число.
+            if (end is None or end == len(self.buffer)) and self.fill():
+                continue
+            if end is None:
+                raise self.error(f'некорректный элемент {number}')
+            self.position = end
+            return item
+
+    def __iter__(self):
+        if self.peek() != '[':
+            raise self.error('ожидается JSON-массив')
+        self.position += 1
+        number = 0
+        if self.peek() == ']':
+            self.position += 1
+        else:
+            while True:
+                number += 1
+                if self.peek() in (',', ']', ''):
+                    raise self.error(f'ожидается элемент {number}')
+                yield number, self.decode(number)
+                separator = self.peek()
+                if separator not in (',', ']'):
+                    raise self.error(
+                        f'после элемента {number} ожидается "," или "]"')
+                self.position += 1
+                if separator == ']':
+                    break
+        if self.peek():
+            raise self.error('данные после конца массива')
+
+
+def read_json(stream, fields):
+    return iter(JSONArrayReader(stream))
+
+
+READERS = {'csv': read_csv, 'json': read_json, 'ndjson': read_ndjson}
+
+
+class Command(BaseCommand):
+    help = ('Потоковая загрузка справочника ингредиентов или тегов из CSV, '
+            'JSON-массива или NDJSON. Существующие записи обновляются, '
+            'повторная загрузка того же файла ничего не меняет.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('catalog', choices=tuple(FIELDS))
+        parser.add_argument(
+            'path', help='Путь к файлу ("-" для чтения из stdin).')
+        parser.add_argument(
+            '--format', choices=tuple(READERS),
+            help='Формат файла; по умолчанию определяется по расширению.')
+        parser.add_argument(
+            '--batch-size', type=int, default=CATALOG_BATCH_SIZE,
+            help='Количество строк в одной порции записи.')
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='Не использовать COPY в PostgreSQL.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError('Размер порции должен быть положительным.')
+        file_format = options['format']
+        if file_format is None:
+            suffix = options['path'][options['path'].rfind('.'):].lower()
+            if suffix not in FORMATS:
+                raise CommandError(
+                    'Не удалось определить формат файла: укажите --format.')
+            file_format = FORMATS[suffix]
+        self.catalog = options['catalog']
+        self.fields = FIELDS[self.catalog]
+        names = tuple(self.fields)
+        self.verbosity = options['verbosity']
+        self.processed = self.errors = 0
+
+        if options['path'] == '-':
+            stream = sys.stdin
+        else:
+            try:
+                stream = open(options['path'], encoding='utf-8', newline='')
+            except OSError as error:
+                raise CommandError(
+                    f'Не удалось открыть файл {options["path"]}: '
+                    f'{error.strerror}.')
+        with stream:
+            rows = self.clean_rows(
+                READERS[file_format](stream, names))
+            batches = iter(lambda: list(islice(rows, options['batch_size'])),
+                           [])
+            try:
+                if self.catalog == 'tags':
+                    created, updated = self.load_tags(batches)
+                elif (connection.vendor == 'postgresql'
+                      and not options['no_copy']):
+                    created, updated = self.copy_ingredients(batches)
+                else:
+                    created, updated = self.load_ingredients(batches)
+            except DatabaseError as error:
+                raise CommandError(
+                    f'Ошибка записи в базу данных ({error}).')
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано строк: {self.processed}, добавлено: {created}, '
+            f'обновлено: {updated}, строк с ошибками: {self.errors}.'))
+
+    def clean_rows(self, rows):
+        '''Проверенные значения полей; ошибочные строки пропускаются.'''
+        for number, data in rows:
+            try:
+                yield self.clean_row(data)
+            except ValidationError as error:
+                self.errors += 1
+                self.stderr.write(
+                    f'Строка {number}: {"; ".join(error.messages)}')
+
+    def clean_row(self, data):
+        if isinstance(data, ValidationError):
+            raise data
+        if not isinstance(data, dict):
+            raise ValidationError('ожидается объект с полями '
+                                  f'{", ".join(self.fields)}.')
+        values = []
+        for field, max_length in self.fields.items():
+            value = data.get(field)
+            if not isinstance(value, str) or not value.strip():
+                raise ValidationError(f'не указано поле {field}.')
+            value = value.strip()
+            if len(value) > max_length:
+                raise ValidationError(f'слишком длинное поле {field}.')
+            if field == 'slug':
+                validate_slug(value)
+            values.append(value)
+        return tuple(values)
+
+    def report(self, batch):
+        self.processed += len(batch)
+        if self.verbosity:
+            self.stdout.write(f'Обработано строк: {self.processed}')
+
+    def load_ingredients(self, batches):
+        '''Порции INSERT с пропуском уже существующих пар.'''
+        before = Ingredient.objects.count()
+        for batch in batches:
+            # Уникальная пара (name, measurement_unit) - все поля
+            # ингредиента, поэтому обновлять при конфликте нечего.
+            Ingredient.objects.bulk_create(
+                (Ingredient(name=name, measurement_unit=unit)
+                 for name, unit in batch),
+                ignore_conflicts=True)
+            self.report(batch)
+        return Ingredient.objects.count() - before, 0
+
+    def copy_ingredients(self, batches):
+        '''COPY во временную таблицу и одна вставка в справочник.'''
+        table = connection.ops.quote_name(Ingredient._meta.db_table)
+        with transaction.atomic(), connection.cursor() as cursor:
+            before = Ingredient.objects.count()
+            cursor.execute(
+                'CREATE TEMPORARY TABLE catalog_ingredient '
+                f'(name varchar({MAX_INGREDIENT_NAME_LENGTH}), '
+                f'measurement_unit varchar({MAX_UNIT_LENGTH})) '
+                'ON COMMIT DROP')
+            for batch in batches:
+                data = io.StringIO()
+                csv.writer(data).writerows(batch)
+                data.seek(0)
+                cursor.copy_expert(
+                    'COPY catalog_ingredient FROM STDIN WITH (FORMAT csv)',
+                    data)
+                self.report(batch)
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                'SELECT DISTINCT name, measurement_unit '
+                'FROM catalog_ingredient '
+                'ON CONFLICT (name, measurement_unit) DO NOTHING')
+            return Ingredient.objects.count() - before, 0
+
+    def load_tags(self, batches):
+        '''Обновление названий по слагу и добавление новых тегов.'''
+        created = updated = 0
+        for batch in batches:
+            names = {slug: name for name, slug in batch}
+            with transaction.atomic():
+                existing = Tag.objects.in_bulk(names, field_name='slug')
+                changed = [tag for slug, tag in existing.items()
+                           if tag.name != names[slug]]
+                for tag in changed:
+                    tag.name = names[tag.slug]
+                Tag.objects.bulk_update(changed, ('name',))
+                # bulk_update не отправляет post_save: представление
+                # рецептов с переименованными тегами меняется здесь.
+                Recipe.objects.filter(tags__in=changed).update(
+                    updated_at=timezone.now())
+                Tag.objects.bulk_create(
+                    Tag(name=name, slug=slug) for slug, name in names.items()
+                    if slug not in existing)
+            created += len(names) - len(existing)
+            updated += len(changed)
+            self.report(batch)
+        return created, updated
@@ -0,0 +1,34 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+
+class Command(BaseCommand):
+    help = ('Копирование основной базы SQLite в файлы реплик из '
+            'DATABASE_REPLICAS для локальной проверки маршрутизации чтения.')
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES[DEFAULT_DB_ALIAS]
+        if primary['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('Команда работает только с SQLite: реплики '
+                               'PostgreSQL наполняет репликация.')
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Реплики не настроены: задайте '
+                               'DATABASE_REPLICAS.')
+        source = sqlite3.connect(primary['NAME'])
+        try:
+            for alias in settings.DATABASE_REPLICAS:
+                path = settings.DATABASES[alias]['NAME']
+                target = sqlite3.connect(path)
+                try:
+                    # Резервное копирование SQLite даёт согласованный
+                    # снимок даже при одновременной записи в основную базу.
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(f'{alias}: {path}')
+        finally:
+            source.close()
+        self.stdout.write(self.style.SUCCESS('Реплики обновлены.'))
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+
+INDEX_NAME = 'recipes_ingredient_upper_name_idx'
+
+
+def create_index(apps, schema_editor):
+    # Поиск админки по началу названия (name__istartswith) выполняется
+    # как UPPER(name) LIKE 'X%'. Такой запрос использует только индекс
+    # по выражению с text_pattern_ops, который нельзя описать в Meta
+    # средствами Django 3.2. В SQLite LIKE не использует индексы.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} '
+            'ON recipes_ingredient (UPPER(name::text) text_pattern_ops)')
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_recipe_updated_at_deletedrecipe'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
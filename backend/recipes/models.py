@@ -78,6 +78,11 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата создания'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name='Дата изменения'
+    )
     name = models.CharField(
         max_length=MAX_RECIPE_NAME_LENGTH,
         verbose_name='Название'
@@ -119,6 +124,28 @@ class Recipe(models.Model):
         return reverse('api:recipes-detail', kwargs={'pk': self.pk})
 
 
+class DeletedRecipe(models.Model):
+    '''Запись об удалённом рецепте для синхронизации клиентов.'''
+
+    recipe_id = models.BigIntegerField(
+        unique=True,
+        verbose_name='id рецепта'
+    )
+    deleted_at = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Дата удаления'
+    )
+
+    class Meta:
+        ordering = ('deleted_at',)
+        verbose_name = 'удалённый рецепт'
+        verbose_name_plural = 'Удалённые рецепты'
+
+    def __str__(self):
+        return f'Рецепт {self.recipe_id} удалён {self.deleted_at}'
+
+
 class IngredientRecipe(models.Model):
     '''Модель, связывающая ингредиенты и рецепты.'''
 
@@ -0,0 +1,22 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from recipes.models import DeletedRecipe, Ingredient, Recipe, Tag
+
+
+@receiver(post_delete, sender=Recipe)
+def create_recipe_tombstone(sender, instance, **kwargs):
+    '''Сохранение отметки об удалении рецепта для дельта-синхронизации.'''
+    DeletedRecipe.objects.get_or_create(recipe_id=instance.pk)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_save, sender=Tag)
+def touch_related_recipes(sender, instance, created, **kwargs):
+    '''Изменение тега или ингредиента меняет представление рецептов.'''
+    if created:
+        return
+    lookup = 'tags' if sender is Tag else 'ingredients'
+    Recipe.objects.filter(**{lookup: instance}).update(
+        updated_at=timezone.now())
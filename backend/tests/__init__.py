@@ -0,0 +1,11 @@
+# Изолированные кэши: тесты не должны видеть записи общего файлового кэша.
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tests-default',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tests-shared',
+    },
+}
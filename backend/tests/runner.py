@@ -0,0 +1,21 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class FoodgramTestRunner(DiscoverRunner):
+    '''
+    Запуск тестов со счётчиками троттлинга в памяти процесса.
+
+    Файл хранилища из окружения разработчика переносил бы счётчики
+    между запусками, и тесты начинали бы получать 429.
+    '''
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.throttle_override = override_settings(
+            THROTTLE_STORE='memory://')
+        self.throttle_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.throttle_override.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,121 @@
+'''Число SQL-запросов страниц админки.'''
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, ShortenedURL, Subscription)
+from tests import TEST_CACHES
+
+
+User = get_user_model()
+
+CHANGELISTS = (
+    '/admin/recipes/recipe/',
+    '/admin/recipes/recipe/?o=5',
+    '/admin/recipes/favorite/',
+    '/admin/recipes/shoppingcart/',
+    '/admin/recipes/subscription/',
+    '/admin/recipes/shortenedurl/',
+    '/admin/recipes/ingredient/?q=ingredient01',
+    '/admin/users/foodgramuser/',
+    '/admin/users/foodgramuser/?o=-6',
+)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class AdminQueriesTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin')
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'ingredient{index:03}', measurement_unit='г')
+            for index in range(50)
+        )
+        cls.ingredients = list(Ingredient.objects.order_by('id'))
+        cls.recipe = Recipe.objects.create(
+            author=cls.admin, name='Рецепт', text='Текст', cooking_time=5,
+            image='recipes/images/test.png')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def add_ingredients(self, count):
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(recipe=self.recipe, ingredient=ingredient,
+                             amount=1)
+            for ingredient in self.ingredients[
+                self.recipe.ingredients.count():count]
+        )
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(context.captured_queries)
+
+    def test_recipe_change_page_queries_are_constant(self):
+        url = f'/admin/recipes/recipe/{self.recipe.pk}/change/'
+        self.add_ingredients(2)
+        # Первый запрос заполняет кэш типов содержимого.
+        self.get(url)
+        _, few = self.get(url)
+        self.add_ingredients(20)
+        response, many = self.get(url)
+        self.assertEqual(few, many)
+        content = response.content.decode()
+        self.assertIn(str(self.ingredients[19]), content)
+        # Невыбранные ингредиенты не попадают в страницу.
+        self.assertNotIn(str(self.ingredients[20]), content)
+
+    def test_ingredient_autocomplete_searches_by_prefix(self):
+        response = self.client.get('/admin/autocomplete/', {
+            'term': 'INGREDIENT04', 'app_label': 'recipes',
+            'model_name': 'ingredientrecipe', 'field_name': 'ingredient'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 10)
+        response = self.client.get('/admin/autocomplete/', {
+            'term': 'gredient04', 'app_label': 'recipes',
+            'model_name': 'ingredientrecipe', 'field_name': 'ingredient'})
+        self.assertEqual(response.json()['results'], [])
+
+    def test_ingredient_changelist_searches_by_substring(self):
+        response = self.client.get('/admin/recipes/ingredient/',
+                                   {'q': 'gredient04'})
+        self.assertEqual(response.context['cl'].result_count, 10)
+
+    def add_rows(self, count):
+        for index in range(count):
+            author = User.objects.create_user(
+                username=f'author{User.objects.count()}', password='author',
+                email=f'author{User.objects.count()}@example.com')
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {index}', text='Текст',
+                cooking_time=5, image='recipes/images/test.png')
+            Favorite.objects.create(user=self.admin, recipe=recipe)
+            ShoppingCart.objects.create(user=author, recipe=recipe)
+            Subscription.objects.create(follower=self.admin, following=author)
+            ShortenedURL.objects.create(recipe=recipe,
+                                        original_url=f'http://t/{recipe.pk}')
+
+    def test_changelist_queries_are_constant(self):
+        self.add_rows(2)
+        for url in CHANGELISTS:
+            self.get(url)
+        few = {url: self.get(url)[1] for url in CHANGELISTS}
+        self.add_rows(8)
+        many = {url: self.get(url)[1] for url in CHANGELISTS}
+        self.assertEqual(few, many)
+
+    def test_changelist_sorts_by_annotated_count(self):
+        self.add_rows(2)
+        Favorite.objects.create(user=self.admin, recipe=self.recipe)
+        Favorite.objects.create(
+            user=User.objects.get(username='author1'), recipe=self.recipe)
+        response, _ = self.get('/admin/recipes/recipe/?o=-5')
+        results = response.context['cl'].result_list
+        self.assertEqual(results[0], self.recipe)
+        self.assertEqual(results[0].favorites_total, 2)
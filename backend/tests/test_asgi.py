@@ -0,0 +1,226 @@
+'''Режим ASGI: асинхронные вью и потоковые ответы.'''
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import request_started
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import resolve
+from rest_framework.authtoken.models import Token
+
+from foodgram_backend import async_support
+from foodgram_backend.async_support import (ASGIHandler, RequestThreads,
+                                            run_sync)
+from foodgram_backend.middleware import QueryStats, track_queries
+from recipes.models import (Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, ShortenedURL, Tag)
+from tests import TEST_CACHES
+
+
+User = get_user_model()
+
+
+async def asgi_request(path, query='', headers=(), on_body=None):
+    '''
+    Статус, заголовки и части тела ответа приложения ASGI.
+    on_body ожидается перед приёмом каждой части тела, как медленный
+    клиент.
+    '''
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'root_path': '',
+        'query_string': query.encode(),
+        'headers': [(b'host', b'testserver'), *headers],
+        'client': ('127.0.0.1', 50000),
+        'server': ('testserver', 80),
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if on_body is not None and message['type'] == 'http.response.body':
+            await on_body(message)
+        messages.append(message)
+
+    await ASGIHandler()(scope, receive, send)
+    start, *body = messages
+    return (start['status'], dict(start['headers']),
+            [message['body'] for message in body if message.get('body')])
+
+
+asgi_get = async_to_sync(asgi_request)
+
+
+# Данные в пуле потоков читаются через другие соединения,
+# поэтому нужны зафиксированные транзакции.
+@override_settings(CACHES=TEST_CACHES)
+class ASGIViewsTest(TransactionTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='reader', email='reader@example.com', password='x')
+        self.token = Token.objects.create(user=self.user)
+        self.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        self.ingredients = [
+            Ingredient.objects.create(name=f'ингредиент {index}',
+                                      measurement_unit='г')
+            for index in range(3)]
+        self.recipe = Recipe.objects.create(
+            author=self.user, name='Рецепт', text='Текст', cooking_time=5,
+            image='recipes/recipe.png')
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(recipe=self.recipe, ingredient=ingredient,
+                             amount=2)
+            for ingredient in self.ingredients)
+        ShoppingCart.objects.create(user=self.user, recipe=self.recipe)
+        self.auth = ((b'authorization', f'Token {self.token.key}'.encode()),)
+
+    def test_only_marked_views_are_async(self):
+        for path in ('/api/tags/', '/api/ingredients/1/',
+                     '/api/recipes/download_shopping_cart/', '/s/abc/'):
+            with self.subTest(path=path):
+                func = resolve(path).func
+                self.assertFalse(asyncio.iscoroutinefunction(func))
+                self.assertTrue(
+                    asyncio.iscoroutinefunction(func.async_view))
+        self.assertFalse(hasattr(resolve('/api/recipes/').func,
+                                 'async_view'))
+
+    def test_catalogs_run_in_pool(self):
+        with mock.patch.object(async_support.executor, 'submit',
+                               wraps=async_support.executor.submit) as submit:
+            status, _, body = asgi_get('/api/ingredients/', 'name=ингр')
+            self.assertEqual(status, 200)
+            self.assertTrue(submit.called)
+            submit.reset_mock()
+            asgi_get('/api/users/')
+            self.assertFalse(submit.called)
+        self.assertEqual(
+            json.loads(b''.join(body)),
+            Client().get('/api/ingredients/', {'name': 'ингр'}).json())
+        status, _, body = asgi_get(f'/api/tags/{self.tag.pk}/')
+        self.assertEqual(json.loads(b''.join(body))['slug'], 'breakfast')
+
+    def test_short_url_redirect(self):
+        short_url = ShortenedURL.objects.create(
+            recipe=self.recipe, original_url='http://testserver/recipes/1')
+        status, headers, _ = asgi_get(f'/s/{short_url.short_url}/')
+        self.assertEqual(status, 302)
+        self.assertEqual(headers[b'Location'], b'http://testserver/recipes/1')
+        self.assertEqual(asgi_get('/s/missing/')[0], 404)
+
+    def test_shopping_list_is_streamed(self):
+        self.assertEqual(
+            asgi_get('/api/recipes/download_shopping_cart/')[0], 401)
+        with mock.patch('api.shopping_list.EXPORT_CHUNK_SIZE', 1):
+            status, headers, body = asgi_get(
+                '/api/recipes/download_shopping_cart/', headers=self.auth)
+        self.assertEqual(status, 200)
+        self.assertIn(b'attachment', headers[b'Content-Disposition'])
+        self.assertEqual(
+            body, [f'ингредиент {index} (г) — 2\n'.encode()
+                   for index in range(3)])
+
+    def test_streaming_response_with_queries(self):
+        with mock.patch('api.views.EXPORT_CHUNK_SIZE', 1):
+            status, _, body = asgi_get('/api/recipes/export/',
+                                       headers=self.auth)
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(b''.join(body))['name'], 'Рецепт')
+
+    def test_pool_queries_are_tracked(self):
+        with track_queries(QueryStats()) as stats:
+            count = async_to_sync(run_sync(Tag.objects.count))()
+        self.assertEqual(count, 1)
+        self.assertEqual(stats.count, 1)
+
+    def test_sync_views_reuse_request_threads(self):
+        threads = []
+
+        def record(**kwargs):
+            threads.append(threading.current_thread())
+
+        request_started.connect(record)
+        self.addCleanup(request_started.disconnect, record)
+
+        async def serve():
+            first = await asgi_request('/api/users/')
+            return [first, *await asyncio.gather(
+                *(asgi_request('/api/users/') for _ in range(3)))]
+
+        pool = RequestThreads(2)
+        responses = self.serve(serve(), pool)
+        self.assertEqual([status for status, _, _ in responses], [200] * 4)
+        self.assertEqual(len(threads), 4)
+        self.assertEqual(len(set(threads)), 2)
+        for thread in threads:
+            self.assertTrue(thread.name.startswith('asgi-request'))
+            self.assertTrue(thread.is_alive())
+        self.assertEqual((len(pool.idle), len(pool.waiters)), (2, 0))
+
+    def serve(self, coroutine, pool):
+        '''
+        Результат сопрограммы в собственном цикле событий, как у uvicorn:
+        без async_to_sync синхронный код не возвращается в вызывающий
+        поток.
+        '''
+        with mock.patch.object(async_support, 'request_threads', pool), \
+                ThreadPoolExecutor(max_workers=1) as loop_thread:
+            result = loop_thread.submit(asyncio.run, coroutine).result()
+        for executor in pool.idle:
+            self.addCleanup(executor.shutdown)
+        return result
+
+    def test_async_views_take_no_request_thread(self):
+        async def serve():
+            return await asyncio.gather(
+                *(asgi_request('/api/tags/') for _ in range(3)))
+
+        pool = RequestThreads(1)
+        responses = self.serve(serve(), pool)
+        self.assertEqual([status for status, _, _ in responses], [200] * 3)
+        self.assertEqual(pool.created, 0)
+
+    def test_slow_stream_releases_request_thread(self):
+        async def serve():
+            started, drained = asyncio.Event(), asyncio.Event()
+
+            async def slow_client(message):
+                started.set()
+                await drained.wait()
+
+            export = asyncio.ensure_future(asgi_request(
+                '/api/recipes/export/', headers=self.auth,
+                on_body=slow_client))
+            await started.wait()
+            # Единственный поток запроса свободен, пока клиент читает.
+            users = await asyncio.wait_for(asgi_request('/api/users/'), 10)
+            drained.set()
+            return users, await export
+
+        pool = RequestThreads(1)
+        with mock.patch('api.views.EXPORT_CHUNK_SIZE', 1):
+            users, export = self.serve(serve(), pool)
+        self.assertEqual((users[0], export[0]), (200, 200))
+        self.assertEqual(json.loads(b''.join(export[2]))['name'], 'Рецепт')
+        self.assertEqual((pool.created, len(pool.idle)), (1, 1))
+
+    def test_missing_asgiref_internals(self):
+        internals = (*async_support.ASGIREF_INTERNALS, 'missing_attribute')
+        with mock.patch.object(async_support, 'ASGIREF_INTERNALS',
+                               internals):
+            with self.assertRaisesMessage(ImproperlyConfigured,
+                                          'missing_attribute'):
+                ASGIHandler()
@@ -0,0 +1,60 @@
+'''Получение рецептов по списку id: /api/recipes/batch/.'''
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+from tests import TEST_CACHES
+
+
+User = get_user_model()
+
+URL = '/api/recipes/batch/'
+
+
+@override_settings(CACHES=TEST_CACHES)
+class BatchTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com', password='x')
+        cls.recipes = [
+            Recipe.objects.create(author=author, name=f'Рецепт {index}',
+                                  text='Текст', cooking_time=5)
+            for index in range(5)]
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def get(self, ids, **params):
+        return self.client.get(URL, {'ids': ids, **params})
+
+    def test_requested_order(self):
+        first, second, third = (recipe.pk for recipe in self.recipes[:3])
+        response = self.get(f'{third}, {first},1000,{third},{second}',
+                            fields='id')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data,
+                         [{'id': third}, {'id': first}, {'id': second}])
+
+    @mock.patch('api.views.MAX_BATCH_SIZE', 3)
+    def test_size_limit(self):
+        ids = [recipe.pk for recipe in self.recipes]
+        response = self.get(','.join(map(str, ids)))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('3', response.data['ids'])
+        # Повторы не учитываются в размере запроса.
+        ids = ids[:3] * 2
+        response = self.get(','.join(map(str, ids)), fields='id')
+        self.assertEqual([item['id'] for item in response.data], ids[:3])
+
+    def test_invalid_ids(self):
+        for ids in ('', ',', 'abc', '1,-2', '1;2'):
+            with self.subTest(ids=ids):
+                response = self.get(ids)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('ids', response.data)
+        self.assertEqual(self.client.get(URL).status_code, 400)
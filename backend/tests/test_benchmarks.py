@@ -0,0 +1,115 @@
+'''Синтетический набор данных и команда benchmark.'''
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from benchmarks.runner import format_table, percentile
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, Subscription, Tag)
+from tests import TEST_CACHES
+
+
+User = get_user_model()
+
+DATASET = {'users': 8, 'recipes': 30, 'favorites': 3, 'cart': 2,
+           'subscriptions': 2, 'min_ingredients': 2, 'max_ingredients': 4,
+           'max_tags': 2}
+
+
+def call(name, *args, **options):
+    stdout = StringIO()
+    call_command(name, *args, stdout=stdout, stderr=StringIO(), **options)
+    return stdout.getvalue()
+
+
+class RunnerTest(SimpleTestCase):
+
+    def test_percentile(self):
+        values = [0.5, 0.1, 0.4, 0.2, 0.3]
+        self.assertEqual(percentile(values, 50), 0.3)
+        self.assertEqual(percentile(values, 99), 0.5)
+        self.assertEqual(percentile(values, 1), 0.1)
+        self.assertIsNone(percentile([], 50))
+
+    def test_format_table_compares_p50(self):
+        table = format_table({'tags-list': {'p50_ms': 1.5, 'queries': 1}},
+                             {'tags-list': {'p50_ms': 1.0}})
+        header, row = table.splitlines()
+        self.assertIn('p50 delta', header)
+        self.assertTrue(row.endswith('+50.0%'))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class DatasetBenchmarkTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {index}', measurement_unit='г')
+            for index in range(10))
+        Tag.objects.bulk_create(Tag(name=f'Тег {index}', slug=f'tag{index}')
+                                for index in range(3))
+
+    def recipes(self, after=0):
+        return list(Recipe.objects.filter(pk__gt=after).order_by('pk')
+                    .values_list('name', 'cooking_time', 'author__username'))
+
+    def test_dataset(self):
+        output = call('generate_dataset', seed=7, **DATASET)
+        self.assertIn('Создано пользователей: 8, рецептов: 30.', output)
+        self.assertEqual(User.objects.count(), 8)
+        self.assertEqual(Recipe.objects.count(), 30)
+        for recipe in Recipe.objects.all():
+            self.assertTrue(2 <= recipe.recipe_ingredients.count() <= 4)
+            self.assertTrue(1 <= recipe.tags.count() <= 2)
+        self.assertTrue(Favorite.objects.exists())
+        self.assertTrue(ShoppingCart.objects.exists())
+        self.assertFalse(Subscription.objects.filter(
+            follower=F('following')).exists())
+        self.assertTrue(User.objects.first().check_password(
+            'foodgram-benchmark'))
+
+    def test_dataset_is_reproducible(self):
+        call('generate_dataset', seed=7, **DATASET)
+        first = self.recipes()
+        last_pk = Recipe.objects.order_by('pk').last().pk
+        call('generate_dataset', seed=7, **DATASET)
+        # Те же названия и время у новых пользователей с новыми id.
+        second = self.recipes(after=last_pk)
+        self.assertEqual([item[:2] for item in second],
+                         [item[:2] for item in first])
+
+    def test_dataset_needs_catalog(self):
+        IngredientRecipe.objects.all().delete()
+        Ingredient.objects.all().delete()
+        with self.assertRaisesMessage(CommandError, 'load'):
+            call('generate_dataset', **DATASET)
+
+    def test_benchmark(self):
+        call('generate_dataset', seed=7, **DATASET)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.json')
+            call('benchmark', 'endpoints', repeat=2, warmup=0,
+                 filter='tags-list', output=path)
+            with open(path, encoding='utf-8') as file:
+                saved = json.load(file)
+            output = call('benchmark', 'endpoints', repeat=1, warmup=0,
+                          filter='tags-list', compare=path)
+        self.assertEqual(saved['suite'], 'endpoints')
+        self.assertEqual(list(saved['results']), ['tags-list'])
+        result = saved['results']['tags-list']
+        self.assertEqual((result['repeat'], result['status']), (2, [200]))
+        self.assertGreater(result['queries'], 0)
+        self.assertIn('p50 delta', output)
+        # Прогон не меняет набор данных.
+        self.assertEqual(Recipe.objects.count(), 30)
+
+    def test_benchmark_rejects_zero_repeat(self):
+        with self.assertRaises(CommandError):
+            call('benchmark', 'endpoints', repeat=0)
@@ -0,0 +1,97 @@
+'''Дельта-синхронизация рецептов: /api/recipes/changes/.'''
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from recipes.deletion import delete_recipes
+from recipes.models import DeletedRecipe, Ingredient, IngredientRecipe, Recipe
+from tests import TEST_CACHES
+
+
+User = get_user_model()
+
+URL = '/api/recipes/changes/'
+LIMIT = 10
+
+
+@override_settings(CACHES=TEST_CACHES)
+@mock.patch('api.views.CHANGES_LIMIT', LIMIT)
+class ChangesTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com', password='x')
+        cls.ingredient = Ingredient.objects.create(name='соль',
+                                                   measurement_unit='г')
+        cls.recipes = [
+            Recipe.objects.create(author=cls.author, name=f'Рецепт {index}',
+                                  text='Текст', cooking_time=5)
+            for index in range(25)]
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(recipe=recipe, ingredient=cls.ingredient,
+                             amount=1)
+            for recipe in cls.recipes)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.since = timezone.now().isoformat()
+
+    def sync(self, **params):
+        '''Все страницы от начальных параметров: (страницы, итог).'''
+        pages = []
+        while True:
+            response = self.client.get(URL, params)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.data)
+            if not response.data['has_more']:
+                return pages
+            params = {'cursor': response.data['cursor']}
+
+    def test_bulk_bump_is_paginated(self):
+        # Сигнал проставляет всем рецептам одно и то же время.
+        self.ingredient.name = 'морская соль'
+        self.ingredient.save()
+        self.assertEqual(
+            Recipe.objects.values('updated_at').distinct().count(), 1)
+        pages = self.sync(since=self.since)
+        self.assertEqual([len(page['changed']) for page in pages],
+                         [LIMIT, LIMIT, 5])
+        ids = [item['id'] for page in pages for item in page['changed']]
+        self.assertCountEqual(ids, [recipe.pk for recipe in self.recipes])
+        # Последний курсор не возвращает уже полученные изменения.
+        response = self.client.get(URL, {'cursor': pages[-1]['cursor']})
+        self.assertEqual((response.data['changed'], response.data['deleted'],
+                          response.data['has_more']), ([], [], False))
+        self.assertEqual(response.data['cursor'], pages[-1]['cursor'])
+
+    def test_tombstones_are_paginated_with_changes(self):
+        deleted = self.recipes[:15]
+        delete_recipes(Recipe.objects.filter(
+            pk__in=[recipe.pk for recipe in deleted]))
+        # Отметки одной пачки удаления с общим временем.
+        DeletedRecipe.objects.update(deleted_at=timezone.now())
+        Recipe.objects.filter(pk=self.recipes[-1].pk).update(
+            updated_at=timezone.now() + timedelta(seconds=1))
+        pages = self.sync(since=self.since)
+        self.assertEqual(
+            [len(page['changed']) + len(page['deleted']) for page in pages],
+            [LIMIT, 6])
+        self.assertCountEqual(
+            [pk for page in pages for pk in page['deleted']],
+            [recipe.pk for recipe in deleted])
+        self.assertEqual(pages[-1]['changed'][-1]['id'], self.recipes[-1].pk)
+
+    def test_since_and_cursor_validation(self):
+        for params in ({}, {'since': 'вчера'}, {'cursor': 'abc'},
+                       {'cursor': '1-'}):
+            with self.subTest(params=params):
+                response = self.client.get(URL, params)
+                self.assertEqual(response.status_code, 400)
+        response = self.client.get(URL, {'since': '2000-01-01T00:00:00'})
+        self.assertEqual(len(response.data['changed']), LIMIT)
+        self.assertTrue(response.data['has_more'])
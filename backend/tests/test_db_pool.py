@@ -0,0 +1,88 @@
+'''Пул соединений с базой данных.'''
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from foodgram_backend.db_backends.pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+
+    def __init__(self):
+        self.closed = False
+        self.usable = True
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTest(SimpleTestCase):
+
+    def make_pool(self, **kwargs):
+        options = {'size': 2, 'timeout': 0.05, 'max_idle': 60}
+        options.update(kwargs)
+        return ConnectionPool('default', **options)
+
+    def test_released_connection_is_reused(self):
+        pool = self.make_pool()
+        connection = pool.acquire(FakeConnection)
+        pool.release(connection)
+        self.assertIs(pool.acquire(FakeConnection), connection)
+        stats = pool.stats()
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(stats['reused'], 1)
+        self.assertEqual(stats['in_use'], 1)
+
+    def test_full_pool_times_out(self):
+        pool = self.make_pool(size=1)
+        pool.acquire(FakeConnection)
+        with self.assertRaises(PoolTimeout):
+            pool.acquire(FakeConnection)
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    def test_waiting_thread_gets_released_connection(self):
+        pool = self.make_pool(size=1, timeout=5)
+        connection = pool.acquire(FakeConnection)
+        timer = threading.Timer(0.05, pool.release, (connection,))
+        timer.start()
+        self.assertIs(pool.acquire(FakeConnection), connection)
+        timer.join()
+        self.assertEqual(pool.stats()['waits'], 1)
+
+    def test_idle_connection_expires(self):
+        pool = self.make_pool(max_idle=10)
+        connection = pool.acquire(FakeConnection)
+        pool.release(connection)
+        with mock.patch('foodgram_backend.db_backends.pool.monotonic',
+                        return_value=pool.idle[0][1] + 11):
+            fresh = pool.acquire(FakeConnection)
+        self.assertIsNot(fresh, connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['open'], 1)
+
+    def test_unusable_connection_is_replaced(self):
+        pool = self.make_pool(check=lambda connection: connection.usable)
+        connection = pool.acquire(FakeConnection)
+        pool.release(connection)
+        connection.usable = False
+        self.assertIsNot(pool.acquire(FakeConnection), connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['discarded'], 1)
+
+    def test_failed_reset_discards_connection(self):
+        pool = self.make_pool(reset=lambda connection: False)
+        connection = pool.acquire(FakeConnection)
+        pool.release(connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['open'], 0)
+
+    def test_failed_connect_frees_slot(self):
+        pool = self.make_pool(size=1)
+
+        def broken():
+            raise OSError('connection refused')
+
+        with self.assertRaises(OSError):
+            pool.acquire(broken)
+        self.assertIsInstance(pool.acquire(FakeConnection), FakeConnection)
@@ -0,0 +1,156 @@
+'''Массовое удаление рецептов и пользователей.'''
+import os
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes import deletion
+from recipes.models import (DeletedRecipe, Favorite, Ingredient,
+                            IngredientRecipe, Recipe, ShoppingCart,
+                            ShortenedURL, Subscription, Tag)
+from tests import TEST_CACHES
+
+
+User = get_user_model()
+
+PASSWORD = 'Deletion-password-1'
+
+
+@override_settings(CACHES=TEST_CACHES)
+class DeletionTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tag = Tag.objects.create(name='Тег', slug='tag')
+        cls.ingredient = Ingredient.objects.create(name='соль',
+                                                   measurement_unit='г')
+        cls.author = cls.create_user('author')
+        cls.readers = [cls.create_user(f'reader{index}')
+                       for index in range(5)]
+        cls.recipes = [cls.create_recipe(cls.author, index)
+                       for index in range(3)]
+        cls.other = cls.create_recipe(cls.readers[0], 'other')
+        for reader in cls.readers:
+            Subscription.objects.create(follower=reader, following=cls.author)
+            for recipe in cls.recipes:
+                Favorite.objects.create(user=reader, recipe=recipe)
+                ShoppingCart.objects.create(user=reader, recipe=recipe)
+        Subscription.objects.create(follower=cls.author,
+                                    following=cls.readers[0])
+        Favorite.objects.create(user=cls.author, recipe=cls.other)
+        ShoppingCart.objects.create(user=cls.author, recipe=cls.other)
+
+    @classmethod
+    def create_user(cls, name):
+        return User.objects.create_user(
+            username=name, email=f'{name}@example.com', password=PASSWORD,
+            first_name=name, last_name=name)
+
+    @classmethod
+    def create_recipe(cls, author, index):
+        recipe = Recipe.objects.create(
+            author=author, name=f'Рецепт {index}', text='Текст',
+            cooking_time=5, image=f'recipes/{author.username}{index}.png')
+        recipe.tags.add(cls.tag)
+        IngredientRecipe.objects.create(recipe=recipe,
+                                        ingredient=cls.ingredient, amount=1)
+        ShortenedURL.objects.create(recipe=recipe,
+                                    original_url=f'http://t/{recipe.pk}')
+        return recipe
+
+    def test_delete_recipes(self):
+        pks = [recipe.pk for recipe in self.recipes]
+        with mock.patch.object(deletion, 'schedule_file_cleanup') as cleanup:
+            deleted = deletion.delete_recipes(Recipe.objects.filter(
+                author=self.author))
+        self.assertEqual(deleted, 3)
+        self.assertFalse(Recipe.objects.filter(pk__in=pks).exists())
+        for model in (Favorite, ShoppingCart, IngredientRecipe,
+                      ShortenedURL, Recipe.tags.through):
+            with self.subTest(model=model.__name__):
+                self.assertFalse(
+                    model.objects.filter(recipe__in=pks).exists())
+                self.assertTrue(
+                    model.objects.filter(recipe=self.other).exists())
+        self.assertEqual(
+            set(DeletedRecipe.objects.values_list('recipe_id', flat=True)),
+            set(pks))
+        cleanup.assert_called_once_with(
+            [recipe.image.name for recipe in self.recipes])
+
+    def test_delete_in_batches(self):
+        queryset = Favorite.objects.filter(recipe=self.recipes[0])
+        with self.assertNumQueries(3):
+            deleted = deletion.delete_in_batches(queryset, batch_size=2)
+        self.assertEqual(deleted, 5)
+        self.assertEqual(Favorite.objects.count(), 11)
+
+    def test_delete_users(self):
+        Token.objects.create(user=self.author)
+        with mock.patch.object(deletion, 'schedule_file_cleanup'):
+            deleted = deletion.delete_users(
+                User.objects.filter(pk=self.author.pk))
+        self.assertEqual(deleted, 1)
+        self.assertFalse(User.objects.filter(pk=self.author.pk).exists())
+        self.assertFalse(Recipe.objects.filter(author=self.author).exists())
+        self.assertFalse(Token.objects.exists())
+        self.assertEqual(Subscription.objects.count(), 0)
+        self.assertEqual(Favorite.objects.count(), 0)
+        self.assertTrue(Recipe.objects.filter(pk=self.other.pk).exists())
+        self.assertEqual(User.objects.count(), 5)
+
+    def test_api_deletes_recipe_and_user(self):
+        client = APIClient()
+        client.force_authenticate(self.author)
+        with mock.patch.object(deletion, 'schedule_file_cleanup'):
+            response = client.delete(f'/api/recipes/{self.recipes[0].pk}/')
+            self.assertEqual(response.status_code, 204)
+            response = client.delete(
+                f'/api/users/{self.author.pk}/',
+                {'current_password': PASSWORD}, format='json')
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(User.objects.filter(pk=self.author.pk).exists())
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_admin_confirmation_counts_dependents(self):
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin')
+        self.client.force_login(admin)
+        url = f'/admin/users/foodgramuser/{self.author.pk}/delete/'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        model_count = dict(response.context['model_count'])
+        self.assertEqual(model_count[Recipe._meta.verbose_name_plural], 3)
+        self.assertEqual(model_count[Favorite._meta.verbose_name_plural], 16)
+        self.assertEqual(
+            model_count[Subscription._meta.verbose_name_plural], 6)
+        with mock.patch.object(deletion, 'schedule_file_cleanup'):
+            response = self.client.post(url, {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(User.objects.filter(pk=self.author.pk).exists())
+
+    def test_file_cleanup_runs_after_commit(self):
+        with mock.patch.object(deletion, 'file_cleanup_executor') as executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                deletion.delete_recipes(
+                    Recipe.objects.filter(pk=self.recipes[0].pk))
+        executor.submit.assert_called_once_with(
+            deletion.run_file_cleanup, [self.recipes[0].image.name])
+
+    def test_delete_files_keeps_referenced(self):
+        with tempfile.TemporaryDirectory() as media_root:
+            with override_settings(MEDIA_ROOT=media_root):
+                names = [self.recipes[0].image.name, 'recipes/orphan.png']
+                for name in names:
+                    default_storage.save(name, ContentFile(b'image'))
+                deletion.delete_files(names)
+                self.assertTrue(
+                    os.path.exists(os.path.join(media_root, names[0])))
+                self.assertFalse(
+                    os.path.exists(os.path.join(media_root, names[1])))
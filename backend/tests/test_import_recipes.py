@@ -0,0 +1,189 @@
+'''Выгрузка рецептов в NDJSON и импорт командой import_recipes.'''
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.db import DataError
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, IngredientRecipe, Recipe, Tag
+from tests import TEST_CACHES
+from tests.test_query_budgets import IMAGE
+
+
+User = get_user_model()
+
+BROKEN_NAME = 'Рецепт, который отклонит база'
+
+
+def recipe_content(recipe):
+    '''Данные рецепта, которые переносит импорт.'''
+    return (recipe.name, recipe.text, recipe.cooking_time,
+            sorted(recipe.tags.values_list('id', flat=True)),
+            sorted(recipe.recipe_ingredients.values_list('ingredient_id',
+                                                         'amount')))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ImportRecipesTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com', password='x')
+        cls.importer = User.objects.create_user(
+            username='importer', email='importer@example.com', password='x')
+        cls.tags = [Tag.objects.create(name=f'Тег {index}', slug=f'tag{index}')
+                    for index in range(2)]
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'ингредиент {index}',
+                                      measurement_unit='г')
+            for index in range(3)]
+        for index in range(3):
+            recipe = Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {index}',
+                text=f'Описание {index}', cooking_time=index + 1)
+            recipe.tags.set(cls.tags[:index + 1])
+            IngredientRecipe.objects.bulk_create(
+                IngredientRecipe(recipe=recipe, ingredient=ingredient,
+                                 amount=index + 2)
+                for ingredient in cls.ingredients[index:])
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def stored_images(self):
+        _, names = default_storage.listdir('recipes')
+        return sorted(f'recipes/{name}' for name in names)
+
+    def write(self, lines):
+        path = os.path.join(self.directory, 'recipes.ndjson')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.writelines(f'{line}\n' for line in lines)
+        return path
+
+    def import_recipes(self, path, **options):
+        stdout, stderr = StringIO(), StringIO()
+        options.setdefault('ignore_images', True)
+        call_command('import_recipes', path, author=self.importer.email,
+                     stdout=stdout, stderr=stderr, **options)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def export(self):
+        client = APIClient()
+        client.force_authenticate(self.author)
+        response = client.get('/api/recipes/export/')
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode().splitlines()
+
+    def test_export_import_round_trip(self):
+        lines = self.export()
+        self.assertEqual(len(lines), 3)
+        output, errors = self.import_recipes(self.write(lines), batch_size=2)
+        self.assertIn('Импортировано рецептов: 3, строк с ошибками: 0',
+                      output)
+        self.assertEqual(errors, '')
+        self.assertEqual(
+            [recipe_content(recipe) for recipe in
+             Recipe.objects.filter(author=self.importer).order_by('pk')],
+            [recipe_content(recipe) for recipe in
+             Recipe.objects.filter(author=self.author).order_by('pk')])
+
+    def test_rejected_batch_is_saved_line_by_line(self):
+        lines = self.export()
+        broken = json.loads(lines[1])
+        broken['name'] = BROKEN_NAME
+        lines.insert(1, '{"name": "без остальных полей"}')
+        lines.insert(2, json.dumps(broken, ensure_ascii=False))
+        bulk_create = IngredientRecipe.objects.bulk_create
+
+        def reject_broken(objs, *args, **kwargs):
+            objs = list(objs)
+            if any(obj.recipe.name == BROKEN_NAME for obj in objs):
+                raise DataError('значение отклонено базой данных')
+            return bulk_create(objs, *args, **kwargs)
+
+        with mock.patch.object(IngredientRecipe.objects, 'bulk_create',
+                               side_effect=reject_broken):
+            output, errors = self.import_recipes(self.write(lines),
+                                                 batch_size=10)
+        self.assertIn('Импортировано рецептов: 3, строк с ошибками: 2',
+                      output)
+        self.assertIn('Строка 2: не указано описание.', errors)
+        self.assertIn('Строка 3: ошибка записи в базу данных '
+                      '(значение отклонено базой данных).', errors)
+        self.assertFalse(Recipe.objects.filter(name=BROKEN_NAME).exists())
+        self.assertEqual(Recipe.objects.filter(author=self.importer).count(),
+                         3)
+
+    def test_image_links_are_copied(self):
+        name = default_storage.save('recipes/source.png',
+                                    ContentFile(b'image'))
+        Recipe.objects.filter(author=self.author).update(image=name)
+        lines = self.export()
+        lines.append(json.dumps(
+            {**json.loads(lines[0]),
+             'image': 'http://other.example/media/recipes/source.png'}))
+        lines.append(json.dumps(
+            {**json.loads(lines[0]),
+             'image': 'http://testserver/media/recipes/missing.png'}))
+        output, errors = self.import_recipes(self.write(lines),
+                                             ignore_images=False)
+        self.assertIn('Импортировано рецептов: 3, строк с ошибками: 2',
+                      output)
+        self.assertIn('Строка 4: ссылка http://other.example/', errors)
+        self.assertIn('Строка 5: файл по ссылке', errors)
+        images = [recipe.image for recipe in
+                  Recipe.objects.filter(author=self.importer)]
+        self.assertEqual(len({image.name for image in images} | {name}), 4)
+        for image in images:
+            with image.open() as file:
+                self.assertEqual(file.read(), b'image')
+
+    def test_images_of_rejected_rows_are_deleted(self):
+        lines = [json.dumps({**json.loads(line), 'image': IMAGE},
+                            ensure_ascii=False)
+                 for line in self.export()]
+        broken = json.loads(lines[1])
+        broken['name'] = BROKEN_NAME
+        lines.append(json.dumps(broken, ensure_ascii=False))
+        lines.append(json.dumps({**json.loads(lines[0]),
+                                 'image': 'data:image/png;base64,xyz'}))
+        bulk_create = IngredientRecipe.objects.bulk_create
+
+        def reject_broken(objs, *args, **kwargs):
+            objs = list(objs)
+            if any(obj.recipe.name == BROKEN_NAME for obj in objs):
+                raise DataError('значение отклонено базой данных')
+            return bulk_create(objs, *args, **kwargs)
+
+        with mock.patch.object(IngredientRecipe.objects, 'bulk_create',
+                               side_effect=reject_broken):
+            output, errors = self.import_recipes(
+                self.write(lines), batch_size=10, ignore_images=False)
+        self.assertIn('Импортировано рецептов: 3, строк с ошибками: 2',
+                      output)
+        self.assertIn('Строка 5: некорректное изображение', errors)
+        self.assertEqual(
+            self.stored_images(),
+            sorted(Recipe.objects.filter(author=self.importer).values_list(
+                'image', flat=True)))
+
+    def test_missing_file(self):
+        path = os.path.join(self.directory, 'missing.ndjson')
+        with self.assertRaisesMessage(CommandError, path):
+            self.import_recipes(path)
@@ -0,0 +1,182 @@
+'''Очередь фоновых задач и команда run_worker.'''
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from foodgram_backend import metrics
+from jobs import queue
+from jobs.models import Job
+from jobs.queue import (claim_jobs, enqueue, purge_finished_jobs,
+                        requeue_stale_jobs, run_job)
+
+
+calls = []
+
+
+def add(a, b):
+    calls.append((a, b))
+    return a + b
+
+
+def broken():
+    raise ValueError('сломалось')
+
+
+TASKS = {
+    'tests.add': queue.Task('tests.add', add, 3),
+    'tests.broken': queue.Task('tests.broken', broken, 2),
+}
+
+
+@mock.patch.dict(queue.tasks, TASKS)
+class JobQueueTest(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_deduplicates_active_jobs(self):
+        job = enqueue('tests.add', {'a': 1, 'b': 2}, dedupe_key='sum')
+        self.assertEqual(job.max_attempts, 3)
+        self.assertEqual(
+            enqueue('tests.add', {'a': 5, 'b': 5}, dedupe_key='sum'), job)
+        enqueue('tests.add', {'a': 5, 'b': 5})
+        self.assertEqual(Job.objects.count(), 2)
+        [claimed] = claim_jobs('worker', limit=1)
+        self.assertEqual(claimed, job)
+        self.assertEqual(enqueue('tests.add', dedupe_key='sum'), job)
+        run_job(claimed, 'worker')
+        self.assertNotEqual(enqueue('tests.add', dedupe_key='sum'), job)
+        with self.assertRaises(LookupError):
+            enqueue('tests.missing')
+
+    def test_claim_and_run(self):
+        later = enqueue('tests.add', {'a': 2, 'b': 3}, delay=60)
+        job = enqueue('tests.add', {'a': 1, 'b': 2})
+        [claimed] = claim_jobs('worker', limit=5)
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertEqual(claimed.status, Job.Status.RUNNING)
+        self.assertEqual(claimed.attempts, 1)
+        self.assertEqual(claim_jobs('other'), [])
+        self.assertEqual(run_job(claimed, 'worker'), 'done')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result, job.locked_by),
+                         (Job.Status.DONE, 3, ''))
+        self.assertIsNotNone(job.finished_at)
+        later.refresh_from_db()
+        self.assertEqual(later.status, Job.Status.QUEUED)
+
+    def test_skip_locked_path(self):
+        '''Ветка PostgreSQL; в SQLite FOR UPDATE просто не выводится.'''
+        jobs = [enqueue('tests.add', {'a': index, 'b': 0})
+                for index in range(3)]
+        with mock.patch.object(connection.features,
+                               'has_select_for_update_skip_locked', True):
+            claimed = claim_jobs('worker', limit=2)
+        self.assertEqual([job.pk for job in claimed],
+                         [job.pk for job in jobs[:2]])
+        self.assertTrue(all(job.locked_by == 'worker' for job in claimed))
+
+    def test_claim_lost_to_another_worker(self):
+        job = enqueue('tests.add', {'a': 1, 'b': 1})
+        values_list = QuerySet.values_list
+
+        def claimed_meanwhile(queryset, *args, **kwargs):
+            # Другой воркер забирает задачу между выборкой и UPDATE.
+            pks = list(values_list(queryset, *args, **kwargs))
+            Job.objects.filter(pk__in=pks).update(
+                status=Job.Status.RUNNING, locked_by='other')
+            return pks
+
+        with mock.patch.object(QuerySet, 'values_list', claimed_meanwhile):
+            self.assertEqual(claim_jobs('worker'), [])
+        job.refresh_from_db()
+        self.assertEqual((job.locked_by, job.attempts), ('other', 0))
+
+    def test_retry_then_fail(self):
+        job = enqueue('tests.broken')
+        [claimed] = claim_jobs('worker')
+        with self.assertLogs('foodgram.jobs', 'ERROR'):
+            self.assertEqual(run_job(claimed, 'worker'), 'retried')
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.QUEUED)
+        self.assertIn('сломалось', job.last_error)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertEqual(claim_jobs('worker'), [])
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        [claimed] = claim_jobs('worker')
+        with self.assertLogs('foodgram.jobs', 'ERROR'):
+            self.assertEqual(run_job(claimed, 'worker'), 'failed')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.FAILED, 2))
+
+    def test_unknown_task_is_retried(self):
+        Job.objects.create(task='tests.removed')
+        [claimed] = claim_jobs('worker')
+        with self.assertLogs('foodgram.jobs', 'ERROR'):
+            self.assertEqual(run_job(claimed, 'worker'), 'retried')
+        self.assertIn('tests.removed', Job.objects.get().last_error)
+
+    def test_stale_jobs(self):
+        retry = enqueue('tests.add', {'a': 1, 'b': 1})
+        exhausted = enqueue('tests.broken')
+        fresh = enqueue('tests.add', {'a': 2, 'b': 2})
+        Job.objects.filter(pk=exhausted.pk).update(attempts=1)
+        claimed = claim_jobs('dead', limit=3)
+        Job.objects.exclude(pk=fresh.pk).update(
+            locked_at=timezone.now() - timedelta(hours=1))
+        with self.assertLogs('foodgram.jobs', 'WARNING'):
+            self.assertEqual(requeue_stale_jobs(timeout=60), 1)
+        statuses = dict(Job.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses, {retry.pk: Job.Status.QUEUED,
+                                    exhausted.pk: Job.Status.FAILED,
+                                    fresh.pk: Job.Status.RUNNING})
+        # Воркер, потерявший задачу, не перезаписывает её состояние.
+        with self.assertLogs('foodgram.jobs', 'WARNING'):
+            self.assertEqual(run_job(claimed[0], 'dead'), 'lost')
+        self.assertEqual(Job.objects.get(pk=retry.pk).status,
+                         Job.Status.QUEUED)
+
+    def test_purge_finished_jobs(self):
+        old = timezone.now() - timedelta(days=30)
+        for status in Job.Status.values:
+            Job.objects.create(task='tests.add', status=status,
+                               finished_at=old)
+        Job.objects.create(task='tests.add', status=Job.Status.DONE,
+                           finished_at=timezone.now())
+        self.assertEqual(purge_finished_jobs(batch_size=1), 2)
+        self.assertEqual(Job.objects.count(), 3)
+
+    @override_settings(METRICS_ENABLED=True, METRICS_DIR='')
+    def test_run_worker(self):
+        for index in range(3):
+            enqueue('tests.add', {'a': index, 'b': 1})
+        enqueue('tests.broken')
+        enqueue('tests.add', {'a': 9, 'b': 9}, delay=60)
+        stdout = StringIO()
+        registry = metrics.MetricsRegistry()
+        with mock.patch.object(metrics, 'registry', registry):
+            with self.assertLogs('foodgram.jobs', 'ERROR'):
+                call_command('run_worker', burst=True, batch_size=2,
+                             stdout=stdout)
+        self.assertIn('выполнено задач: 4', stdout.getvalue())
+        self.assertEqual(sorted(calls), [(0, 1), (1, 1), (2, 1)])
+        self.assertEqual(
+            Job.objects.filter(status=Job.Status.QUEUED).count(), 2)
+        events = registry.snapshot()['foodgram_jobs_total']
+        self.assertEqual(
+            events[registry.key({'task': 'tests.add', 'event': 'done'})], 3)
+        self.assertEqual(
+            events[registry.key({'task': 'tests.broken',
+                                 'event': 'retried'})], 1)
+
+    def test_run_worker_max_jobs(self):
+        for index in range(3):
+            enqueue('tests.add', {'a': index, 'b': 0})
+        call_command('run_worker', max_jobs=2, stdout=StringIO())
+        self.assertEqual(len(calls), 2)
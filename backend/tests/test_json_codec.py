@@ -0,0 +1,82 @@
+'''JSON-рендерер и парсер на orjson совместимы со стандартными.'''
+import io
+import json
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnDict
+
+from api import parsers, renderers
+from api.parsers import FastJSONParser
+from api.renderers import FastJSONRenderer
+
+
+DATA = ReturnDict({
+    'id': 1,
+    'name': 'Борщ\u2028с\u2029переносами',
+    'amount': Decimal('1.5'),
+    'created': datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+    'label': gettext_lazy('Рецепт'),
+    'tags': ({'id': 1, 'slug': 'soup'},),
+    'counts': {1: 2},
+    'empty': None,
+    'ids': {3},
+}, serializer=None)
+
+
+class FastJSONRendererTest(SimpleTestCase):
+
+    def test_output_matches_drf_renderer(self):
+        rendered = FastJSONRenderer().render(DATA)
+        self.assertEqual(json.loads(rendered),
+                         json.loads(JSONRenderer().render(DATA)))
+        self.assertIn(b'\\u2028', rendered)
+        self.assertIn(b'"2024-01-02T03:04:05Z"', rendered)
+
+    def test_unsupported_values_use_drf_renderer(self):
+        self.assertEqual(FastJSONRenderer().render({'big': 2 ** 70}),
+                         b'{"big":1180591620717411303424}')
+
+    def test_indent_uses_drf_renderer(self):
+        rendered = FastJSONRenderer().render(
+            {'id': 1}, 'application/json; indent=4')
+        self.assertEqual(rendered, b'{\n    "id": 1\n}')
+
+    def test_without_orjson(self):
+        with mock.patch.object(renderers, 'orjson', None):
+            rendered = FastJSONRenderer().render(DATA)
+        self.assertEqual(rendered, JSONRenderer().render(DATA))
+
+    def test_none(self):
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+
+class FastJSONParserTest(SimpleTestCase):
+    body = json.dumps({'name': 'Рецепт', 'ingredients': [{'id': 1}]},
+                      ensure_ascii=False).encode()
+
+    def parse(self, body, **context):
+        return FastJSONParser().parse(io.BytesIO(body),
+                                      parser_context=context)
+
+    def test_output_matches_drf_parser(self):
+        self.assertEqual(self.parse(self.body),
+                         JSONParser().parse(io.BytesIO(self.body)))
+
+    def test_invalid_json(self):
+        for body in (b'{"name": ', b'{"value": NaN}'):
+            with self.subTest(body=body), self.assertRaises(ParseError):
+                self.parse(body)
+
+    def test_other_encoding_and_missing_orjson(self):
+        body = self.body.decode().encode('utf-16')
+        self.assertEqual(self.parse(body, encoding='utf-16')['name'],
+                         'Рецепт')
+        with mock.patch.object(parsers, 'orjson', None):
+            self.assertEqual(self.parse(self.body)['name'], 'Рецепт')
@@ -0,0 +1,107 @@
+'''Потоковая загрузка справочников командой load_catalog.'''
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from recipes.models import Ingredient, Tag
+
+
+DATA_DIR = os.path.join(settings.BASE_DIR.parent, 'data')
+
+
+class LoadCatalogTest(TestCase):
+
+    def load(self, *args, **options):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('load_catalog', *args, stdout=stdout, stderr=stderr,
+                     **options)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def write(self, directory, name, content):
+        path = os.path.join(directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def test_csv_load_is_idempotent(self):
+        path = os.path.join(DATA_DIR, 'ingredients.csv')
+        output, _ = self.load('ingredients', path, batch_size=500)
+        count = Ingredient.objects.count()
+        self.assertEqual(count, 2186)
+        self.assertIn(f'добавлено: {count}', output)
+        output, _ = self.load('ingredients', path)
+        self.assertEqual(Ingredient.objects.count(), count)
+        self.assertIn('добавлено: 0', output)
+
+    def test_json_array_is_read_in_chunks(self):
+        path = os.path.join(DATA_DIR, 'ingredients.json')
+        with open(path, encoding='utf-8') as file:
+            expected = {(item['name'], item['measurement_unit'])
+                        for item in json.load(file)}
+        with mock.patch('recipes.management.commands.load_catalog.'
+                        'CATALOG_READ_CHUNK_SIZE', 7):
+            self.load('ingredients', path, verbosity=0)
+        self.assertEqual(
+            set(Ingredient.objects.values_list('name', 'measurement_unit')),
+            expected)
+
+    def test_json_separators_are_strict(self):
+        item = '{"name": "соль", "measurement_unit": "г"}'
+        cases = (
+            (f'[,{item}]', 'символ 2'),
+            (f'[{item},,{item}]', f'символ {len(item) + 3}'),
+            (f'[{item} {item}]', f'символ {len(item) + 3}'),
+            (f'[{item},]', f'символ {len(item) + 3}'),
+            (f'[{item}', f'символ {len(item) + 2}'),
+            (f'[{item}] ]', f'символ {len(item) + 4}'),
+            (f'{{"items": [{item}]}}', 'символ 1'),
+        )
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch('recipes.management.commands.load_catalog.'
+                           'CATALOG_READ_CHUNK_SIZE', 7):
+            for content, position in cases:
+                with self.subTest(content=content):
+                    path = self.write(directory, 'ingredients.json', content)
+                    with self.assertRaisesMessage(CommandError, position):
+                        self.load('ingredients', path, verbosity=0)
+            path = self.write(directory, 'ingredients.json',
+                              f' [\n {item} ,\n\t{item}\n] \n')
+            output, _ = self.load('ingredients', path, verbosity=0)
+            self.assertIn('Обработано строк: 2', output)
+            path = self.write(directory, 'ingredients.json', '[ ]')
+            self.assertIn('Обработано строк: 0', self.load(
+                'ingredients', path, verbosity=0)[0])
+
+    def test_missing_file(self):
+        with self.assertRaisesMessage(CommandError, 'missing.json'):
+            self.load('ingredients', os.path.join(DATA_DIR, 'missing.json'))
+
+    def test_tags_are_updated_by_slug(self):
+        Tag.objects.create(name='старое название', slug='breakfast')
+        output, _ = self.load('tags', os.path.join(DATA_DIR, 'tags.json'))
+        self.assertEqual(Tag.objects.get(slug='breakfast').name, 'завтрак')
+        self.assertIn('обновлено: 1', output)
+        self.assertEqual(Tag.objects.count(), 12)
+
+    def test_invalid_rows_are_skipped(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = self.write(directory, 'ingredients.ndjson', '\n'.join((
+                '{"name": "соль", "measurement_unit": "г"}',
+                '{"name": "соль"}',
+                'не json',
+                '{"name": "%s", "measurement_unit": "г"}' % ('x' * 200),
+                '{"name": " перец ", "measurement_unit": "г"}',
+            )))
+            output, errors = self.load('ingredients', path)
+        self.assertEqual(
+            sorted(Ingredient.objects.values_list('name', flat=True)),
+            ['перец', 'соль'])
+        self.assertIn('строк с ошибками: 3', output)
+        self.assertIn('Строка 2', errors)
+        self.assertIn('Строка 3', errors)
@@ -0,0 +1,84 @@
+'''Сбор метрик из файлов процессов в METRICS_DIR.'''
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from foodgram_backend import metrics
+
+
+def dead_pid():
+    '''PID только что завершившегося процесса.'''
+    process = subprocess.Popen([sys.executable, '-c', ''])
+    process.wait()
+    return process.pid
+
+
+class MetricsFilesTest(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        settings_override = override_settings(
+            METRICS_ENABLED=True, METRICS_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.key = metrics.registry.key({'cache': 'shared'})
+        self.pool_key = metrics.registry.key({'state': 'idle'})
+
+    def write(self, path, hits, connections=None):
+        snapshot = {'foodgram_cache_hits_total': {self.key: hits},
+                    'foodgram_request_duration_seconds': {
+                        self.key: [1] + [0] * 11 + [0.004, 1]}}
+        if connections is not None:
+            snapshot['foodgram_db_pool_connections'] = {
+                self.pool_key: connections}
+        path.write_text(json.dumps(snapshot), encoding='utf-8')
+
+    def collect(self, registry=None):
+        '''Сбор от имени процесса с реестром registry (по умолчанию пустым).'''
+        with mock.patch.object(metrics, 'registry',
+                               registry or metrics.MetricsRegistry()):
+            return metrics.collect()
+
+    def test_stale_file_keeps_counters_and_drops_gauges(self):
+        stale = metrics.process_file(self.directory, dead_pid())
+        self.write(stale, hits=3, connections=4)
+        foreign = self.directory / 'metrics_other-host_1.json'
+        self.write(foreign, hits=2, connections=1)
+        total = self.collect()
+        self.assertEqual(total['foodgram_cache_hits_total'][self.key], 5)
+        self.assertEqual(
+            total['foodgram_request_duration_seconds'][self.key][-1], 2)
+        self.assertEqual(
+            total['foodgram_db_pool_connections'][self.pool_key], 1)
+        self.assertFalse(stale.exists())
+        self.assertTrue((self.directory / metrics.RETIRED_FILE).exists())
+        # Повторный сбор не считает перенесённые значения дважды.
+        self.assertEqual(
+            self.collect()['foodgram_cache_hits_total'][self.key], 5)
+
+    def test_child_exit_retires_worker_file(self):
+        pid = dead_pid()
+        self.write(metrics.process_file(self.directory, pid), hits=7,
+                   connections=2)
+        metrics.retire_process(self.directory, pid)
+        metrics.retire_process(self.directory, pid)
+        self.assertEqual(list(self.directory.glob('metrics_*.json')), [])
+        total = self.collect()
+        self.assertEqual(total['foodgram_cache_hits_total'][self.key], 7)
+        self.assertNotIn('foodgram_db_pool_connections', total)
+
+    def test_reused_pid_does_not_reset_counters(self):
+        registry = metrics.MetricsRegistry()
+        self.write(registry.file_path(), hits=5, connections=3)
+        registry.inc('foodgram_cache_hits_total', {'cache': 'shared'})
+        registry.flush()
+        total = self.collect(registry)
+        self.assertEqual(total['foodgram_cache_hits_total'][self.key], 6)
+        self.assertNotIn('foodgram_db_pool_connections', total)
@@ -0,0 +1,49 @@
+'''Хеширование паролей при регистрации и перехеширование при входе.'''
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import MD5PasswordHasher, make_password
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from tests import TEST_CACHES
+
+
+User = get_user_model()
+
+PASSWORD = 'Hasher-password-1'
+FAST_HASHER = 'django.contrib.auth.hashers.MD5PasswordHasher'
+LEGACY_HASHER = 'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher'
+
+
+@override_settings(CACHES=TEST_CACHES,
+                   PASSWORD_HASHERS=[FAST_HASHER, LEGACY_HASHER])
+class PasswordHashingTest(TestCase):
+
+    def test_registration_hashes_password_once(self):
+        with mock.patch.object(MD5PasswordHasher, 'encode',
+                               autospec=True,
+                               side_effect=MD5PasswordHasher.encode) as encode:
+            response = APIClient().post('/api/users/', {
+                'email': 'hash@example.com',
+                'username': 'hash',
+                'first_name': 'Хеш',
+                'last_name': 'Хешев',
+                'password': PASSWORD,
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(encode.call_count, 1)
+        user = User.objects.get(email='hash@example.com')
+        self.assertTrue(user.check_password(PASSWORD))
+
+    def test_login_rehashes_with_preferred_hasher(self):
+        user = User.objects.create(
+            username='legacy', email='legacy@example.com',
+            first_name='Старый', last_name='Хеш',
+            password=make_password(PASSWORD, hasher='pbkdf2_sha1'))
+        response = APIClient().post('/api/auth/token/login/', {
+            'email': user.email, 'password': PASSWORD}, format='json')
+        self.assertEqual(response.status_code, 200)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('md5$'))
+        self.assertTrue(user.check_password(PASSWORD))
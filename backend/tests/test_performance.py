@@ -0,0 +1,68 @@
+'''Заголовок Server-Timing и журнал PerformanceMiddleware.'''
+import json
+import re
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from foodgram_backend.middleware import QueryStats, track_queries
+from recipes.models import Recipe, Tag
+from tests import TEST_CACHES
+
+
+User = get_user_model()
+
+TIMING = re.compile(r'(\w+);dur=(\d+\.\d)(?:;desc="(\d+) queries")?')
+
+
+@override_settings(CACHES=TEST_CACHES, PERFORMANCE_INSTRUMENTATION=True)
+class ServerTimingTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com', password='x')
+        Tag.objects.create(name='Ужин', slug='dinner')
+        for index in range(2):
+            Recipe.objects.create(author=author, name=f'Рецепт {index}',
+                                  text='Текст', cooking_time=5)
+
+    def setUp(self):
+        # Набор middleware читается при первом запросе клиента.
+        self.client = APIClient()
+
+    def timings(self, response):
+        '''{фаза: (длительность в мс, число запросов или None)}.'''
+        return {name: (float(duration), count and int(count))
+                for name, duration, count
+                in TIMING.findall(response['Server-Timing'])}
+
+    def test_server_timing_header(self):
+        with self.assertLogs('foodgram.performance', 'INFO') as logs:
+            response = self.client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        timings = self.timings(response)
+        self.assertEqual(list(timings), ['db', 'app', 'render', 'total'])
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(timings['db'][1], record['queries'])
+        self.assertGreater(record['queries'], 0)
+        self.assertLessEqual(timings['db'][0] + timings['render'][0],
+                             timings['total'][0] + 0.2)
+        self.assertEqual(
+            {key: record[key] for key in ('view', 'method', 'path',
+                                          'status')},
+            {'view': 'api:recipes-list', 'method': 'GET',
+             'path': '/api/recipes/', 'status': 200})
+
+    def test_duplicate_queries_are_counted(self):
+        with track_queries(QueryStats()) as stats:
+            for _ in range(3):
+                list(Tag.objects.all())
+            Recipe.objects.count()
+        self.assertEqual((stats.count, stats.duplicates), (4, 2))
+
+    @override_settings(PERFORMANCE_INSTRUMENTATION=False)
+    def test_header_absent_when_disabled(self):
+        response = APIClient().get('/api/tags/')
+        self.assertNotIn('Server-Timing', response)
@@ -0,0 +1,90 @@
+'''Профилирование запросов по требованию администратора и выборочно.'''
+import re
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from tests import TEST_CACHES
+
+
+User = get_user_model()
+
+COLLAPSED_LINE = re.compile(r'[^;\n]+(;[^;\n]+)* \d+')
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ProfilingTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='x',
+            is_staff=True)
+        cls.user = User.objects.create_user(
+            username='user', email='user@example.com', password='x')
+        cls.tokens = {user: Token.objects.create(user=user).key
+                      for user in (cls.admin, cls.user)}
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        settings_override = override_settings(PROFILING_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def client_for(self, user=None):
+        # Набор middleware читается при первом запросе клиента.
+        client = APIClient()
+        if user is not None:
+            client.credentials(
+                HTTP_AUTHORIZATION=f'Token {self.tokens[user]}')
+        return client
+
+    def profiles(self):
+        return sorted(path.name for path in self.directory.iterdir())
+
+    def test_staff_request_is_profiled(self):
+        response = self.client_for(self.admin).get('/api/tags/?profile')
+        self.assertEqual(response.status_code, 200)
+        name = response['X-Profile-Id']
+        self.assertIn('api-tags-list', name)
+        self.assertTrue(name.endswith(f'_{self.admin.pk}'))
+        self.assertEqual(self.profiles(),
+                         [f'{name}.collapsed', f'{name}.prof'])
+        lines = (self.directory / f'{name}.collapsed').read_text(
+            encoding='utf-8').splitlines()
+        self.assertTrue(lines)
+        for line in lines:
+            self.assertRegex(line, COLLAPSED_LINE)
+
+    def test_profiling_is_staff_only(self):
+        for client in (self.client_for(self.user), self.client_for()):
+            response = client.get('/api/tags/', HTTP_X_PROFILE='1')
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('X-Profile-Id', response)
+        response = self.client_for(self.admin).get('/api/tags/')
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(self.profiles(), [])
+
+    @override_settings(PROFILING_SAMPLING={'api:tags-list': 3})
+    def test_sampling(self):
+        client = self.client_for()
+        for _ in range(7):
+            response = client.get('/api/tags/')
+            self.assertNotIn('X-Profile-Id', response)
+            client.get('/api/ingredients/')
+        profiles = self.profiles()
+        self.assertEqual(len(profiles), 4)
+        self.assertTrue(all('api-tags-list_anon' in name
+                            for name in profiles))
+
+    @override_settings(PROFILING_DIR='')
+    def test_disabled_without_directory(self):
+        response = self.client_for(self.admin).get('/api/tags/?profile')
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(self.profiles(), [])
@@ -0,0 +1,286 @@
+'''
+Бюджеты SQL-запросов для эндпоинтов API.
+
+Каждый эндпоинт проверяется анонимно и с авторизацией по токену
+на двух объёмах данных: число запросов не должно превышать бюджет
+и не должно расти вместе с размером страницы и числом связанных
+объектов (ингредиентов, тегов, избранного, подписок).
+'''
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, ShortenedURL, Subscription, Tag)
+from tests import TEST_CACHES
+
+
+User = get_user_model()
+
+IMAGE = ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAgMAAABiey'
+         'waAAAACVBMVEUAAAD///9fX1/S0ecCAAAACXBIWXMAAA7EAAAOxAGVKw4bAAAACkl'
+         'EQVQImWNoAAAAggCByxOyYQAAAABJRU5ErkJggg==')
+PASSWORD = 'Budget-password-1'
+
+# Бюджеты для GET-запросов: (имя, путь, анонимно, с токеном).
+# None - эндпоинт недоступен анонимно. Авторизация по токену
+# добавляет один запрос, пока токен не попал в кэш.
+READ_BUDGETS = (
+    ('recipes-list', '/api/recipes/', 4, 6),
+    ('recipes-list-limit', '/api/recipes/?limit=2', 4, 6),
+    ('recipes-list-tags', '/api/recipes/?tags=tag0&tags=tag1', 5, 7),
+    ('recipes-list-favorited', '/api/recipes/?is_favorited=1', 4, 6),
+    ('recipes-list-cart', '/api/recipes/?is_in_shopping_cart=1', 4, 6),
+    ('recipes-list-author', '/api/recipes/?author={author}', 5, 7),
+    ('recipes-list-normalized', '/api/recipes/?normalize=1', 5, 7),
+    ('recipes-detail', '/api/recipes/{recipe}/', 3, 5),
+    ('recipes-batch', '/api/recipes/batch/?ids={recipe_ids}', 3, 5),
+    ('recipes-changes', '/api/recipes/changes/?since=2000-01-01T00:00:00',
+     4, 6),
+    ('recipes-get-link', '/api/recipes/{recipe}/get-link/', 4, 5),
+    ('recipes-export', '/api/recipes/export/', None, 5),
+    ('recipes-download-shopping-cart',
+     '/api/recipes/download_shopping_cart/', None, 3),
+    ('ingredients-list', '/api/ingredients/', 1, 2),
+    ('ingredients-search', '/api/ingredients/?name=ingr', 1, 2),
+    ('ingredients-detail', '/api/ingredients/{ingredient}/', 1, 2),
+    ('tags-list', '/api/tags/', 1, 2),
+    ('tags-detail', '/api/tags/{tag}/', 1, 2),
+    ('users-list', '/api/users/', 2, 4),
+    ('users-detail', '/api/users/{author}/', 1, 3),
+    ('users-me', '/api/users/me/', None, 2),
+    ('users-subscriptions', '/api/users/subscriptions/', None, 5),
+    ('users-subscriptions-limit',
+     '/api/users/subscriptions/?recipes_limit=1', None, 5),
+    ('short-link-redirect', '/s/{short_url}/', 1, 1),
+)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class QueryBudgetTestCase(TestCase):
+    '''Базовый класс с набором данных и проверкой бюджета запросов.'''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'ingredient{index}', measurement_unit='г')
+            for index in range(30)
+        )
+        cls.ingredients = list(Ingredient.objects.order_by('id'))
+        cls.tags = [Tag.objects.create(name=f'Тег {index}',
+                                       slug=f'tag{index}')
+                    for index in range(5)]
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Читатель', last_name='Читателев', password=PASSWORD)
+        cls.authors = [
+            User.objects.create_user(
+                username=f'author{index}', email=f'author{index}@example.com',
+                first_name='Автор', last_name=f'Авторов{index}',
+                password=PASSWORD)
+            for index in range(3)
+        ]
+        cls.recipe = cls.add_recipes(cls.authors[0], 1, ingredients=1,
+                                     tags=1)[0]
+        cls.own_recipe = cls.add_recipes(cls.user, 1, ingredients=1,
+                                         tags=1)[0]
+        Favorite.objects.create(user=cls.user, recipe=cls.recipe)
+        ShoppingCart.objects.create(user=cls.user, recipe=cls.recipe)
+        Subscription.objects.create(follower=cls.user,
+                                    following=cls.authors[0])
+        cls.short_url = ShortenedURL.objects.create(
+            recipe=cls.recipe, original_url='http://testserver/recipes/1')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+
+    @classmethod
+    def add_recipes(cls, author, count, ingredients, tags):
+        recipes = [
+            Recipe.objects.create(author=author, name=f'Рецепт {index}',
+                                  text='Описание', cooking_time=10)
+            for index in range(count)
+        ]
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(recipe=recipe, ingredient=ingredient, amount=5)
+            for recipe in recipes
+            for ingredient in cls.ingredients[:ingredients]
+        )
+        for recipe in recipes:
+            recipe.tags.set(cls.tags[:tags])
+        return recipes
+
+    def grow_dataset(self):
+        '''Многократное увеличение числа связанных объектов.'''
+        for author in self.authors:
+            recipes = self.add_recipes(author, 6, ingredients=20, tags=5)
+            Favorite.objects.bulk_create(
+                Favorite(user=self.user, recipe=recipe) for recipe in recipes)
+            ShoppingCart.objects.bulk_create(
+                ShoppingCart(user=self.user, recipe=recipe)
+                for recipe in recipes)
+        Subscription.objects.bulk_create(
+            Subscription(follower=self.user, following=author)
+            for author in self.authors[1:])
+
+    def client_for(self, authenticated):
+        client = APIClient()
+        if authenticated:
+            client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        return client
+
+    def assertQueryBudget(self, budget, method, path, authenticated=True,
+                          data=None):
+        '''Запрос с проверкой бюджета; при превышении выводится SQL.'''
+        client = self.client_for(authenticated)
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(client, method)(path, data, format='json')
+            if response.streaming:
+                b''.join(response.streaming_content)
+        if len(context) > budget:
+            queries = '\n'.join(
+                f'{number}. {query["sql"]}'
+                for number, query in enumerate(context.captured_queries, 1))
+            self.fail(
+                f'{method.upper()} {path} '
+                f'({"токен" if authenticated else "аноним"}): '
+                f'{len(context)} запросов при бюджете {budget}:\n{queries}')
+        self.assertLess(response.status_code, 500)
+        return response
+
+
+class ReadEndpointsQueryBudgetTest(QueryBudgetTestCase):
+    '''Бюджеты GET-запросов на малом и большом наборе данных.'''
+
+    def format_path(self, path):
+        return path.format(
+            author=self.authors[0].pk,
+            recipe=self.recipe.pk,
+            recipe_ids=','.join(
+                map(str, Recipe.objects.values_list('id', flat=True))),
+            ingredient=self.ingredients[0].pk,
+            tag=self.tags[0].pk,
+            short_url=self.short_url.short_url,
+        )
+
+    def check_budgets(self):
+        for name, path, anonymous_budget, token_budget in READ_BUDGETS:
+            path = self.format_path(path)
+            with self.subTest(endpoint=name, auth='токен'):
+                self.assertQueryBudget(token_budget, 'get', path)
+            if anonymous_budget is not None:
+                with self.subTest(endpoint=name, auth='аноним'):
+                    self.assertQueryBudget(anonymous_budget, 'get', path,
+                                           authenticated=False)
+
+    def test_budgets_small_dataset(self):
+        self.check_budgets()
+
+    def test_budgets_do_not_grow_with_related_objects(self):
+        self.grow_dataset()
+        self.check_budgets()
+
+
+class WriteEndpointsQueryBudgetTest(QueryBudgetTestCase):
+    '''Бюджеты изменяющих запросов.'''
+
+    def recipe_data(self, ingredients, tags):
+        return {
+            'ingredients': [{'id': ingredient.pk, 'amount': 3}
+                            for ingredient in self.ingredients[:ingredients]],
+            'tags': [tag.pk for tag in self.tags[:tags]],
+            'name': 'Новый рецепт',
+            'image': IMAGE,
+            'text': 'Описание',
+            'cooking_time': 5,
+        }
+
+    def test_recipe_create(self):
+        for ingredients, tags in ((1, 1), (20, 5)):
+            with self.subTest(ingredients=ingredients, tags=tags):
+                response = self.assertQueryBudget(
+                    14, 'post', '/api/recipes/',
+                    data=self.recipe_data(ingredients, tags))
+                self.assertEqual(response.status_code, 201)
+
+    def test_recipe_update(self):
+        path = f'/api/recipes/{self.own_recipe.pk}/'
+        for ingredients, tags in ((20, 5), (10, 2), (10, 2)):
+            with self.subTest(ingredients=ingredients, tags=tags):
+                response = self.assertQueryBudget(
+                    17, 'patch', path,
+                    data=self.recipe_data(ingredients, tags))
+                self.assertEqual(response.status_code, 200)
+
+    def test_recipe_delete(self):
+        self.add_recipes(self.user, 1, ingredients=20, tags=5)
+        recipe = Recipe.objects.filter(author=self.user).last()
+        # Избранное и списки покупок удаляются пачками до транзакции,
+        # затем в транзакции - остальные связи, отметка и сам рецепт.
+        response = self.assertQueryBudget(
+            14, 'delete', f'/api/recipes/{recipe.pk}/')
+        self.assertEqual(response.status_code, 204)
+
+    def test_favorite_and_shopping_cart(self):
+        recipe = self.add_recipes(self.authors[1], 1, ingredients=20,
+                                  tags=5)[0]
+        for action in ('favorite', 'shopping_cart'):
+            path = f'/api/recipes/{recipe.pk}/{action}/'
+            with self.subTest(action=action, method='post'):
+                response = self.assertQueryBudget(5, 'post', path)
+                self.assertEqual(response.status_code, 201)
+            with self.subTest(action=action, method='delete'):
+                response = self.assertQueryBudget(4, 'delete', path)
+                self.assertEqual(response.status_code, 204)
+
+    def test_subscribe_and_unsubscribe(self):
+        author = self.authors[2]
+        self.add_recipes(author, 10, ingredients=1, tags=1)
+        path = f'/api/users/{author.pk}/subscribe/?recipes_limit=3'
+        response = self.assertQueryBudget(8, 'post', path)
+        self.assertEqual(response.status_code, 201)
+        response = self.assertQueryBudget(4, 'delete', path)
+        self.assertEqual(response.status_code, 204)
+
+    def test_avatar(self):
+        response = self.assertQueryBudget(
+            2, 'put', '/api/users/me/avatar/', data={'avatar': IMAGE})
+        self.assertEqual(response.status_code, 200)
+        response = self.assertQueryBudget(
+            2, 'delete', '/api/users/me/avatar/')
+        self.assertEqual(response.status_code, 204)
+
+    def test_registration(self):
+        response = self.assertQueryBudget(
+            5, 'post', '/api/users/', authenticated=False, data={
+                'email': 'new@example.com',
+                'username': 'newbie',
+                'first_name': 'Новый',
+                'last_name': 'Пользователь',
+                'password': 'Registration-password-1',
+            })
+        self.assertEqual(response.status_code, 201)
+
+    def test_token_login_and_logout(self):
+        response = self.assertQueryBudget(
+            3, 'post', '/api/auth/token/login/', authenticated=False,
+            data={'email': self.user.email, 'password': PASSWORD})
+        self.assertEqual(response.status_code, 200)
+        # Удаление токена с сигналом отзыва из кэша: SELECT и DELETE.
+        response = self.assertQueryBudget(
+            3, 'post', '/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+
+    def test_set_password(self):
+        response = self.assertQueryBudget(
+            2, 'post', '/api/users/set_password/', data={
+                'current_password': PASSWORD,
+                'new_password': 'Changed-password-1',
+            })
+        self.assertEqual(response.status_code, 204)
@@ -0,0 +1,180 @@
+'''Сериализаторы чтения отдают те же байты, что и сериализаторы DRF.'''
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.db.models import Exists, OuterRef, Prefetch
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.mixins import parse_fieldset
+from api.read_serializers import (IngredientReadSerializer,
+                                  RecipeReadSerializer, TagReadSerializer)
+from api.renderers import FastJSONRenderer
+from api.serializers import (IngredientGetSerializer, RecipeGetSerializer,
+                             TagGetSerializer)
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, Subscription, Tag)
+from tests import TEST_CACHES
+
+
+User = get_user_model()
+
+# Наборы ?fields= и ?omit=: (fields, omit).
+FIELDSETS = (
+    ('', ''),
+    ('id,name,author.username,tags.slug,ingredients.amount', ''),
+    ('', 'text,author.email,author.avatar,ingredients.name,is_favorited'),
+    ('author,ingredients', 'author.is_subscribed,ingredients.id'),
+)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ReadSerializerParityTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = [Tag.objects.create(name=f'Тег\u2028{index}',
+                                       slug=f'tag{index}')
+                    for index in range(3)]
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'ингредиент "{index}"',
+                                      measurement_unit='г')
+            for index in range(4)]
+        cls.reader = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Читатель', last_name='Читателев', password='x')
+        cls.authors = [
+            User.objects.create_user(
+                username=f'author{index}', email=f'author{index}@example.com',
+                first_name='Автор', last_name=str(index), password='x',
+                avatar='users/avatar.png' if index else '')
+            for index in range(2)]
+        cls.recipes = []
+        for index in range(4):
+            recipe = Recipe.objects.create(
+                author=cls.authors[index % 2], name=f'Рецепт {index}',
+                text='Описание\nв две строки', cooking_time=index + 1,
+                image=f'recipes/{index}.png')
+            recipe.tags.set(cls.tags[:index])
+            IngredientRecipe.objects.bulk_create(
+                IngredientRecipe(recipe=recipe, ingredient=ingredient,
+                                 amount=index + 2)
+                for ingredient in cls.ingredients[:index + 1])
+            cls.recipes.append(recipe)
+        Favorite.objects.create(user=cls.reader, recipe=cls.recipes[1])
+        ShoppingCart.objects.create(user=cls.reader, recipe=cls.recipes[2])
+        Subscription.objects.create(follower=cls.reader,
+                                    following=cls.authors[1])
+
+    def request(self, user):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = user
+        return request
+
+    def recipe_list(self, user=None):
+        queryset = Recipe.objects.select_related('author').prefetch_related(
+            'tags',
+            Prefetch('recipe_ingredients',
+                     queryset=IngredientRecipe.objects.select_related(
+                         'ingredient')))
+        if user is not None:
+            queryset = queryset.annotate(
+                is_favorited=Exists(Favorite.objects.filter(
+                    user=user, recipe=OuterRef('pk'))),
+                is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                    user=user, recipe=OuterRef('pk'))))
+        return list(queryset.order_by('pk'))
+
+    def render(self, serializer_class, instance, **kwargs):
+        '''Байты ответа и число SQL-запросов при сериализации.'''
+        # Свой контекст: кэш подписок не должен переходить между вызовами.
+        context = dict(kwargs.pop('context', {}))
+        with CaptureQueriesContext(connection) as queries:
+            data = serializer_class(instance, context=context, **kwargs).data
+        return FastJSONRenderer().render(data), len(queries)
+
+    def assertSameOutput(self, drf_class, read_class, instance, **kwargs):
+        self.assertEqual(
+            self.render(read_class, instance, **kwargs),
+            self.render(drf_class, instance, **kwargs))
+
+    def test_recipes(self):
+        cases = (
+            ('anonymous', AnonymousUser(), False),
+            ('reader', self.reader, False),
+            ('reader-annotated', self.reader, True),
+        )
+        for name, user, annotated in cases:
+            recipes = self.recipe_list(user if annotated else None)
+            for normalize in (False, True):
+                for fields, omit in FIELDSETS:
+                    with self.subTest(user=name, normalize=normalize,
+                                      fields=fields, omit=omit):
+                        self.assertSameOutput(
+                            RecipeGetSerializer, RecipeReadSerializer,
+                            recipes, many=True,
+                            context={'request': self.request(user),
+                                     'normalize_authors': normalize},
+                            fields=parse_fieldset(fields),
+                            omit=parse_fieldset(omit))
+
+    def test_single_recipe(self):
+        for user in (AnonymousUser(), self.reader):
+            with self.subTest(user=user):
+                self.assertSameOutput(
+                    RecipeGetSerializer, RecipeReadSerializer,
+                    self.recipe_list()[1],
+                    context={'request': self.request(user)})
+
+    def test_catalogs(self):
+        for drf_class, read_class, model, omit in (
+            (IngredientGetSerializer, IngredientReadSerializer, Ingredient,
+             None),
+            (TagGetSerializer, TagReadSerializer, Tag, None),
+            (TagGetSerializer, TagReadSerializer, Tag, {'slug': {}}),
+        ):
+            kwargs = {'omit': omit} if omit else {}
+            with self.subTest(model=model.__name__, omit=omit):
+                self.assertSameOutput(
+                    drf_class, read_class, model.objects.all(), many=True,
+                    **kwargs)
+                self.assertSameOutput(
+                    drf_class, read_class, model.objects.first(), **kwargs)
+
+    def test_api_responses(self):
+        client = APIClient()
+        client.force_authenticate(self.reader)
+        response = client.get('/api/recipes/', {'fields': 'id,author.id'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()['results'][0],
+            {'id': self.recipes[-1].pk,
+             'author': {'id': self.recipes[-1].author_id}})
+        response = client.get('/api/tags/')
+        self.assertEqual(
+            response.json(),
+            TagGetSerializer(Tag.objects.all(), many=True).data)
+
+    def test_catalog_fieldsets(self):
+        client = APIClient()
+        ingredient = self.ingredients[0]
+        for url, params, expected in (
+            ('/api/ingredients/', {'fields': 'id,name'},
+             {'id': ingredient.pk, 'name': ingredient.name}),
+            ('/api/ingredients/', {'omit': 'id'},
+             {'name': ingredient.name, 'measurement_unit': 'г'}),
+            (f'/api/ingredients/{ingredient.pk}/', {'fields': 'name'},
+             {'name': ingredient.name}),
+            ('/api/tags/', {'fields': 'slug'}, {'slug': 'tag0'}),
+            ('/api/tags/', {'omit': 'name,slug'}, {'id': self.tags[0].pk}),
+            (f'/api/tags/{self.tags[0].pk}/', {'omit': 'id'},
+             {'name': self.tags[0].name, 'slug': 'tag0'}),
+        ):
+            with self.subTest(url=url, params=params):
+                response = client.get(url, params)
+                self.assertEqual(response.status_code, 200)
+                data = response.json()
+                self.assertEqual(
+                    data[0] if isinstance(data, list) else data, expected)
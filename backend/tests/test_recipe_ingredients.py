@@ -0,0 +1,97 @@
+'''Запись ингредиентов рецепта: проверка id и обновление по разнице.'''
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, IngredientRecipe, Recipe, Tag
+from tests import TEST_CACHES
+from tests.test_query_budgets import IMAGE
+
+
+User = get_user_model()
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RecipeIngredientsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com', password='x')
+        cls.tag = Tag.objects.create(name='Обед', slug='lunch')
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'ингредиент {index}',
+                                      measurement_unit='г')
+            for index in range(12)]
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Рецепт', text='Текст', cooking_time=5)
+        cls.recipe.tags.set([cls.tag])
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(recipe=cls.recipe, ingredient=ingredient,
+                             amount=index + 1)
+            for index, ingredient in enumerate(cls.ingredients[:3]))
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def payload(self, amounts):
+        return {'ingredients': [{'id': id, 'amount': amount}
+                                for id, amount in amounts.items()],
+                'tags': [self.tag.pk], 'name': 'Рецепт', 'text': 'Текст',
+                'cooking_time': 5, 'image': IMAGE}
+
+    def rows(self):
+        return {row.ingredient_id: (row.pk, row.amount) for row in
+                IngredientRecipe.objects.filter(recipe=self.recipe)}
+
+    def test_update_touches_only_changed_rows(self):
+        first, second, third, fourth = self.ingredients[:4]
+        before = self.rows()
+        response = self.client.patch(
+            f'/api/recipes/{self.recipe.pk}/',
+            self.payload({first.pk: 1, second.pk: 5, fourth.pk: 4}),
+            format='json')
+        self.assertEqual(response.status_code, 200)
+        after = self.rows()
+        self.assertEqual(after[first.pk], before[first.pk])
+        self.assertEqual(after[second.pk], (before[second.pk][0], 5))
+        self.assertNotIn(third.pk, after)
+        self.assertEqual(after[fourth.pk][1], 4)
+        self.assertEqual(
+            [(item['id'], item['amount'])
+             for item in response.data['ingredients']],
+            [(first.pk, 1), (second.pk, 5), (fourth.pk, 4)])
+
+    def test_ingredient_ids_are_checked_in_one_query(self):
+        url = f'/api/recipes/{self.recipe.pk}/'
+        counts = []
+        for ingredients in (self.ingredients[:2], self.ingredients):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.patch(url, self.payload(
+                    {ingredient.pk: 2 for ingredient in ingredients}),
+                    format='json')
+            self.assertEqual(response.status_code, 200)
+            counts.append(len([
+                query for query in context.captured_queries
+                if 'FROM "recipes_ingredient"' in query['sql']]))
+        self.assertEqual(counts, [1, 1])
+
+    def test_unknown_ingredients_are_listed(self):
+        response = self.client.patch(
+            f'/api/recipes/{self.recipe.pk}/',
+            self.payload({self.ingredients[0].pk: 1, 1000: 1, 1001: 1}),
+            format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(str(response.data['ingredients'][0]),
+                         'Ингредиенты с id 1000, 1001 не существуют.')
+        self.assertEqual(len(self.rows()), 3)
@@ -0,0 +1,73 @@
+'''Маршрутизация чтения на реплики и закрепление за основной базой.'''
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from foodgram_backend.middleware import ReplicaRoutingMiddleware
+from foodgram_backend.routers import ReplicaRouter
+from recipes.models import Tag
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTest(SimpleTestCase):
+    # TestCase держит открытой транзакцию, а чтение в транзакции
+    # маршрутизатор всегда направляет на основную базу.
+    databases = {'default'}
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def run_request(self, request, view):
+        routes = []
+
+        def get_response(request):
+            view(routes)
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(get_response)(request)
+        return routes, response
+
+    def read(self, routes):
+        routes.append(self.router.db_for_read(Tag))
+
+    def test_safe_request_reads_from_replica(self):
+        routes, response = self.run_request(self.factory.get('/'), self.read)
+        self.assertEqual(routes, ['replica'])
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_read_after_write_uses_primary(self):
+        def view(routes):
+            self.read(routes)
+            routes.append(self.router.db_for_write(Tag))
+            self.read(routes)
+
+        routes, response = self.run_request(self.factory.get('/'), view)
+        self.assertEqual(routes, ['replica', 'default', 'default'])
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_unsafe_request_uses_primary(self):
+        routes, _ = self.run_request(self.factory.post('/'), self.read)
+        self.assertEqual(routes, ['default'])
+
+    def test_sticky_cookie_uses_primary(self):
+        request = self.factory.get('/')
+        request.COOKIES[settings.REPLICA_PIN_COOKIE] = '1'
+        routes, _ = self.run_request(request, self.read)
+        self.assertEqual(routes, ['default'])
+
+    def test_transaction_uses_primary(self):
+        def view(routes):
+            with transaction.atomic():
+                self.read(routes)
+
+        routes, _ = self.run_request(self.factory.get('/'), view)
+        self.assertEqual(routes, ['default'])
+
+    def test_outside_request_uses_primary(self):
+        self.assertEqual(self.router.db_for_read(Tag), 'default')
+
+    def test_migrations_only_on_primary(self):
+        self.assertTrue(self.router.allow_migrate('default', 'recipes'))
+        self.assertFalse(self.router.allow_migrate('replica', 'recipes'))
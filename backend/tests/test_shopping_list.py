@@ -0,0 +1,138 @@
+'''Сборка списка покупок фоновой задачей для больших корзин.'''
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from jobs.models import Job
+from recipes.models import Ingredient, IngredientRecipe, Recipe, ShoppingCart
+from tests import TEST_CACHES
+
+
+User = get_user_model()
+
+URL = '/api/recipes/download_shopping_cart/'
+
+
+@override_settings(CACHES=TEST_CACHES, SHOPPING_LIST_ASYNC_THRESHOLD=2)
+class AsyncShoppingListTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='x')
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'ингредиент {index}',
+                                      measurement_unit='г')
+            for index in range(3)]
+        cls.recipes = [
+            Recipe.objects.create(author=cls.user, name=f'Рецепт {index}',
+                                  text='Текст', cooking_time=5)
+            for index in range(3)]
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(recipe=recipe, ingredient=ingredient,
+                             amount=index + 1)
+            for index, recipe in enumerate(cls.recipes)
+            for ingredient in cls.ingredients[:index + 1])
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.media_root = Path(media_root.name)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def fill_cart(self, recipes):
+        for recipe in recipes:
+            ShoppingCart.objects.create(user=self.user, recipe=recipe)
+
+    def run_worker(self):
+        call_command('run_worker', burst=True, stdout=StringIO())
+
+    def document(self, response):
+        '''Содержимое файла, на который перенаправлен клиент.'''
+        self.assertEqual(response.status_code, 303)
+        path = response['Location'].split('/media/', 1)[1]
+        return (self.media_root / path).read_bytes()
+
+    def test_small_cart_is_streamed(self):
+        self.fill_cart(self.recipes[:1])
+        response = self.client.get(URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content),
+                         'ингредиент 0 (г) — 1\n'.encode())
+        self.assertFalse(Job.objects.exists())
+
+    def test_large_cart_is_built_by_job(self):
+        self.fill_cart(self.recipes[1:])
+        response = self.client.get(URL)
+        self.assertEqual(response.status_code, 202)
+        job_url = response.data['url']
+        self.assertEqual(response['Location'], job_url)
+        self.assertEqual(response.data['status'], Job.Status.QUEUED)
+        # Повторный запрос не ставит вторую задачу.
+        self.assertEqual(self.client.get(URL).data['id'],
+                         response.data['id'])
+        self.assertEqual(self.client.get(job_url).status_code, 202)
+        self.run_worker()
+        expected = ('ингредиент 0 (г) — 5\n'
+                    'ингредиент 1 (г) — 5\n'
+                    'ингредиент 2 (г) — 3\n').encode()
+        self.assertEqual(self.document(self.client.get(job_url)), expected)
+        # Собранный файл отдаётся без новой задачи.
+        self.assertEqual(self.document(self.client.get(URL)), expected)
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_cart_change_invalidates_document(self):
+        self.fill_cart(self.recipes)
+        self.client.get(URL)
+        self.run_worker()
+        first = self.client.get(URL)
+        self.assertEqual(first.status_code, 303)
+        Recipe.objects.filter(pk=self.recipes[0].pk).update(
+            name='Новое название')
+        self.assertEqual(self.client.get(URL)['Location'],
+                         first['Location'])
+        IngredientRecipe.objects.filter(recipe=self.recipes[0]).update(
+            amount=10)
+        self.recipes[0].save()
+        response = self.client.get(URL)
+        self.assertEqual(response.status_code, 202)
+        self.run_worker()
+        self.assertIn('ингредиент 0 (г) — 15',
+                      self.document(self.client.get(URL)).decode())
+        # Прежний файл удалён, а задача, которая на него указывает,
+        # отвечает, что список устарел.
+        old_job = Job.objects.order_by('pk').first()
+        self.assertEqual(
+            self.client.get(f'{URL}{old_job.pk}/').status_code, 410)
+        ShoppingCart.objects.filter(recipe=self.recipes[2]).delete()
+        self.assertEqual(self.client.get(URL).status_code, 202)
+
+    def test_job_of_another_user(self):
+        self.fill_cart(self.recipes)
+        job_id = self.client.get(URL).data['id']
+        stranger = User.objects.create_user(
+            username='stranger', email='stranger@example.com', password='x')
+        client = APIClient()
+        client.force_authenticate(stranger)
+        self.assertEqual(client.get(f'{URL}{job_id}/').status_code, 404)
+        self.assertEqual(APIClient().get(f'{URL}{job_id}/').status_code, 401)
+
+    def test_job_poll_does_not_pin_to_primary(self):
+        self.fill_cart(self.recipes)
+        job_url = self.client.get(URL).data['url']
+        with override_settings(DATABASE_REPLICAS=['replica']):
+            client = APIClient()
+            client.force_authenticate(self.user)
+            response = client.get(job_url)
+        self.assertEqual(response.status_code, 202)
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
@@ -0,0 +1,100 @@
+'''Параметры ?fields=, ?omit= и ?normalize= в ответах API.'''
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.mixins import parse_fieldset
+from recipes.models import Ingredient, IngredientRecipe, Recipe, Tag
+from tests import TEST_CACHES
+
+
+User = get_user_model()
+
+
+class ParseFieldsetTest(SimpleTestCase):
+
+    def test_parse_fieldset(self):
+        self.assertEqual(parse_fieldset(''), {})
+        self.assertEqual(
+            parse_fieldset('id, author.username,author.id,,tags.'),
+            {'id': {}, 'author': {'username': {}, 'id': {}}, 'tags': {}})
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SparseFieldsetsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(
+            username='reader', email='reader@example.com', password='x')
+        cls.authors = [
+            User.objects.create_user(
+                username=f'author{index}', email=f'author{index}@example.com',
+                first_name='Автор', last_name=str(index), password='x')
+            for index in range(2)]
+        tag = Tag.objects.create(name='Ужин', slug='dinner')
+        ingredient = Ingredient.objects.create(name='соль',
+                                               measurement_unit='г')
+        cls.recipes = []
+        for index in range(4):
+            recipe = Recipe.objects.create(
+                author=cls.authors[index % 2], name=f'Рецепт {index}',
+                text='Текст', cooking_time=5)
+            recipe.tags.set([tag])
+            IngredientRecipe.objects.create(recipe=recipe,
+                                            ingredient=ingredient, amount=1)
+            cls.recipes.append(recipe)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), context.captured_queries
+
+    def test_recipe_fields_and_omit(self):
+        data, _ = self.get('/api/recipes/',
+                           fields='id,name,author.username,tags.slug')
+        self.assertEqual(data['results'][0], {
+            'id': self.recipes[-1].pk, 'name': 'Рецепт 3',
+            'author': {'username': 'author1'}, 'tags': [{'slug': 'dinner'}]})
+        data, _ = self.get(f'/api/recipes/{self.recipes[0].pk}/',
+                           omit='text,ingredients,author,is_favorited')
+        self.assertEqual(set(data), {'id', 'tags', 'is_in_shopping_cart',
+                                     'name', 'image', 'cooking_time'})
+
+    def test_omitted_relations_are_not_loaded(self):
+        _, queries = self.get('/api/recipes/', fields='id,name')
+        tables = ' '.join(query['sql'] for query in queries)
+        for table in ('recipes_tag', 'recipes_ingredientrecipe',
+                      'recipes_favorite', 'recipes_shoppingcart'):
+            self.assertNotIn(f'"{table}"', tables)
+
+    def test_normalized_authors(self):
+        data, _ = self.get('/api/recipes/', normalize='1',
+                           fields='id,author.id,author.username')
+        self.assertEqual(
+            [recipe['author'] for recipe in data['results']],
+            [recipe.author_id for recipe in reversed(self.recipes)])
+        self.assertCountEqual(
+            data['authors'],
+            [{'id': author.pk, 'username': author.username}
+             for author in self.authors])
+        data, _ = self.get('/api/recipes/', normalize='1', fields='id')
+        self.assertNotIn('authors', data)
+        # Нормализация относится только к списку.
+        data, _ = self.get(f'/api/recipes/{self.recipes[0].pk}/',
+                           normalize='1', fields='author.id')
+        self.assertEqual(data, {'author': {'id': self.authors[0].pk}})
+
+    def test_user_fields(self):
+        data, _ = self.get('/api/users/', fields='id,username')
+        self.assertEqual(set(data['results'][0]), {'id', 'username'})
+        data, _ = self.get('/api/users/me/', omit='avatar,is_subscribed')
+        self.assertEqual(set(data), {'id', 'username', 'email',
+                                     'first_name', 'last_name'})
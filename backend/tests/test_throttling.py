@@ -0,0 +1,102 @@
+'''Скользящее окно троттлинга и общее хранилище счётчиков.'''
+import multiprocessing
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework.throttling import SimpleRateThrottle
+
+from api.throttling import (MemoryThrottleStore, SQLiteThrottleStore,
+                            get_store)
+
+
+DURATION = 60
+WINDOW_START = 1000 * DURATION
+
+
+def hit_many(path, count, limit):
+    store = SQLiteThrottleStore(path)
+    return sum(store.hit('shared', limit, DURATION, WINDOW_START + 1)[0]
+               for _ in range(count))
+
+
+class SlidingWindowMixin:
+
+    def get_store(self):
+        raise NotImplementedError
+
+    def test_limit_within_window(self):
+        store = self.get_store()
+        results = [store.hit('key', 3, DURATION, WINDOW_START + 10)
+                   for _ in range(4)]
+        self.assertEqual([allowed for allowed, _ in results],
+                         [True, True, True, False])
+        self.assertAlmostEqual(results[-1][1], DURATION - 10)
+
+    def test_previous_window_is_weighted(self):
+        store = self.get_store()
+        for _ in range(3):
+            store.hit('key', 3, DURATION, WINDOW_START + 59)
+        next_window = WINDOW_START + DURATION
+        self.assertTrue(store.hit('key', 3, DURATION, next_window + 1)[0])
+        allowed, wait = store.hit('key', 3, DURATION, next_window + 1)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, DURATION / 3 - 1)
+        allowed, _ = store.hit('key', 3, DURATION,
+                               next_window + DURATION / 3 + 1)
+        self.assertTrue(allowed)
+
+    def test_old_windows_are_forgotten(self):
+        store = self.get_store()
+        for _ in range(3):
+            store.hit('key', 3, DURATION, WINDOW_START)
+        allowed, _ = store.hit('key', 3, DURATION,
+                               WINDOW_START + 2 * DURATION)
+        self.assertTrue(allowed)
+
+    def test_keys_are_independent(self):
+        store = self.get_store()
+        store.hit('first', 1, DURATION, WINDOW_START)
+        self.assertTrue(store.hit('second', 1, DURATION, WINDOW_START)[0])
+
+
+class MemoryThrottleStoreTest(SlidingWindowMixin, SimpleTestCase):
+
+    def get_store(self):
+        return MemoryThrottleStore()
+
+
+class SQLiteThrottleStoreTest(SlidingWindowMixin, SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = str(Path(directory.name) / 'throttle.sqlite3')
+
+    def get_store(self):
+        return SQLiteThrottleStore(self.path)
+
+    def test_limit_is_shared_between_processes(self):
+        with multiprocessing.get_context('fork').Pool(4) as pool:
+            allowed = pool.starmap(hit_many, [(self.path, 50, 60)] * 4)
+        self.assertEqual(sum(allowed), 60)
+
+
+@override_settings(THROTTLE_STORE='memory://')
+class ThrottledEndpointTest(TestCase):
+
+    def setUp(self):
+        get_store.cache_clear()
+        self.addCleanup(get_store.cache_clear)
+
+    def test_anonymous_limit_returns_retry_after(self):
+        client = APIClient()
+        with mock.patch.dict(SimpleRateThrottle.THROTTLE_RATES,
+                             {'anon': '2/min'}):
+            statuses = [client.get('/api/tags/').status_code
+                        for _ in range(3)]
+            response = client.get('/api/tags/')
+        self.assertEqual(statuses, [200, 200, 429])
+        self.assertIn('Retry-After', response)
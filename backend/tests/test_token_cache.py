@@ -0,0 +1,124 @@
+'''Кэширование аутентификации по токену и отзыв доступа.'''
+import os
+import stat
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from foodgram_backend.cache import PrivateFileBasedCache
+from tests import TEST_CACHES
+from users.authentication import token_cache_key
+
+
+User = get_user_model()
+
+PASSWORD = 'Token-cache-password-1'
+
+
+@override_settings(CACHES=TEST_CACHES, AUTH_TOKEN_CACHE_TTL=60)
+class CachedTokenAuthenticationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cached', email='cached@example.com',
+            first_name='Кэш', last_name='Кэшев', password=PASSWORD)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def get_me(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/users/me/')
+        token_queries = [query for query in context.captured_queries
+                         if 'authtoken_token' in query['sql']]
+        return response, token_queries
+
+    def test_second_request_skips_token_query(self):
+        response, token_queries = self.get_me()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(token_queries), 1)
+        response, token_queries = self.get_me()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(token_queries, [])
+
+    def test_cached_user_has_no_password_hash(self):
+        self.get_me()
+        cached = caches['shared'].get(token_cache_key(self.token.key))
+        self.assertEqual(cached.user.pk, self.user.pk)
+        self.assertNotIn('password', cached.user.__dict__)
+        self.assertNotIn(self.user.password.encode(),
+                         repr(cached.user.__dict__).encode())
+        # Хеш загружается из базы, если он всё же понадобился.
+        self.assertEqual(cached.user.password, self.user.password)
+
+    def test_logout_revokes_cached_token(self):
+        self.get_me()
+        response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        response, _ = self.get_me()
+        self.assertEqual(response.status_code, 401)
+
+    def test_deactivation_revokes_cached_token(self):
+        self.get_me()
+        self.user.is_active = False
+        self.user.save()
+        response, _ = self.get_me()
+        self.assertEqual(response.status_code, 401)
+
+    def test_password_change_refreshes_cached_user(self):
+        self.get_me()
+        response = self.client.post('/api/users/set_password/', {
+            'current_password': PASSWORD,
+            'new_password': 'Token-cache-password-2',
+        }, format='json')
+        self.assertEqual(response.status_code, 204)
+        response, token_queries = self.get_me()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(token_queries), 1)
+
+    def test_profile_update_is_not_served_stale(self):
+        self.get_me()
+        self.user.first_name = 'Новое'
+        self.user.save()
+        response, _ = self.get_me()
+        self.assertEqual(response.data['first_name'], 'Новое')
+
+    @override_settings(AUTH_TOKEN_CACHE_TTL=0)
+    def test_cache_can_be_disabled(self):
+        self.get_me()
+        _, token_queries = self.get_me()
+        self.assertEqual(len(token_queries), 1)
+
+
+class PrivateFileBasedCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def mode(self, path):
+        return stat.S_IMODE(os.stat(path).st_mode)
+
+    def test_directory_is_private(self):
+        location = self.directory / 'new'
+        PrivateFileBasedCache(str(location), {})
+        self.assertEqual(self.mode(location), 0o700)
+        self.directory.chmod(0o755)
+        cache = PrivateFileBasedCache(str(self.directory), {})
+        self.assertEqual(self.mode(self.directory), 0o700)
+        cache.set('key', 'value')
+        for path in self.directory.iterdir():
+            self.assertEqual(self.mode(path) & 0o077, 0)
@@ -1,20 +1,40 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 
+from foodgram_backend.admin_tools import (BulkDeletionAdminMixin,
+                                          EstimatedCountAdminMixin,
+                                          related_count)
+from recipes.deletion import delete_users, recipe_dependents, user_dependents
+from recipes.models import Recipe, Subscription
 from users.models import FoodgramUser
 
 
 @admin.register(FoodgramUser)
-class FoodgramUserAdmin(UserAdmin):
+class FoodgramUserAdmin(BulkDeletionAdminMixin, EstimatedCountAdminMixin,
+                        UserAdmin):
+    delete_objects = staticmethod(delete_users)
     list_display = ('username', 'email', 'first_name', 'last_name', 'is_staff',
                     'recipes', 'followings')
     search_fields = ('username', 'first_name', 'last_name', 'email')
     list_filter = ('is_staff', 'is_superuser', 'is_active', 'groups')
 
-    @admin.display(description='Количество рецептов')
+    @staticmethod
+    def dependents(users):
+        recipes = Recipe.objects.filter(author__in=users)
+        return [recipes, *recipe_dependents(recipes),
+                *user_dependents(users)]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            recipes_total=related_count(Recipe, 'author'),
+            followers_total=related_count(Subscription, 'following'))
+
+    @admin.display(description='Количество рецептов',
+                   ordering='recipes_total')
     def recipes(self, obj):
-        return obj.recipes.count()
+        return obj.recipes_total
 
-    @admin.display(description='Количество подписчиков')
+    @admin.display(description='Количество подписчиков',
+                   ordering='followers_total')
     def followings(self, obj):
-        return obj.followings.count()
+        return obj.followers_total
@@ -0,0 +1,76 @@
+import copy
+from hashlib import sha256
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from foodgram_backend.metrics import record_cache_access
+
+
+TOKEN_CACHE_PREFIX = 'auth_token:'
+USER_TOKEN_CACHE_PREFIX = 'auth_user_token:'
+
+
+def get_token_cache():
+    return caches[settings.AUTH_TOKEN_CACHE]
+
+
+def token_cache_key(key):
+    '''Ключ кэша по хешу токена, чтобы сам токен не попадал в кэш.'''
+    return TOKEN_CACHE_PREFIX + sha256(key.encode()).hexdigest()
+
+
+def cacheable_token(token):
+    '''
+    Копия токена для кэша без хеша пароля пользователя.
+
+    Поле password у копии отложенное: код, которому нужен хеш
+    (проверка текущего пароля при его смене), загрузит его запросом.
+    '''
+    user = copy.copy(token.user)
+    user.__dict__.pop('password', None)
+    token = copy.copy(token)
+    token.user = user
+    return token
+
+
+def invalidate_user_token(user_id):
+    '''Удаление из кэша токена пользователя (у пользователя один токен).'''
+    cache = get_token_cache()
+    user_key = f'{USER_TOKEN_CACHE_PREFIX}{user_id}'
+    token_key = cache.get(user_key)
+    cache.delete_many([user_key] + ([token_key] if token_key else []))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    '''
+    Аутентификация по токену с кэшированием токена и пользователя.
+
+    Запись живёт AUTH_TOKEN_CACHE_TTL секунд и удаляется сигналами при
+    удалении токена (выход), сохранении пользователя (смена пароля,
+    блокировка) и удалении пользователя. Массовые QuerySet.update()
+    сигналы не отправляют: отозванный так доступ действует до истечения
+    TTL.
+    '''
+
+    def authenticate_credentials(self, key):
+        if not settings.AUTH_TOKEN_CACHE_TTL:
+            return super().authenticate_credentials(key)
+        cache = get_token_cache()
+        cache_key = token_cache_key(key)
+        token = cache.get(cache_key)
+        record_cache_access('auth_token', token is not None)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set_many({
+                cache_key: cacheable_token(token),
+                f'{USER_TOKEN_CACHE_PREFIX}{user.pk}': cache_key,
+            }, settings.AUTH_TOKEN_CACHE_TTL)
+            return user, token
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.'))
+        return token.user, token
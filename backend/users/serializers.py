@@ -3,6 +3,8 @@ from djoser.serializers import UserCreateSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
+from api.mixins import SparseFieldsetSerializerMixin
+
 
 User = get_user_model()
 
@@ -21,14 +23,9 @@ class FoodgramUserCreateSerializer(UserCreateSerializer):
             'password'
         )
 
-    def create(self, validated_data):
-        user = super().create(validated_data)
-        user.set_password(validated_data['password'])
-        user.save()
-        return user
-
 
-class FoodgramUserSerializer(serializers.ModelSerializer):
+class FoodgramUserSerializer(SparseFieldsetSerializerMixin,
+                             serializers.ModelSerializer):
     """Сериализатор для работы с пользователями."""
 
     is_subscribed = serializers.SerializerMethodField()
@@ -47,9 +44,18 @@ class FoodgramUserSerializer(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        '''
+        Подписки текущего пользователя загружаются одним запросом
+        и кэшируются в контексте, общем для всех вложенных сериализаторов.
+        '''
         follower = self.context.get('request').user
-        return follower.is_authenticated and obj.followings.filter(
-            follower=follower).exists()
+        if not follower.is_authenticated:
+            return False
+        if 'subscribed_ids' not in self.context:
+            self.context['subscribed_ids'] = set(
+                follower.followers.order_by().values_list(
+                    'following_id', flat=True))
+        return obj.id in self.context['subscribed_ids']
 
 
 class AvatarPutSerializer(serializers.ModelSerializer):
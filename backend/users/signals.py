@@ -0,0 +1,22 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from users.authentication import invalidate_user_token
+
+
+User = get_user_model()
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    '''Выход из системы и удаление токена сразу отзывают доступ.'''
+    invalidate_user_token(instance.user_id)
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance, **kwargs):
+    '''Смена пароля, блокировка и правка профиля сбрасывают кэш токена.'''
+    invalidate_user_token(instance.pk)
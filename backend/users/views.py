@@ -1,4 +1,5 @@
 from django.contrib.auth import get_user_model
+from django.db.models import Count, OuterRef, Prefetch, Subquery
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework import status
@@ -6,21 +7,26 @@ from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
+from api.mixins import SparseFieldsetViewMixin
 from api.paginators import FoodgramPageNumberPagination
 from api.serializers import SubscribeUserSerializer, SubscriptionSerializer
-from recipes.models import Subscription
+from recipes.deletion import delete_users
+from recipes.models import Recipe, Subscription
 from users.serializers import AvatarPutSerializer
 
 
 User = get_user_model()
 
 
-class UserViewSet(DjoserUserViewSet):
+class UserViewSet(SparseFieldsetViewMixin, DjoserUserViewSet):
     """Вьюсет для управления пользователями и авторизацией."""
 
     pagination_class = FoodgramPageNumberPagination
     permission_classes = (AllowAny,)
 
+    def perform_destroy(self, instance):
+        delete_users(User.objects.filter(pk=instance.pk))
+
     @action(detail=True,
             methods=['post', 'delete'],
             permission_classes=(IsAuthenticated,))
@@ -48,11 +54,28 @@ class UserViewSet(DjoserUserViewSet):
             methods=['get'])
     def subscriptions(self, request):
         '''Экшн-метод для получения списка подписок.'''
-        followings = User.objects.filter(followings__follower=request.user)
+        recipes = Recipe.objects.all()
+        if (
+            limit := request.query_params.get('recipes_limit')
+        ) and limit.isdigit():
+            recipes = recipes.filter(pk__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).values('pk')[:int(limit)]))
+        followings = User.objects.filter(
+            followings__follower=request.user
+        ).annotate(
+            recipes_count=Count('recipes')
+        ).order_by(
+            'username'
+        ).prefetch_related(Prefetch('recipes', queryset=recipes))
         page = self.paginate_queryset(followings)
+        fields, omit = self.get_sparse_fieldsets()
         serializer = SubscribeUserSerializer(page,
                                              many=True,
-                                             context={'request': request})
+                                             context={'request': request},
+                                             fields=fields,
+                                             omit=omit)
         return self.get_paginated_response(serializer.data)
 
     @action(detail=False,